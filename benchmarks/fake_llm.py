@@ -0,0 +1,98 @@
+"""
+Deterministic in-process stand-in for a language model.
+
+Importing this module registers a "bench-fake" provider. It answers each
+git-sage prompt kind (commit message, PR description, PR chunk summary or
+merged summary, review) with a canned response of the right shape, after a
+configurable delay. The delay is read from the BENCH_FAKE_LATENCY (seconds before the
+first token) and BENCH_FAKE_TOKEN_DELAY (seconds per streamed token)
+environment variables.
+"""
+import os
+import re
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+from git_sage.core.providers import register_provider
+
+COMMIT_RESPONSE = """type: feat
+subject: add synthetic benchmark module
+body: Generated by the benchmark fake model.
+- bullet point one
+- bullet point two"""
+
+PR_RESPONSE = """title: BENCH-1 Add synthetic benchmark changes
+description:
+### Description
+Synthetic changes generated for benchmarking.
+
+### Changes
+- Updated generated modules
+
+### QA
+[QA: None]"""
+
+CHUNK_SUMMARY_RESPONSE = """- Updated generated modules
+- Adjusted synthetic constants"""
+
+REVIEW_RESPONSE = """代码质量良好，符合规范。
+- 未发现问题"""
+
+
+def canned_response(prompt: str) -> str:
+    """Pick the response shape the prompt asks for"""
+    if "title: PR_TITLE" in prompt:
+        return PR_RESPONSE
+    if ("summarizing one part of a larger pull request" in prompt
+            or "condensing summaries of parts of a larger pull request" in prompt):
+        return CHUNK_SUMMARY_RESPONSE
+    if "subject: brief description" in prompt:
+        return COMMIT_RESPONSE
+    return REVIEW_RESPONSE
+
+
+class FakeBenchLLM(LLM):
+    """LLM that returns canned responses after a fixed latency"""
+
+    latency: float = 0.0
+    token_delay: float = 0.0
+    calls: int = 0
+    prompt_chars: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "bench-fake"
+
+    def _record(self, prompt: str) -> str:
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        return canned_response(prompt)
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None,
+              run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> str:
+        response = self._record(prompt)
+        if self.token_delay:
+            time.sleep(self.token_delay * len(response.split()))
+        return response
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        response = self._record(prompt)
+        for token in re.findall(r"\s*\S+\s*", response):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield GenerationChunk(text=token)
+
+
+@register_provider("bench-fake")
+def _create_fake(model_name: str, endpoint: str, api_key: str, config_manager=None):
+    return FakeBenchLLM(
+        latency=float(os.environ.get("BENCH_FAKE_LATENCY", "0")),
+        token_delay=float(os.environ.get("BENCH_FAKE_TOKEN_DELAY", "0"))
+    )
@@ -0,0 +1,156 @@
+"""
+Per-call latency of the ModelScope wrapper: pooled session vs. one-shot requests.
+
+Starts a local stand-in for the OpenAI-compatible chat completions endpoint,
+then issues the same request N times through
+
+  * baseline: module-level requests.post (a new connection per call)
+  * pooled:   ModelScopeInferenceChatModel with its keep-alive session
+
+and reports median/p90 latency and how many TCP connections the server saw.
+Pass --tls-cert/--tls-key to serve HTTPS so handshake cost is included.
+
+Usage:
+    python benchmarks/http_session.py [--calls 200] [--payload-kb 32] [--json]
+"""
+import argparse
+import json
+import os
+import socket
+import ssl
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RESPONSE = json.dumps({
+    "choices": [{"message": {"role": "assistant", "content": "type: feat\nsubject: benchmark\nbody: ok"}}]
+}).encode("utf-8")
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        # Reply without Nagle delays, like a production server would
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        with self.lock:
+            self.connections.add(self.client_address)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(cert=None, key=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    scheme = "http"
+    if cert:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+
+def measure(label, call, calls):
+    _StandInHandler.connections = set()
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "mode": label,
+        "calls": calls,
+        "median_ms": round(statistics.median(latencies), 3),
+        "p90_ms": round(latencies[int(len(latencies) * 0.9) - 1], 3),
+        "total_ms": round(sum(latencies), 1),
+        "connections": len(_StandInHandler.connections),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--payload-kb", type=int, default=32, help="Size of the diff placed in the prompt")
+    parser.add_argument("--tls-cert")
+    parser.add_argument("--tls-key")
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON")
+    options = parser.parse_args()
+
+    import requests
+    from langchain_core.messages import HumanMessage
+    from git_sage.core.modelscope_wrapper import ModelScopeInferenceChatModel
+
+    server, url = start_server(options.tls_cert, options.tls_key)
+    verify = False if options.tls_cert else True
+    if not verify:
+        import urllib3
+        urllib3.disable_warnings()
+
+    messages = [HumanMessage(content="x" * options.payload_kb * 1024)]
+    model = ModelScopeInferenceChatModel(model_name="bench", api_key="bench", base_url=url)
+    # Keep CA bundle environment variables from overriding verify for the self-signed cert
+    model.session.trust_env = False
+    model.session.verify = verify
+    payload = model._build_payload(messages, stream=False)
+    headers = model._build_headers()
+
+    def baseline():
+        with requests.Session() as one_shot:
+            # Equivalent to requests.post, minus environment CA overrides
+            one_shot.trust_env = False
+            one_shot.post(url, headers=headers, json=payload, timeout=60, verify=verify).json()
+
+    def pooled():
+        model._generate(messages)
+
+    compressed = ModelScopeInferenceChatModel(
+        model_name="bench", api_key="bench", base_url=url, compress_requests=True
+    )
+    compressed.session.trust_env = False
+    compressed.session.verify = verify
+
+    def pooled_gzip():
+        compressed._generate(messages)
+
+    # Warm up imports and the first connection outside the measurement
+    baseline()
+    pooled()
+    pooled_gzip()
+
+    results = [
+        measure("requests.post", baseline, options.calls),
+        measure("pooled session", pooled, options.calls),
+        measure("pooled session + gzip", pooled_gzip, options.calls),
+    ]
+    server.shutdown()
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for r in results:
+            print(f"{r['mode']:<24} median {r['median_ms']:7.3f} ms  p90 {r['p90_ms']:7.3f} ms  "
+                  f"connections {r['connections']}")
+        speedup = results[0]["median_ms"] / results[1]["median_ms"] if results[1]["median_ms"] else 0
+        print(f"\npooled session median speedup: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
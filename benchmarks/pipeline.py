@@ -0,0 +1,318 @@
+"""
+End-to-end benchmark of the gsg c, v, cr and pr code paths.
+
+Builds a synthetic repository (see synthetic_repo.py), then runs each command
+several times through the real CLI entry point in a fresh interpreter, with
+the deterministic "bench-fake" model from fake_llm.py. Every run reports
+
+  * wall time of the command and of the whole process
+  * peak RSS of the interpreter and of its git child processes
+  * number of subprocesses spawned
+  * per-stage timings of GitOperations, prompt assembly in AIProcessor and
+    CodeValidator, the response parsers and the model call itself
+
+Stage timings are given inclusive and exclusive of nested stages, so parser
+time does not include the model call that feeds it. Results are written as
+JSON; pass a previous result file with --compare to print the change.
+
+Usage:
+    python benchmarks/pipeline.py [--files 500] [--hunks 3] [--history 1000]
+        [--latency 0.05] [--runs 3] [--output results.json] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+
+COMMANDS = {
+    # gsg c stops at the commit confirmation: the editor is `true` and the answer is "n"
+    "c": ["c", "--no-cache"],
+    "v": ["v", "common", "--no-cache"],
+    "cr": ["cr", "common", "--no-cache"],
+    "pr": ["pr", "--dry-run", "--no-edit"],
+}
+
+# (module, class, methods) whose calls are timed as stages
+STAGES = [
+    ("git_sage.core.git_operations", "GitOperations", [
+        "_get_repo", "is_git_repository", "has_staged_changes", "get_staged_files", "get_staged_diff",
+        "get_current_branch", "get_main_branch_name", "get_branch_commits", "get_branch_diff",
+        "extract_ticket_from_branch", "commit",
+    ]),
+    ("git_sage.core.ai_processor", "AIProcessor", [
+        "_setup_model", "start_model_setup", "_to_messages", "_call_language_model", "_stream_language_model",
+        "fit_diff", "_build_commit_prompt", "_build_pr_request", "_summarize_diff_chunks",
+        "_parse_response", "_format_commit_message", "_parse_pr_response", "_apply_pr_defaults",
+    ]),
+    ("git_sage.core.code_validator", "CodeValidator", [
+        "_load_review_prompts", "_build_review_prompt", "_review_result", "format_validation_result",
+    ]),
+    ("fake_llm", "FakeBenchLLM", ["_record"]),
+]
+
+RESULT_MARKER = "@@bench-result@@"
+
+
+def _install_instrumentation():
+    """Patch stage methods and process creation with counters; runs in the child"""
+    import functools
+    import importlib
+    import inspect
+    import threading
+
+    stats = {"stages": {}, "subprocesses": 0}
+    local = threading.local()
+    lock = threading.Lock()
+
+    def record(name, elapsed, child_time):
+        with lock:
+            stage = stats["stages"].setdefault(name, {"calls": 0, "inclusive_s": 0.0, "exclusive_s": 0.0})
+            stage["calls"] += 1
+            stage["inclusive_s"] += elapsed
+            stage["exclusive_s"] += elapsed - child_time
+
+    def timed(name, func):
+        def enter():
+            stack = getattr(local, "stack", None)
+            if stack is None:
+                stack = local.stack = []
+            stack.append(0.0)
+            return stack, time.perf_counter()
+
+        def leave(stack, started):
+            elapsed = time.perf_counter() - started
+            child_time = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            record(name, elapsed, child_time)
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                stack, started = enter()
+                try:
+                    yield from func(*args, **kwargs)
+                finally:
+                    leave(stack, started)
+            return gen_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stack, started = enter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                leave(stack, started)
+        return wrapper
+
+    for module_name, class_name, methods in STAGES:
+        cls = getattr(importlib.import_module(module_name), class_name)
+        for method in methods:
+            original = inspect.getattr_static(cls, method, None)
+            if original is None:
+                continue
+            if isinstance(original, (staticmethod, classmethod)):
+                wrapped = type(original)(timed(f"{class_name}.{method}", original.__func__))
+            else:
+                wrapped = timed(f"{class_name}.{method}", original)
+            # pydantic models (the fake LLM) reject attribute assignment through setattr on the class
+            type.__setattr__(cls, method, wrapped)
+
+    original_init = subprocess.Popen.__init__
+
+    def counting_init(self, *args, **kwargs):
+        with lock:
+            stats["subprocesses"] += 1
+        original_init(self, *args, **kwargs)
+
+    subprocess.Popen.__init__ = counting_init
+
+    original_system = os.system
+
+    def counting_system(command):
+        with lock:
+            stats["subprocesses"] += 1
+        return original_system(command)
+
+    os.system = counting_system
+    return stats
+
+
+def run_child(command):
+    """Run one gsg command in this process and print its measurements"""
+    import resource
+    started = time.perf_counter()
+    sys.path.insert(0, BENCH_DIR)
+    import fake_llm  # noqa: F401  (registers the bench-fake provider)
+    stats = _install_instrumentation()
+    from git_sage.cli.main import cli
+
+    command_started = time.perf_counter()
+    exit_code = 0
+    try:
+        cli.main(args=COMMANDS[command], prog_name="gsg", standalone_mode=False)
+    except SystemExit as e:
+        exit_code = e.code or 0
+    finished = time.perf_counter()
+
+    self_usage = resource.getrusage(resource.RUSAGE_SELF)
+    child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    result = {
+        "command_s": finished - command_started,
+        "in_process_s": finished - started,
+        "exit_code": exit_code,
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        "peak_rss_mb": self_usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+        "children_peak_rss_mb": child_usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+        "subprocesses": stats["subprocesses"],
+        "stages": stats["stages"],
+    }
+    sys.stdout.flush()
+    print("\n" + RESULT_MARKER + json.dumps(result))
+
+
+def run_command(command, repo, home, latency, token_delay):
+    env = dict(
+        os.environ,
+        HOME=home,
+        PYTHONPATH=REPO_ROOT,
+        EDITOR="true",
+        BENCH_FAKE_LATENCY=str(latency),
+        BENCH_FAKE_TOKEN_DELAY=str(token_delay),
+    )
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", command],
+        cwd=repo, env=env, input="n\n", capture_output=True, text=True
+    )
+    process_s = time.perf_counter() - started
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            result = json.loads(line[len(RESULT_MARKER):])
+            result["process_s"] = process_s
+            return result
+    raise RuntimeError(f"gsg {command} produced no result:\n{proc.stdout[-2000:]}\n{proc.stderr[-2000:]}")
+
+
+def summarize(runs):
+    """Median of every numeric measurement across runs"""
+    summary = {key: statistics.median(r[key] for r in runs)
+               for key in ("command_s", "process_s", "peak_rss_mb", "children_peak_rss_mb", "subprocesses")}
+    names = sorted({name for r in runs for name in r["stages"]})
+    summary["stages"] = {
+        name: {
+            field: statistics.median(r["stages"].get(name, {}).get(field, 0) for r in runs)
+            for field in ("calls", "inclusive_s", "exclusive_s")
+        }
+        for name in names
+    }
+    return summary
+
+
+def write_config(home, options):
+    config_dir = os.path.join(home, ".git-sage")
+    os.makedirs(config_dir, exist_ok=True)
+    with open(os.path.join(config_dir, "config.yml"), "w", encoding="utf-8") as f:
+        f.write(
+            "language: en\n"
+            "language_model: bench-fake\n"
+            "model: bench-fake\n"
+            "api_key: bench\n"
+            "cache_enabled: false\n"
+            f"stream: {'true' if options.stream else 'false'}\n"
+        )
+
+
+def print_report(report, baseline=None):
+    for command, data in report["results"].items():
+        s = data["median"]
+        line = (f"gsg {command:<3} command {s['command_s'] * 1000:8.1f} ms  process {s['process_s'] * 1000:8.1f} ms  "
+                f"rss {s['peak_rss_mb']:6.1f} MB  subprocesses {s['subprocesses']:4.0f}")
+        if baseline and command in baseline.get("results", {}):
+            before = baseline["results"][command]["median"]["command_s"]
+            if before:
+                line += f"  ({(s['command_s'] - before) / before * 100:+.1f}% vs baseline)"
+        print(line)
+        for name, stage in sorted(s["stages"].items(), key=lambda item: -item[1]["exclusive_s"]):
+            print(f"    {name:<42} calls {stage['calls']:4.0f}  self {stage['exclusive_s'] * 1000:8.2f} ms  "
+                  f"total {stage['inclusive_s'] * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--commands", default="c,v,cr,pr", help="Comma-separated commands to run")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--hunks", type=int, default=3)
+    parser.add_argument("--history", type=int, default=1000)
+    parser.add_argument("--branch-commits", type=int, default=20)
+    parser.add_argument("--refs", type=int, default=200)
+    parser.add_argument("--staged-files", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake model latency before the first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Fake model delay per streamed token (s)")
+    parser.add_argument("--stream", action="store_true", help="Render model output as it streams")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--repo", help="Reuse an existing synthetic repository")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    options = parser.parse_args()
+
+    if options.child:
+        run_child(options.child)
+        return
+
+    sys.path.insert(0, BENCH_DIR)
+    from synthetic_repo import create_repo
+
+    with tempfile.TemporaryDirectory(prefix="gsg-bench-") as workdir:
+        home = os.path.join(workdir, "home")
+        write_config(home, options)
+        repo = options.repo
+        if not repo:
+            repo = os.path.join(workdir, "repo")
+            started = time.perf_counter()
+            create_repo(repo, options.files, options.hunks, options.history, options.branch_commits,
+                        options.refs, options.staged_files)
+            print(f"Synthetic repository built in {time.perf_counter() - started:.2f}s")
+
+        results = {}
+        for command in options.commands.split(","):
+            runs = [run_command(command, repo, home, options.latency, options.token_delay)
+                    for _ in range(options.runs)]
+            results[command] = {"median": summarize(runs), "runs": runs}
+
+    git_version = subprocess.run(["git", "--version"], capture_output=True, text=True).stdout.strip()
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": git_version,
+            "parameters": {key: value for key, value in vars(options).items()
+                           if key not in ("child", "output", "compare")},
+        },
+        "results": results,
+    }
+
+    baseline = None
+    if options.compare:
+        with open(options.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {options.output}")
+
+
+if __name__ == "__main__":
+    main()
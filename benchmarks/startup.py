@@ -0,0 +1,121 @@
+"""
+Startup-time regression check for the gsg CLI.
+
+Each scenario runs in a fresh interpreter with an isolated HOME and reports
+how long it took and which heavy modules it imported. The script exits with
+a non-zero status when a scenario exceeds its import-time budget or imports
+a module it must not touch, so it can gate CI.
+
+Usage:
+    python benchmarks/startup.py [--scale 2.0] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter: executes one gsg command without exiting
+# and prints the elapsed time plus the modules that ended up imported.
+_DRIVER = r'''
+import json, sys, time
+start = time.perf_counter()
+scenario = sys.argv[1]
+args = sys.argv[2:]
+if scenario == "client":
+    from git_sage.cli.client import forward
+    assert forward(args) is None, "no daemon should be running"
+elif scenario == "provider":
+    from git_sage.core.providers import create_model
+    create_model(args[0], "budget-model", "http://localhost:1", "key")
+else:
+    from git_sage.cli.main import cli
+    try:
+        cli.main(args=args, prog_name="gsg", standalone_mode=False)
+    except SystemExit:
+        pass
+elapsed = time.perf_counter() - start
+print("\n" + json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+'''
+
+# name -> (driver args, budget in seconds, forbidden module prefixes)
+SCENARIOS = {
+    # The thin client deciding there is no daemon to forward to
+    "thin client": (["client", "show", "config"], 0.05, ["click", "git", "yaml", "langchain", "langchain_core"]),
+    "help": (["cli", "--help"], 0.5, ["langchain", "langchain_core", "inquirer"]),
+    "show config": (["cli", "show", "config"], 0.5, ["langchain", "langchain_core", "inquirer"]),
+    "init-prompts": (["cli", "init-prompts"], 0.5, ["langchain", "langchain_core", "inquirer"]),
+    "provider ollama": (["provider", "ollama"], 3.0, ["langchain_openai", "langchain_google_genai", "git_sage.core.modelscope_wrapper"]),
+    "provider deepseek": (["provider", "deepseek"], 3.0, ["langchain_ollama", "langchain_google_genai", "git_sage.core.modelscope_wrapper"]),
+}
+
+
+def run_scenario(args, home):
+    env = dict(os.environ, HOME=home, PYTHONPATH=REPO_ROOT)
+    wall_start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", _DRIVER] + args,
+        capture_output=True, text=True, env=env, cwd=home
+    )
+    wall = time.perf_counter() - wall_start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or proc.stdout.strip())
+    report = json.loads(proc.stdout.strip().splitlines()[-1])
+    report["wall"] = wall
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiply every budget (for slow CI machines)")
+    parser.add_argument("--json", action="store_true", help="Emit results as JSON")
+    options = parser.parse_args()
+
+    results = []
+    failed = False
+    with tempfile.TemporaryDirectory() as home:
+        for name, (args, budget, forbidden) in SCENARIOS.items():
+            budget *= options.scale
+            try:
+                report = run_scenario(args, home)
+            except (RuntimeError, ValueError) as e:
+                results.append({"scenario": name, "error": str(e)})
+                failed = True
+                continue
+
+            leaked = sorted({m for m in report["modules"]
+                             if any(m == p or m.startswith(p + ".") for p in forbidden)})
+            ok = report["elapsed"] <= budget and not leaked
+            failed = failed or not ok
+            results.append({
+                "scenario": name,
+                "elapsed": round(report["elapsed"], 4),
+                "wall": round(report["wall"], 4),
+                "budget": budget,
+                "forbidden_imports": leaked,
+                "ok": ok,
+            })
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            if "error" in result:
+                print(f"ERROR {result['scenario']}: {result['error']}")
+                continue
+            status = "ok  " if result["ok"] else "FAIL"
+            line = f"{status} {result['scenario']:<20} {result['elapsed'] * 1000:8.1f} ms (budget {result['budget'] * 1000:.0f} ms)"
+            if result["forbidden_imports"]:
+                line += f"  imported: {', '.join(result['forbidden_imports'][:5])}"
+            print(line)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Generate synthetic git repositories for benchmarks.
+
+The layout mimics a feature branch in a busy repository:
+
+  * main with `history` commits on top of an initial import of `files` files
+  * refs/remotes/origin/{HEAD,main} so main-branch detection takes its usual path
+  * `refs` extra branches and tags pointing into main's history
+  * a feature branch (named after a ticket) with `branch_commits` commits
+  * `staged_files` files with `hunks` separate hunks each, staged but not committed
+
+History is written with a single `git fast-import`, so even long histories
+take seconds to build.
+
+Usage:
+    python benchmarks/synthetic_repo.py PATH [--files 500] [--hunks 3] [--history 1000]
+"""
+import argparse
+import os
+import subprocess
+from typing import List
+
+FEATURE_BRANCH = "feature/BENCH-1-synthetic"
+LINES_PER_HUNK = 10
+_COMMITTER = b"committer Bench <bench@example.com> %d +0000\n"
+_EPOCH = 1700000000
+
+
+def _file_path(index: int) -> str:
+    return f"src/pkg{index % 50:02d}/module_{index:05d}.py"
+
+
+def _file_content(index: int, hunks: int, revision: int = 0, changed_hunks: int = 0) -> bytes:
+    """Content with one modifiable line per hunk-sized block, so edits produce separate hunks"""
+    lines = []
+    for block in range(max(hunks, 1)):
+        for offset in range(LINES_PER_HUNK):
+            if offset == LINES_PER_HUNK // 2:
+                rev = revision if block < changed_hunks else 0
+                lines.append(f"VALUE_{block} = {index * 1000 + block + rev * 7}  # revision {rev}\n")
+            else:
+                lines.append(f"# module {index} block {block} line {offset}\n")
+    return "".join(lines).encode("utf-8")
+
+
+def _data(payload: bytes) -> bytes:
+    return b"data %d\n" % len(payload) + payload + b"\n"
+
+
+def _commit(stream: List[bytes], ref: str, mark: int, parent: int, message: str, changes: List[bytes], when: int) -> None:
+    stream.append(f"commit {ref}\nmark :{mark}\n".encode("utf-8"))
+    stream.append(_COMMITTER % when)
+    stream.append(_data(message.encode("utf-8")))
+    if parent:
+        stream.append(f"from :{parent}\n".encode("utf-8"))
+    stream.extend(changes)
+
+
+def _modify(path: str, content: bytes) -> bytes:
+    return f"M 100644 inline {path}\n".encode("utf-8") + _data(content)
+
+
+def create_repo(path: str, files: int = 500, hunks: int = 3, history: int = 200, branch_commits: int = 20,
+                refs: int = 100, staged_files: int = 20) -> str:
+    """Create the synthetic repository at path and return it"""
+    os.makedirs(path, exist_ok=True)
+    run = lambda *args, **kwargs: subprocess.run(["git", *args], cwd=path, check=True, capture_output=True, **kwargs)
+    run("init", "-q", "-b", "main")
+    run("config", "user.name", "Bench")
+    run("config", "user.email", "bench@example.com")
+    run("remote", "add", "origin", "https://example.com/bench/synthetic.git")
+
+    stream: List[bytes] = []
+    mark = 1
+    _commit(stream, "refs/heads/main", mark, 0, "Initial import",
+            [_modify(_file_path(i), _file_content(i, hunks)) for i in range(files)], _EPOCH)
+
+    for n in range(1, history + 1):
+        index = n % files
+        _commit(stream, "refs/heads/main", mark + 1, mark, f"chore: update module {index}",
+                [_modify(_file_path(index), _file_content(index, hunks, revision=n, changed_hunks=1))], _EPOCH + n)
+        mark += 1
+    main_mark = mark
+
+    for n in range(1, branch_commits + 1):
+        index = (n * 7) % files
+        _commit(stream, f"refs/heads/{FEATURE_BRANCH}", mark + 1, mark if n > 1 else main_mark,
+                f"feat: BENCH-1 change module {index}\n\nSynthetic change {n}.",
+                [_modify(_file_path(index), _file_content(index, hunks, revision=history + n, changed_hunks=hunks))],
+                _EPOCH + history + n)
+        mark += 1
+
+    stream.append(f"reset refs/remotes/origin/main\nfrom :{main_mark}\n\n".encode("utf-8"))
+    # Extra refs spread over main's history
+    for n in range(refs):
+        target = 1 + (n * max(history, 1)) // max(refs, 1)
+        kind = "tags/v0." if n % 2 else "heads/topic-"
+        stream.append(f"reset refs/{kind}{n}\nfrom :{min(target, main_mark)}\n\n".encode("utf-8"))
+
+    run("fast-import", "--quiet", input=b"".join(stream))
+    run("symbolic-ref", "refs/remotes/origin/HEAD", "refs/remotes/origin/main")
+    run("pack-refs", "--all")
+    run("checkout", "-q", FEATURE_BRANCH)
+
+    # Staged, uncommitted edits for gsg c / gsg v
+    for i in range(staged_files):
+        index = (i * 13 + 1) % files
+        with open(os.path.join(path, _file_path(index)), "wb") as f:
+            f.write(_file_content(index, hunks, revision=history + branch_commits + 1, changed_hunks=hunks))
+    run("add", "-A")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--hunks", type=int, default=3)
+    parser.add_argument("--history", type=int, default=200)
+    parser.add_argument("--branch-commits", type=int, default=20)
+    parser.add_argument("--refs", type=int, default=100)
+    parser.add_argument("--staged-files", type=int, default=20)
+    options = parser.parse_args()
+    create_repo(options.path, options.files, options.hunks, options.history, options.branch_commits,
+                options.refs, options.staged_files)
+    print(options.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Thin gsg client.
+
+This is the `gsg` entry point. When a gsg daemon is listening on its Unix
+socket, the command line, working directory and environment are sent to it
+together with this process's stdin, stdout and stderr file descriptors; the
+daemon runs the command in a forked worker that writes straight to this
+terminal, and sends back the exit status. Without a daemon (or on platforms
+without Unix sockets and fork) the command runs in this process as usual.
+
+The daemon's workers have no controlling terminal. Ctrl-C and Ctrl-Z are
+passed on to the worker by the client, as are window size changes, and
+prompts read the terminal through the forwarded stdin. Programs that open
+/dev/tty themselves (the commit message editor, git credential prompts)
+are sent back to the client, which runs them in its own terminal while the
+worker waits (see git_sage.core.terminal). Only commands built on a
+full-screen prompt library run in-process when stdin is a terminal.
+
+Only standard library modules are imported here, so forwarding a command
+costs an interpreter start and a socket round trip.
+"""
+import array
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+from typing import List, Optional, Tuple
+
+SOCKET_PATH = "~/.git-sage/daemon.sock"
+
+# Message kinds sent back to the client, each followed by a 4-byte value
+ACCEPTED = b"A"
+EXIT = b"X"
+# Sent to the daemon: forward a signal to the running command
+SIGNAL = b"S"
+# Sent both ways: the worker asks the client to run a shell command in its
+# terminal (value: length of the command that follows), and the client
+# answers with the command's wait status
+TERMINAL = b"T"
+
+# Commands that must never be forwarded
+LOCAL_COMMANDS = {"daemon"}
+
+# Commands that drive the terminal directly, and the option that makes them
+# do so (None: always); they run in-process from a terminal
+INTERACTIVE_COMMANDS = {"set": None, "log-rewrite": "--apply"}
+
+# Seconds to wait for the daemon to accept the connection and then the command;
+# a daemon that takes longer is treated as not running
+CONNECT_TIMEOUT = 1.0
+ACCEPT_TIMEOUT = 5.0
+
+
+def socket_path() -> str:
+    return os.path.expanduser(os.environ.get("GSG_DAEMON_SOCKET") or SOCKET_PATH)
+
+
+def send_message(sock: socket.socket, payload: dict, fds: Optional[List[int]] = None) -> None:
+    """Send a length-prefixed JSON message, passing file descriptors alongside"""
+    data = json.dumps(payload).encode("utf-8")
+    data = struct.pack("!I", len(data)) + data
+    ancillary = []
+    if fds:
+        ancillary = [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))]
+    sent = sock.sendmsg([data], ancillary)
+    if sent < len(data):
+        sock.sendall(data[sent:])
+
+
+def receive_message(sock: socket.socket, max_fds: int = 0) -> Tuple[Optional[dict], List[int]]:
+    """Receive one message sent with send_message; (None, []) when the peer closed"""
+    fds = array.array("i")
+    data, ancillary, _, _ = sock.recvmsg(65536, socket.CMSG_SPACE(max_fds * fds.itemsize) if max_fds else 0)
+    for level, kind, payload in ancillary:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(payload[:len(payload) - len(payload) % fds.itemsize])
+    if len(data) < 4:
+        return None, list(fds)
+    size = struct.unpack("!I", data[:4])[0]
+    data = data[4:]
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None, list(fds)
+        data += chunk
+    return json.loads(data[:size].decode("utf-8")), list(fds)
+
+
+def connect(timeout: Optional[float] = CONNECT_TIMEOUT) -> Optional[socket.socket]:
+    """Connect to the daemon, or None when none is running"""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path())
+    except OSError:
+        # Includes socket.timeout when the daemon's backlog is full
+        sock.close()
+        return None
+    return sock
+
+
+def receive_exactly(sock: socket.socket, size: int) -> bytes:
+    """Read size bytes; fewer when the peer closed the connection"""
+    data = b""
+    while len(data) < size:
+        try:
+            chunk = sock.recv(size - len(data))
+        except InterruptedError:
+            continue
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def receive_reply(sock: socket.socket) -> Optional[Tuple[bytes, int]]:
+    """Read one (kind, value) reply; None when the daemon closed the connection"""
+    reply = receive_exactly(sock, 5)
+    if len(reply) < 5:
+        return None
+    return reply[:1], struct.unpack("!i", reply[1:])[0]
+
+
+def run_in_terminal(sock: socket.socket, size: int) -> bool:
+    """Run the command the worker sent in this terminal and send back its status; False when the daemon is gone"""
+    command = receive_exactly(sock, size)
+    if len(command) < size:
+        return False
+    # os.system ignores SIGINT and SIGQUIT while the command runs, so Ctrl-C
+    # in an editor is not relayed to the worker
+    status = os.system(command.decode("utf-8"))
+    try:
+        sock.sendall(TERMINAL + struct.pack("!i", status))
+    except OSError:
+        return False
+    return True
+
+
+def is_interactive(argv: List[str]) -> bool:
+    """Check whether a command line runs a command that needs the terminal"""
+    command = next((arg for arg in argv if not arg.startswith("-")), None)
+    if command not in INTERACTIVE_COMMANDS:
+        return False
+    option = INTERACTIVE_COMMANDS[command]
+    return option is None or option in argv
+
+
+def forward(argv: List[str]) -> Optional[int]:
+    """
+    Run a command in the daemon and return its exit status
+
+    Returns None when no daemon accepted the command, so the caller can run
+    it locally instead.
+    """
+    if argv[:1] and argv[0] in LOCAL_COMMANDS or os.environ.get("GSG_NO_DAEMON"):
+        return None
+    try:
+        fds = [sys.stdin.fileno(), sys.stdout.fileno(), sys.stderr.fileno()]
+    except (OSError, ValueError, AttributeError):
+        # No usable stdio to hand over (e.g. closed or replaced streams)
+        return None
+    if os.isatty(fds[0]) and is_interactive(argv):
+        return None
+    sock = connect()
+    if sock is None:
+        return None
+    with sock:
+        try:
+            send_message(sock, {"argv": argv, "cwd": os.getcwd(), "env": dict(os.environ)}, fds)
+            sock.settimeout(ACCEPT_TIMEOUT)
+            accepted = receive_reply(sock)
+        except OSError:
+            accepted = None
+        if accepted is None or accepted[0] != ACCEPTED:
+            # Closing the connection also stops a worker forked after all
+            sys.stderr.write("gsg: the daemon is not responding, running the command in-process\n")
+            return None
+        sock.settimeout(None)
+
+        worker = accepted[1]
+
+        def relay(signum, frame):
+            try:
+                sock.sendall(SIGNAL + struct.pack("!I", signum))
+            except OSError:
+                pass
+
+        def suspend(signum, frame):
+            # Ctrl-Z: stop the worker along with this process, resume both together
+            _signal_worker(worker, signal.SIGSTOP)
+            signal.signal(signal.SIGTSTP, signal.SIG_DFL)
+            os.kill(os.getpid(), signal.SIGTSTP)
+            signal.signal(signal.SIGTSTP, suspend)
+            _signal_worker(worker, signal.SIGCONT)
+
+        def resize(signum, frame):
+            _signal_worker(worker, signum)
+
+        handlers = {signal.SIGINT: relay, signal.SIGTERM: relay}
+        if hasattr(signal, "SIGTSTP"):
+            handlers.update({signal.SIGTSTP: suspend, signal.SIGWINCH: resize})
+        previous = {signum: signal.signal(signum, handler) for signum, handler in handlers.items()}
+        try:
+            while True:
+                reply = receive_reply(sock)
+                if reply is None or reply[0] != TERMINAL or not run_in_terminal(sock, reply[1]):
+                    break
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    if reply is not None and reply[0] == EXIT:
+        return reply[1]
+    sys.stderr.write("gsg: the daemon stopped before the command finished\n")
+    return 1
+
+
+def _signal_worker(pid: int, signum: int) -> None:
+    if pid <= 0:
+        # Never signal a process group by accident
+        return
+    try:
+        os.kill(pid, signum)
+    except OSError:
+        # The worker already finished
+        pass
+
+
+def main() -> None:
+    """gsg entry point: forward to the daemon when one is running, else run in-process"""
+    status = forward(sys.argv[1:])
+    if status is not None:
+        sys.exit(status)
+    from git_sage.cli.main import cli
+    cli()
@@ -0,0 +1,286 @@
+"""
+Resident gsg daemon.
+
+The daemon imports the CLI once, parses the configuration, builds the model
+clients of the configured providers and opens the repositories it is asked
+about, then waits on a Unix socket. Each command sent by the thin client
+(see client.py) runs in a child forked from this warm process: the child
+takes over the client's stdin, stdout and stderr, changes to its working
+directory and environment, runs the click command and reports the exit
+status. Forking keeps commands isolated from each other (a crash, a leaked
+thread or a changed global never reaches the next command) while every one
+of them starts with the imports, configuration and clients already in
+memory. Programs that need a terminal of their own, like the commit
+message editor, are run by the client (see git_sage.core.terminal), so
+`gsg c` and `gsg pr` do their git and model work here even when started
+from a terminal.
+
+The daemon itself never starts threads or opens network connections, so
+forked children inherit neither. When ~/.git-sage/config.yml changes, the
+configuration and the model clients are rebuilt before the next command.
+"""
+import os
+import select
+import signal
+import socket
+import struct
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from git_sage.cli.client import (ACCEPTED, EXIT, SIGNAL, TERMINAL, connect, receive_exactly, receive_message,
+                                 send_message, socket_path)
+
+LOG_PATH = "~/.git-sage/daemon.log"
+
+# Seconds between checks of the config file while no command arrives
+CONFIG_POLL_INTERVAL = 2.0
+
+# Seconds a new connection gets to send its request; connections are served
+# one at a time, so one that never sends must not hold up the others
+REQUEST_TIMEOUT = 2.0
+
+
+class Daemon:
+    """Accept commands on the socket and run each in a forked child"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or socket_path()
+        self.started = time.time()
+        self.served = 0
+        self.config_manager = None
+        self.config_signature = None
+        self.running = True
+
+    def warm_up(self) -> None:
+        """Import the CLI, load the configuration and build the configured model clients"""
+        import git_sage.cli.main  # noqa: F401  (the import is the warm-up)
+        from git_sage.config.config_manager import ConfigManager
+        from git_sage.core.providers import create_model, keep_clients_warm
+
+        config_manager = self.config_manager = ConfigManager()
+        self.config_signature = config_manager.config_signature()
+        # Drop clients built for the previous configuration
+        keep_clients_warm()
+        providers = config_manager.get_providers() or [{
+            "language_model": config_manager.get_language_model(),
+            "model": config_manager.get_model(),
+            "endpoint": config_manager.get_model_endpoint(),
+            "api_key": config_manager.get_api_key(),
+        }]
+        for provider in providers:
+            try:
+                create_model(provider["language_model"], provider["model"], provider["endpoint"],
+                             provider["api_key"], config_manager)
+            except Exception as e:
+                # The command reports the same error when it needs this client
+                print(f"Warning: Failed to set up {provider['language_model']} ({provider['model']}): {e}")
+        print(f"Warmed up {len(providers)} model client(s)", flush=True)
+
+    def reload_if_changed(self) -> None:
+        """Rebuild the configuration and model clients after the config file changed"""
+        if self.config_manager is not None and self.config_manager.config_signature() != self.config_signature:
+            print("Config file changed, reloading", flush=True)
+            self.warm_up()
+
+    def serve(self) -> None:
+        listener = self._listen()
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        print(f"gsg daemon {os.getpid()} listening on {self.path}", flush=True)
+        try:
+            while self.running:
+                try:
+                    ready, _, _ = select.select([listener], [], [], CONFIG_POLL_INTERVAL)
+                except InterruptedError:
+                    continue
+                self.reload_if_changed()
+                if not ready:
+                    continue
+                try:
+                    conn, _ = listener.accept()
+                except (BlockingIOError, InterruptedError):
+                    continue
+                try:
+                    self._handle(conn, listener)
+                except Exception as e:
+                    print(f"Error: Failed to handle request: {e}", flush=True)
+                finally:
+                    conn.close()
+        finally:
+            listener.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            print("gsg daemon stopped", flush=True)
+
+    def stop(self) -> None:
+        self.running = False
+
+    def _listen(self) -> socket.socket:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            probe = connect(timeout=1.0)
+            if probe is not None:
+                probe.close()
+                raise Exception(f"A gsg daemon is already listening on {self.path}")
+            # Left behind by a daemon that did not shut down cleanly
+            os.unlink(self.path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        previous_umask = os.umask(0o177)
+        try:
+            listener.bind(self.path)
+        finally:
+            os.umask(previous_umask)
+        os.chmod(self.path, 0o600)
+        listener.listen(16)
+        listener.setblocking(False)
+        return listener
+
+    def _peer_allowed(self, conn: socket.socket) -> bool:
+        """Only serve processes of the user running the daemon (where the platform reports it)"""
+        peercred = getattr(socket, "SO_PEERCRED", None)
+        if peercred is None:
+            return True
+        _, uid, _ = struct.unpack("3i", conn.getsockopt(socket.SOL_SOCKET, peercred, struct.calcsize("3i")))
+        return uid == os.getuid()
+
+    def _handle(self, conn: socket.socket, listener: socket.socket) -> None:
+        conn.settimeout(REQUEST_TIMEOUT)
+        if not self._peer_allowed(conn):
+            return
+        request, fds = receive_message(conn, max_fds=3)
+        try:
+            if request is None:
+                return
+            control = request.get("control")
+            if control == "status":
+                send_message(conn, self.status())
+            elif control == "stop":
+                send_message(conn, {"stopping": True})
+                self.stop()
+            elif "argv" in request and len(fds) == 3:
+                self._run(conn, listener, request, fds)
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def status(self) -> Dict[str, Any]:
+        from git_sage.core.git_operations import GitOperations
+        from git_sage.core import providers
+
+        return {
+            "pid": os.getpid(),
+            "socket": self.path,
+            "uptime_s": round(time.time() - self.started, 1),
+            "commands": self.served,
+            "model_clients": len(providers._warm_clients or {}),
+            "repos": sorted(GitOperations._warm_repos),
+        }
+
+    def _run(self, conn: socket.socket, listener: socket.socket, request: Dict[str, Any], fds: List[int]) -> None:
+        from git_sage.core.git_operations import GitOperations
+
+        try:
+            GitOperations.preload_repo(request["cwd"])
+        except Exception:
+            # Not a repository; the command reports that itself if it matters
+            pass
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                listener.close()
+                status = _run_command(conn, request, fds)
+            finally:
+                os._exit(status)
+        self.served += 1
+        # Tells the client the command runs here (so it does not run it itself) and
+        # which process to suspend and resume with it; a worker whose client
+        # already gave up sees the connection close and stops
+        conn.sendall(ACCEPTED + struct.pack("!i", pid))
+
+
+def _run_command(conn: socket.socket, request: Dict[str, Any], fds: List[int]) -> int:
+    """Run one command in a forked child and send its exit status to the client"""
+    import atexit
+    import queue
+    import threading
+    from git_sage.core import terminal
+
+    conn.settimeout(None)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+    sys.stdin = sys.__stdin__ = open(0, "r", encoding="utf-8", closefd=False)
+    sys.stdout = sys.__stdout__ = open(1, "w", encoding="utf-8", buffering=1 if os.isatty(1) else -1, closefd=False)
+    sys.stderr = sys.__stderr__ = open(2, "w", encoding="utf-8", buffering=1, closefd=False)
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request.get("env") or {})
+
+    terminal_statuses: "queue.Queue[int]" = queue.Queue()
+
+    def relay_messages() -> None:
+        # Signals the client received (e.g. Ctrl-C) and the results of
+        # commands it ran in its terminal arrive as messages
+        while True:
+            try:
+                message = receive_exactly(conn, 5)
+            except OSError:
+                message = b""
+            if len(message) < 5:
+                # The client is gone; nobody is waiting for the result
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+            if message[:1] == SIGNAL:
+                os.kill(os.getpid(), struct.unpack("!I", message[1:])[0])
+            elif message[:1] == TERMINAL:
+                terminal_statuses.put(struct.unpack("!i", message[1:])[0])
+
+    def run_in_client(command: str) -> int:
+        for stream in (sys.stdout, sys.stderr):
+            stream.flush()
+        data = command.encode("utf-8")
+        conn.sendall(TERMINAL + struct.pack("!i", len(data)) + data)
+        return terminal_statuses.get()
+
+    threading.Thread(target=relay_messages, name="daemon-messages", daemon=True).start()
+    terminal.set_runner(run_in_client)
+
+    from git_sage.cli.main import cli
+    try:
+        cli.main(args=request["argv"], prog_name="gsg")
+        status = 0
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if not isinstance(e.code, (int, type(None))):
+            print(e.code, file=sys.stderr)
+    except BaseException as e:
+        print(f"Error: {e}", file=sys.stderr)
+        status = 1
+    # Normally run at interpreter exit, which os._exit skips (usage ledger, traces)
+    atexit._run_exitfuncs()
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    try:
+        conn.sendall(EXIT + struct.pack("!i", status))
+    except OSError:
+        pass
+    return status
+
+
+def serve(path: Optional[str] = None) -> None:
+    """Warm up and serve commands until stopped"""
+    daemon = Daemon(path)
+    daemon.warm_up()
+    daemon.serve()
+
+
+if __name__ == "__main__":
+    serve()
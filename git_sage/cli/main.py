@@ -1,12 +1,15 @@
 import click
-import inquirer
+import contextlib
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import Dict
+from typing import Dict, Optional, Tuple
 from git_sage.config.config_manager import ConfigManager
 from git_sage.core.git_operations import GitOperations
 from git_sage.core.ai_processor import AIProcessor
 from git_sage.core.code_validator import CodeValidator
+from git_sage.core.response_cache import ResponseCache
+from git_sage.core import tracing, usage_ledger
 import os
 import sys
 
@@ -23,27 +26,46 @@ class ModelService(str, Enum):
     MODELSCOPE = 'modelscope'
 
 @click.group()
-def cli():
+@click.option('--trace', is_flag=True, help='Write a Chrome trace of this run to $GSG_TRACE or gsg-trace.json')
+@click.option('--trace-memory', is_flag=True, help='Include tracemalloc memory figures in the trace')
+@click.pass_context
+def cli(ctx, trace, trace_memory):
     """Git Sage - Your AI-powered Git assistant"""
-    pass
+    usage_ledger.set_command(ctx.invoked_subcommand)
+    trace_path = os.environ.get('GSG_TRACE')
+    if trace or trace_path:
+        tracing.enable(trace_path or 'gsg-trace.json', memory=trace_memory)
+
+def _collect_staged_changes() -> Tuple[GitOperations, Optional[str]]:
+    """Open the repository and read the staged diff; the diff is None when nothing is staged"""
+    git_ops = GitOperations()
+    if not git_ops.has_staged_changes():
+        return git_ops, None
+    return git_ops, git_ops.get_staged_diff()
 
 @cli.command()
 @click.argument('files', nargs=-1)
-def c(files):
+@click.option('--no-cache', is_flag=True, help='Always call the model, ignoring cached responses')
+@tracing.traced("gsg c")
+def c(files, no_cache):
     """Analyze staged changes and generate commit message"""
     try:
-        # Initialize modules
-        config_manager = ConfigManager()
-        git_ops = GitOperations()
-        ai_processor = AIProcessor(config_manager)
+        # Git discovery and diff collection run on a worker thread while the
+        # config is loaded and the model client is built (and its connection
+        # opened) in the background; the model call waits for both sides
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            staged = executor.submit(_collect_staged_changes)
+            config_manager = ConfigManager()
+            ai_processor = AIProcessor(config_manager, use_cache=not no_cache)
+            ai_processor.prewarm()
+            ai_processor.start_model_setup()
+            git_ops, diff_content = staged.result()
         
         # Check for staged changes
-        if not git_ops.has_staged_changes():
+        if diff_content is None:
             click.echo("No staged changes found. Please 'git add' some files first.")
             return
         
-        # Get diff content
-        diff_content = git_ops.get_staged_diff()
         if not diff_content:
             click.echo("No changes to analyze.")
             return
@@ -62,14 +84,21 @@ def c(files):
 @cli.command()
 @click.argument('rule_type', required=False, default='common')
 @click.argument('files', nargs=-1)
-def v(rule_type, files):
+@click.option('--no-cache', is_flag=True, help='Always call the model, ignoring cached responses')
+@click.option('--parallel', '-p', is_flag=True, help='Review files (or token-sized shards) concurrently')
+@click.option('--workers', '-w', type=int, default=None, help='Maximum concurrent shard reviews (defaults to max_concurrency)')
+@click.option('--shard', type=click.Choice(['file', 'tokens']), default='file', help='Shard per file or into token-sized groups of files')
+@tracing.traced("gsg v")
+def v(rule_type, files, no_cache, parallel, workers, shard):
     """Verify staged changes against predefined rules. 
     Optionally specify a rule type (e.g., 'c' for conventional commit rules)"""
     try:
         # Initialize modules
         config_manager = ConfigManager()
+        ai_processor = AIProcessor(config_manager, use_cache=not no_cache)
+        # Load the model while git collects the changes
+        ai_processor.prewarm()
         git_ops = GitOperations()
-        ai_processor = AIProcessor(config_manager)
         code_validator = CodeValidator(ai_processor, git_ops)
         
         # Check for staged changes
@@ -88,7 +117,7 @@ def v(rule_type, files):
             
         # Run validation
         click.echo(f"Verifying changes using rule type: {rule_type}")
-        result = code_validator.validate_changes(rule_type)
+        result = code_validator.validate_changes(rule_type, parallel=parallel, workers=workers, shard_by=shard, staged=True)
         
         # Display results
         click.echo("\nValidation Results:")
@@ -104,13 +133,20 @@ def v(rule_type, files):
 
 @cli.command()
 @click.argument('prompt', required=False, default='ccr')
-def cr(prompt):
+@click.option('--no-cache', is_flag=True, help='忽略缓存，始终调用模型')
+@click.option('--parallel', '-p', is_flag=True, help='按文件（或按 token 大小分片）并行审查')
+@click.option('--workers', '-w', type=int, default=None, help='最大并发审查数（默认为 max_concurrency）')
+@click.option('--shard', type=click.Choice(['file', 'tokens']), default='file', help='按文件分片，或按 token 大小将文件分组')
+@tracing.traced("gsg cr")
+def cr(prompt, no_cache, parallel, workers, shard):
     """检查当前分支与主分支的代码差异"""
     try:
         # Initialize modules
         config_manager = ConfigManager()
+        ai_processor = AIProcessor(config_manager, use_cache=not no_cache)
+        # Load the model while git collects the changes
+        ai_processor.prewarm()
         git_ops = GitOperations()
-        ai_processor = AIProcessor(config_manager)
         code_validator = CodeValidator(ai_processor, git_ops)
         
         # Check if in git repository
@@ -135,7 +171,7 @@ def cr(prompt):
             
         # Run validation
         click.echo(f"正在使用规则 {prompt} 分析代码变更...")
-        result = code_validator.validate_changes(prompt)
+        result = code_validator.validate_changes(prompt, parallel=parallel, workers=workers, shard_by=shard)
         
         # Display results
         click.echo("\n分析结果：")
@@ -152,6 +188,9 @@ def cr(prompt):
 @cli.command()
 def set():
     """Configure Git Sage settings through interactive mode"""
+    # inquirer pulls in a full terminal UI stack; only this command needs it
+    import inquirer
+
     try:
         config_manager = ConfigManager()
         current_config = config_manager.config
@@ -262,6 +301,209 @@ def config():
     except Exception as e:
         click.echo(f"Error: {str(e)}", err=True)
 
+@show.command()
+def cache():
+    """Show response cache statistics"""
+    try:
+        config_manager = ConfigManager()
+        response_cache = ResponseCache.from_config(config_manager)
+        stats = response_cache.get_stats()
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = f"{stats['hits'] / lookups:.1%}" if lookups else "n/a"
+        
+        click.echo("\n=== Response Cache ===\n")
+        click.echo(f"Enabled: {config_manager.get_cache_enabled()}")
+        click.echo(f"Hits: {stats['hits']}")
+        click.echo(f"Misses: {stats['misses']}")
+        click.echo(f"Hit Rate: {hit_rate}")
+        click.echo(f"Evictions: {stats['evictions']}")
+        click.echo(f"Entries: {stats['entries']}")
+        click.echo(f"Size: {stats['size_bytes'] / 1024:.1f} KB / {config_manager.get_cache_max_size_mb():g} MB")
+        click.echo(f"Max Age: {config_manager.get_cache_max_age_days():g} days")
+        click.echo(f"\nCache Directory: {response_cache.cache_dir}")
+            
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+
+@show.command()
+def hedge():
+    """Show hedged request statistics"""
+    try:
+        from git_sage.core.hedging import HedgeStats, percentile
+        
+        config_manager = ConfigManager()
+        hedge_stats = HedgeStats()
+        stats = hedge_stats.load()
+        requests = stats['requests']
+        hedged = stats['hedged']
+        samples = stats['primary_first_token_s']
+        
+        click.echo("\n=== Hedged Requests ===\n")
+        click.echo(f"Hedge Provider: {config_manager.get_hedge_provider() or 'disabled'}")
+        click.echo(f"Hedge After: {config_manager.get_hedge_after():g}s")
+        click.echo(f"Requests: {requests}")
+        click.echo(f"Hedges Fired: {hedged} ({hedged / requests:.1%})" if requests else f"Hedges Fired: {hedged}")
+        click.echo(f"Primary Wins: {stats['primary_wins']}")
+        click.echo(f"Secondary Wins: {stats['secondary_wins']}")
+        click.echo(f"Failures: {stats['failures']}")
+        if samples:
+            figures = ", ".join(f"p{int(q * 100)} {percentile(samples, q):.2f}s" for q in (0.5, 0.9, 0.95, 0.99))
+            click.echo(f"Primary First Token ({len(samples)} samples): {figures}")
+        click.echo(f"\nStats File: {hedge_stats.path}")
+            
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+
+@show.command()
+def providers():
+    """Show health of the configured provider chain"""
+    try:
+        from git_sage.core.provider_health import ProviderHealth, describe_provider
+        
+        config_manager = ConfigManager()
+        chain = config_manager.get_providers()
+        click.echo("\n=== Providers ===\n")
+        if not chain:
+            click.echo(f"No providers list configured; using {config_manager.get_language_model()} ({config_manager.get_model()})")
+            return
+        
+        provider_health = ProviderHealth.from_config(config_manager)
+        for index, row in enumerate(provider_health.report(chain), 1):
+            latency = row['median_latency_s']
+            click.echo(f"{index}. {describe_provider(row['provider'])} at {row['provider']['endpoint']}")
+            click.echo(f"   Circuit: {row['state']}")
+            click.echo(f"   Median Latency: {f'{latency:.2f}s' if latency is not None else 'n/a'}")
+            click.echo(f"   Errors: {row['error_rate']:.0%} of last {row['calls']} calls, "
+                       f"{row['consecutive_failures']} in a row")
+            if row['last_error']:
+                click.echo(f"   Last Error: {row['last_error']}")
+        click.echo(f"\nHealth File: {provider_health.path}")
+            
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+
+@show.command()
+@click.option('--days', type=float, default=30, help='Only include calls from the last N days (defaults to 30)')
+@click.option('--command', 'command_name', default=None, help='Only include calls made by this gsg command')
+def stats(days, command_name):
+    """Show model usage, latency and cost from the local usage ledger"""
+    try:
+        import time
+        from git_sage.core.hedging import percentile
+        
+        config_manager = ConfigManager()
+        ledger = usage_ledger.get_ledger()
+        rows = ledger.query(since=time.time() - days * 86400, command=command_name)
+        
+        click.echo(f"\n=== Usage (last {days:g} days) ===\n")
+        click.echo(f"Recording: {config_manager.get_usage_ledger()}")
+        if not rows:
+            click.echo("No calls recorded yet.")
+            click.echo(f"\nLedger: {ledger.path}")
+            return
+        
+        prices = config_manager.get_token_prices()
+        
+        def figures(values, unit='s', digits=2):
+            values = [v for v in values if v is not None]
+            if not values:
+                return "n/a"
+            return ", ".join(f"p{int(q * 100)} {percentile(values, q):.{digits}f}{unit}" for q in (0.5, 0.9, 0.95, 0.99))
+        
+        def total(group, column):
+            return sum(row[column] or 0 for row in group)
+        
+        def cost(group):
+            known = False
+            amount = 0.0
+            for row in group:
+                price = prices.get(row['model'])
+                if price:
+                    known = True
+                    amount += ((row['prompt_tokens'] or 0) * price.get('input', 0)
+                               + (row['completion_tokens'] or 0) * price.get('output', 0)) / 1_000_000
+            return f"${amount:.4f}" if known else "n/a"
+        
+        calls = [row for row in rows if row['cache'] != 'hit']
+        hits = len(rows) - len(calls)
+        errors = sum(1 for row in calls if row['error'])
+        lookups = sum(1 for row in rows if row['cache'] in ('hit', 'miss'))
+        
+        click.echo(f"Model Calls: {len(calls)} ({errors} failed)")
+        click.echo(f"Cache Hits: {hits}" + (f" ({hits / lookups:.1%} of cacheable requests)" if lookups else ""))
+        click.echo(f"Prompt Tokens: {total(calls, 'prompt_tokens')} ({total(calls, 'cached_tokens')} cached)")
+        click.echo(f"Completion Tokens: {total(calls, 'completion_tokens')}")
+        click.echo(f"Estimated Cost: {cost(calls)}")
+        click.echo(f"Latency: {figures(row['latency_s'] for row in calls if not row['error'])}")
+        click.echo(f"First Token: {figures(row['first_token_s'] for row in calls)}")
+        click.echo(f"Diff Size: {figures((row['diff_chars'] for row in rows), ' chars', 0)}")
+        
+        def breakdown(title, key):
+            groups = {}
+            for row in calls:
+                groups.setdefault(key(row), []).append(row)
+            click.echo(f"\n{title}:")
+            for name, group in sorted(groups.items(), key=lambda item: -len(item[1])):
+                latencies = [row['latency_s'] for row in group if not row['error'] and row['latency_s'] is not None]
+                p50 = f"{percentile(latencies, 0.5):.2f}s" if latencies else "n/a"
+                p95 = f"{percentile(latencies, 0.95):.2f}s" if latencies else "n/a"
+                failed = sum(1 for row in group if row['error'])
+                click.echo(f"  {name}: {len(group)} calls, {failed} failed, p50 {p50}, p95 {p95}, "
+                           f"{total(group, 'prompt_tokens')} in / {total(group, 'completion_tokens')} out tokens, "
+                           f"cost {cost(group)}")
+        
+        breakdown("By Model", lambda row: f"{row['provider']} ({row['model']})")
+        breakdown("By Command", lambda row: row['command'] or 'unknown')
+        click.echo(f"\nLedger: {ledger.path}")
+            
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+
+@cli.command()
+@click.option('--keep-alive', default=None, help='How long to keep Ollama models loaded (e.g. 30m, 3600, -1); defaults to keep_alive')
+def warm(keep_alive):
+    """Load Ollama models and connect to the other model services ahead of the next command
+
+    Covers every service a command can use: the provider chain (or the
+    configured language_model) and the hedge provider.
+    """
+    try:
+        import time
+        from git_sage.core.ollama_warmup import warm_model
+        from git_sage.core.providers import create_model, preconnect
+        from git_sage.core.provider_health import describe_provider
+        from git_sage.core.token_budget import get_context_window
+        
+        config_manager = ConfigManager()
+        if keep_alive is None:
+            keep_alive = config_manager.get_keep_alive()
+        elif keep_alive.lstrip('-').isdigit():
+            keep_alive = int(keep_alive)
+        
+        failed = 0
+        for provider in AIProcessor(config_manager, use_cache=False).routable_providers():
+            click.echo(f"Warming up {describe_provider(provider)} at {provider['endpoint']}...")
+            try:
+                if provider['language_model'] == 'ollama':
+                    num_ctx = get_context_window('ollama', provider['model'], config_manager.get_context_window())
+                    elapsed = warm_model(provider['endpoint'], provider['model'], keep_alive, num_ctx)
+                    click.echo(f"Model ready after {elapsed:.2f}s (keep_alive: {keep_alive})")
+                else:
+                    started = time.perf_counter()
+                    model = create_model(provider['language_model'], provider['model'], provider['endpoint'],
+                                         provider['api_key'], config_manager)
+                    preconnect(model)
+                    click.echo(f"Connected after {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                click.echo(f"Error: {str(e)}", err=True)
+                failed += 1
+        if failed:
+            sys.exit(1)
+        
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+
 @cli.command()
 def init_prompts():
     """Initialize default prompt files in user's directory"""
@@ -317,13 +559,16 @@ def init_prompts():
 @click.option('--dry-run', '-n', is_flag=True, help='仅显示PR信息，不创建')
 @click.option('--no-verify', '-nv', is_flag=True, help='设置QA部分为None')
 @click.option('--no-edit', is_flag=True, help='跳过编辑步骤，直接使用AI生成的内容')
+@tracing.traced("gsg pr")
 def pr(dry_run, no_verify, no_edit):
     """生成并创建 Pull Request"""
     try:
         # Initialize modules
         config_manager = ConfigManager()
-        git_ops = GitOperations()
         ai_processor = AIProcessor(config_manager)
+        # Load the model while git collects the branch history
+        ai_processor.prewarm()
+        git_ops = GitOperations()
         
         # Check if in git repository
         if not git_ops.is_git_repository():
@@ -353,7 +598,8 @@ def pr(dry_run, no_verify, no_edit):
         
         # Generate PR content using AI
         click.echo("正在生成 PR 内容...")
-        pr_content = ai_processor.generate_pr_content(commits, diff_content, ticket, no_verify)
+        pr_content = ai_processor.generate_pr_content(commits, diff_content, ticket, no_verify,
+                                                     commit_diff_loader=git_ops.get_commit_diffs)
         
         # Allow user to edit PR content (unless --no-edit flag is used)
         if not no_edit and not dry_run:
@@ -410,7 +656,8 @@ def pr(dry_run, no_verify, no_edit):
                         '--title', pr_content['title'],
                         '--body', pr_content['description']
                     ]
-                    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+                    with tracing.span("gh.pr_create"):
+                        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
                     click.echo("Pull Request 创建成功！")
                     click.echo(f"PR URL: {result.stdout.strip()}")
                 except subprocess.CalledProcessError as e:
@@ -431,5 +678,234 @@ def pr(dry_run, no_verify, no_edit):
         click.echo(f"错误: {str(e)}", err=True)
         sys.exit(1)
 
+@cli.command()
+@click.argument('repos', nargs=-1, required=True)
+@click.option('--task', '-t', 'tasks', type=click.Choice(['commit', 'review']), multiple=True,
+              help='What to generate for each repository; repeat for both (defaults to commit)')
+@click.option('--rule', default='common', help='Review rule prompt, as in gsg v (defaults to common)')
+@click.option('--branch', is_flag=True, help='Review the branch diff against the main branch instead of staged changes')
+@click.option('--workers', '-w', type=int, default=None, help='Processes collecting diffs (defaults to the CPU count)')
+@click.option('--jobs', '-j', type=int, default=None, help='Model calls in flight across all repositories (defaults to max_concurrency)')
+@click.option('--output', '-o', type=click.File('w'), default='-', help='Write JSON lines to this file instead of stdout')
+@click.option('--no-cache', is_flag=True, help='Always call the model, ignoring cached responses')
+@tracing.traced("gsg batch")
+def batch(repos, tasks, rule, branch, workers, jobs, output, no_cache):
+    """Generate commit messages and reviews for many repositories
+
+    REPOS are repository paths or glob patterns (e.g. 'services/*'). One JSON
+    line is written per repository as it finishes, followed by a summary line.
+    Commit messages are only generated, nothing is committed.
+    """
+    import asyncio
+    import json
+    from concurrent.futures import ProcessPoolExecutor
+    from git_sage.core.batch import BatchRunner, expand_repo_paths
+    
+    try:
+        paths = expand_repo_paths(list(repos))
+        if not paths:
+            click.echo("No repositories matched.", err=True)
+            sys.exit(1)
+        
+        def emit(record):
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+        
+        # Progress printed by the core modules goes to stderr so stdout stays JSON lines
+        with contextlib.redirect_stdout(sys.stderr):
+            workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                config_manager = ConfigManager()
+                ai_processor = AIProcessor(config_manager, use_cache=not no_cache, stream=False,
+                                           notify=lambda message: click.echo(message, err=True))
+                runner = BatchRunner(ai_processor, list(tasks) or ['commit'], rule, branch, jobs)
+                # Start the worker processes before any background threads exist
+                futures = runner.submit_all(pool, paths)
+                ai_processor.prewarm()
+                ai_processor.start_model_setup()
+                summary = asyncio.run(runner.run(futures, emit))
+        
+        emit({"summary": summary})
+        click.echo(f"{summary['repos']} repositories in {summary['wall_s']:.2f}s "
+                   f"({summary['ok']} ok, {summary['skipped']} skipped, {summary['errors']} errors; "
+                   f"{summary['sequential_estimate_s']:.2f}s one at a time)", err=True)
+        if summary['errors']:
+            sys.exit(1)
+    
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.command('log-rewrite')
+@click.argument('rev_range')
+@click.option('--jobs', '-j', type=int, default=None, help='Model calls in flight (defaults to max_concurrency)')
+@click.option('--output', '-o', type=click.Path(dir_okay=False, writable=True), default=None,
+              help='Write the SHA -> message mapping as JSON to this file (defaults to stdout)')
+@click.option('--apply', 'apply_messages', is_flag=True, help='Rewrite the commits with the new messages using git filter-branch')
+@click.option('--yes', '-y', is_flag=True, help='Do not ask before rewriting history')
+@click.option('--restart', is_flag=True, help='Discard the checkpoint of this range and start over')
+@click.option('--no-cache', is_flag=True, help='Always call the model, ignoring cached responses')
+@tracing.traced("gsg log-rewrite")
+def log_rewrite(rev_range, jobs, output, apply_messages, yes, restart, no_cache):
+    """Generate commit messages for the existing commits in REV_RANGE
+
+    REV_RANGE is anything git rev-list accepts, e.g. main..feature. Merge
+    commits are left out. Progress is checkpointed under .git/git-sage, so
+    running the same command again after an interruption resumes it.
+    """
+    import json
+    from git_sage.core.log_rewrite import RewriteCheckpoint, run_rewrite
+    
+    try:
+        git_ops = GitOperations()
+        shas = git_ops.get_range_commits(rev_range)
+        if not shas:
+            click.echo(f"No commits in {rev_range}.", err=True)
+            return
+        
+        checkpoint = RewriteCheckpoint.for_range(git_ops.get_git_dir(), shas)
+        if restart:
+            checkpoint.discard()
+        resumed = len(checkpoint.load())
+        if resumed:
+            click.echo(f"Resuming: {resumed} of {len(shas)} commits already done ({checkpoint.path})", err=True)
+        
+        config_manager = ConfigManager()
+        ai_processor = AIProcessor(config_manager, use_cache=not no_cache, stream=False,
+                                   notify=lambda message: click.echo(message, err=True))
+        ai_processor.prewarm()
+        ai_processor.start_model_setup()
+        
+        def progress(done, total, sha, message, error):
+            summary = f"failed: {error}" if error else message.split('\n', 1)[0]
+            click.echo(f"[{done}/{total}] {sha[:7]} {summary}", err=True)
+        
+        # Core progress output would interleave with the per-commit lines
+        with contextlib.redirect_stdout(sys.stderr):
+            result = run_rewrite(ai_processor, git_ops, shas, checkpoint, jobs, progress)
+        messages, failures = result['messages'], result['failures']
+        click.echo(f"Generated {len(messages) - resumed} messages in {result['elapsed']:.2f}s "
+                   f"({result['concurrency']} concurrent, {resumed} from checkpoint, {len(failures)} failed)", err=True)
+        
+        mapping = json.dumps(messages, ensure_ascii=False, indent=2)
+        if output:
+            with open(output, 'w', encoding='utf-8') as f:
+                f.write(mapping + '\n')
+            click.echo(f"Mapping written to {output}", err=True)
+        elif not apply_messages:
+            click.echo(mapping)
+        
+        if failures:
+            click.echo(f"{len(failures)} commits failed; run the command again to retry them.", err=True)
+            sys.exit(1)
+        
+        if apply_messages:
+            if git_ops.is_dirty():
+                click.echo("Error: commit or stash your changes before rewriting history.", err=True)
+                sys.exit(1)
+            if not yes and not click.confirm(f"Rewrite {len(messages)} commits in {rev_range}?", default=False):
+                click.echo("Rewrite cancelled. Messages are kept in the checkpoint.", err=True)
+                return
+            click.echo("Rewriting commits with git filter-branch...", err=True)
+            git_ops.rewrite_messages(rev_range, checkpoint.write_message_files(messages))
+            checkpoint.discard()
+            click.echo("History rewritten; the previous refs are kept under refs/original/.", err=True)
+    
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.group()
+def daemon():
+    """Keep a warm gsg process running so commands start instantly"""
+    pass
+
+@daemon.command()
+@click.option('--foreground', is_flag=True, help='Run in this terminal instead of in the background')
+def start(foreground):
+    """Start the daemon; later gsg commands are forwarded to it"""
+    import time
+    from git_sage.cli import client
+    from git_sage.cli.daemon import LOG_PATH, serve
+
+    try:
+        probe = client.connect(timeout=1.0)
+        if probe is not None:
+            probe.close()
+            click.echo(f"The gsg daemon is already running ({client.socket_path()})")
+            return
+        if foreground:
+            serve()
+            return
+
+        log_path = os.path.expanduser(LOG_PATH)
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, 'a', encoding='utf-8') as log:
+            process = subprocess.Popen([sys.executable, '-m', 'git_sage.cli.daemon'], stdin=subprocess.DEVNULL,
+                                       stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            probe = client.connect(timeout=1.0)
+            if probe is not None:
+                probe.close()
+                click.echo(f"gsg daemon started (pid {process.pid}, socket {client.socket_path()})")
+                return
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+        click.echo(f"Error: The daemon did not start; see {log_path}", err=True)
+        sys.exit(1)
+
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+
+def _daemon_request(control: str) -> Optional[Dict]:
+    """Send a control message to the daemon; None when it is not running"""
+    from git_sage.cli import client
+
+    sock = client.connect(timeout=5.0)
+    if sock is None:
+        return None
+    with sock:
+        client.send_message(sock, {"control": control})
+        reply, _ = client.receive_message(sock)
+    return reply
+
+@daemon.command()
+def stop():
+    """Stop the running daemon"""
+    try:
+        if _daemon_request('stop') is None:
+            click.echo("The gsg daemon is not running")
+            return
+        click.echo("gsg daemon stopped")
+
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+
+@daemon.command()
+def status():
+    """Show whether the daemon is running and what it keeps warm"""
+    try:
+        reply = _daemon_request('status')
+        if reply is None:
+            click.echo("The gsg daemon is not running; commands run in-process")
+            return
+        click.echo("\n=== gsg daemon ===")
+        click.echo(f"PID: {reply['pid']}")
+        click.echo(f"Socket: {reply['socket']}")
+        click.echo(f"Uptime: {reply['uptime_s']:.0f}s")
+        click.echo(f"Commands served: {reply['commands']}")
+        click.echo(f"Model clients: {reply['model_clients']}")
+        click.echo(f"Open repositories: {len(reply['repos'])}")
+        for repo in reply['repos']:
+            click.echo(f"  {repo}")
+
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+
 if __name__ == '__main__':
     cli()
@@ -1,6 +1,7 @@
+import copy
 import os
 import yaml
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 class ConfigManager:
     DEFAULT_CONFIG = {
@@ -25,10 +26,30 @@ class ConfigManager:
     GEMINI_ENDPOINT = "https://generativelanguage.googleapis.com/v1beta"
     MODELSCOPE_ENDPOINT = "https://api-inference.modelscope.cn/v1/chat/completions"
     
+    DEFAULT_ENDPOINTS = {
+        "ollama": OLLAMA_ENDPOINT,
+        "openrouter": OPENROUTER_ENDPOINT,
+        "deepseek": DEEPSEEK_ENDPOINT,
+        "gemini": GEMINI_ENDPOINT,
+        "modelscope": MODELSCOPE_ENDPOINT
+    }
+    
+    # Parsed config files by path, reused while their mtime and size are
+    # unchanged (a gsg daemon parses the file once for many commands)
+    _loaded: Dict[str, Tuple[Tuple[int, int], Dict]] = {}
+    
     def __init__(self):
         self.config_path = os.path.expanduser("~/.git-sage/config.yml")
         self.config = self.load_config()
     
+    def config_signature(self) -> Optional[Tuple[int, int]]:
+        """Get the mtime and size of the config file, or None if it does not exist"""
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
     def load_config(self) -> Dict:
         """Load configuration file, create default config if it doesn't exist"""
         if not os.path.exists(self.config_path):
@@ -39,9 +60,14 @@ class ConfigManager:
             return initial_config
         
         try:
+            signature = self.config_signature()
+            cached = self._loaded.get(self.config_path)
+            if cached is not None and cached[0] == signature:
+                return copy.deepcopy(cached[1])
             with open(self.config_path, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-                return {**self.DEFAULT_CONFIG, **(config or {})}
+                config = {**self.DEFAULT_CONFIG, **(yaml.safe_load(f) or {})}
+            self._loaded[self.config_path] = (signature, config)
+            return copy.deepcopy(config)
         except Exception as e:
             print(f"Warning: Failed to load config file: {e}")
             return self.DEFAULT_CONFIG
@@ -72,6 +98,164 @@ class ConfigManager:
         """Get API key"""
         return self.config.get("api_key", "ollama")
     
+    def get_cache_enabled(self) -> bool:
+        """Get whether model responses are cached on disk"""
+        return bool(self.config.get("cache_enabled", True))
+    
+    def get_cache_max_size_mb(self) -> float:
+        """Get maximum size of the response cache in megabytes"""
+        return float(self.config.get("cache_max_size_mb", 50))
+    
+    def get_cache_max_age_days(self) -> float:
+        """Get maximum age of a cached response in days"""
+        return float(self.config.get("cache_max_age_days", 30))
+    
+    def get_stream(self) -> bool:
+        """Get whether model output is streamed to the terminal as it is generated"""
+        return bool(self.config.get("stream", True))
+    
+    def get_connect_timeout(self) -> float:
+        """Get timeout in seconds for opening a connection to the model service"""
+        return float(self.config.get("connect_timeout", 10))
+    
+    def get_read_timeout(self) -> float:
+        """Get timeout in seconds for waiting on model service data"""
+        return float(self.config.get("read_timeout", 60))
+    
+    def get_compress_requests(self) -> bool:
+        """Get whether large request bodies are gzip-compressed"""
+        return bool(self.config.get("compress_requests", False))
+    
+    def get_usage_ledger(self) -> bool:
+        """Get whether model calls are recorded in the local usage ledger"""
+        return bool(self.config.get("usage_ledger", True))
+    
+    def get_token_prices(self) -> Dict[str, Dict[str, float]]:
+        """Get USD prices per million input/output tokens by model name, used to estimate costs"""
+        return self.config.get("token_prices") or {}
+    
+    def get_prompt_caching(self) -> bool:
+        """Get whether prompts mark their system prefix for provider-side caching"""
+        return bool(self.config.get("prompt_caching", True))
+    
+    def get_keep_alive(self) -> Union[str, int]:
+        """Get how long Ollama keeps the model loaded after a request (a duration such as "30m", seconds, or -1 for forever)"""
+        return self.config.get("keep_alive", "30m")
+    
+    def get_prewarm(self) -> bool:
+        """Get whether Ollama models are loaded in the background as soon as a command starts"""
+        return bool(self.config.get("prewarm", True))
+    
+    def get_preconnect(self) -> bool:
+        """Get whether the model service connection is opened while git collects changes"""
+        return bool(self.config.get("preconnect", True))
+    
+    def get_hedge_provider(self) -> str:
+        """Get the secondary language model service for hedged requests (empty disables hedging)"""
+        return self.config.get("hedge_provider", "") or ""
+    
+    def get_hedge_model(self) -> str:
+        """Get the model name used with the hedge provider (defaults to model)"""
+        return self.config.get("hedge_model", "") or self.get_model()
+    
+    def get_hedge_endpoint(self) -> str:
+        """Get the endpoint of the hedge provider (defaults to endpoint)"""
+        return self.config.get("hedge_endpoint", "") or self.get_model_endpoint()
+    
+    def get_hedge_api_key(self) -> str:
+        """Get the API key of the hedge provider (defaults to api_key)"""
+        return self.config.get("hedge_api_key", "") or self.get_api_key()
+    
+    def get_hedge_after(self) -> float:
+        """Get seconds without a first token after which the hedge provider is also asked"""
+        return float(self.config.get("hedge_after", 10))
+    
+    def get_providers(self) -> List[Dict[str, str]]:
+        """
+        Get the configured provider chain (empty when only language_model is used)
+        
+        Each entry names a language_model; model, endpoint and api_key default
+        to that service's default model and endpoint and to the top-level api_key.
+        """
+        providers = []
+        for index, entry in enumerate(self.config.get("providers") or []):
+            if not isinstance(entry, dict) or not entry.get("language_model"):
+                # The entry itself is not shown, it may hold an api_key
+                raise ValueError(f"Invalid providers entry {index} in {self.config_path}: "
+                                 f"each entry needs a language_model")
+            language_model = entry["language_model"]
+            providers.append({
+                "language_model": language_model,
+                "model": entry.get("model") or self.DEFAULT_MODELS.get(language_model, self.get_model()),
+                "endpoint": entry.get("endpoint") or self.DEFAULT_ENDPOINTS.get(language_model, self.get_model_endpoint()),
+                "api_key": entry.get("api_key") or self.get_api_key(),
+            })
+        return providers
+    
+    def get_health_window(self) -> int:
+        """Get number of recent calls per provider used for latency and error rates"""
+        return int(self.config.get("health_window", 20))
+    
+    def get_breaker_failures(self) -> int:
+        """Get consecutive failures after which a provider's circuit opens"""
+        return int(self.config.get("breaker_failures", 3))
+    
+    def get_breaker_cooldown(self) -> float:
+        """Get seconds an open circuit skips its provider before a trial call"""
+        return float(self.config.get("breaker_cooldown", 60))
+    
+    def get_context_window(self) -> int:
+        """Get configured context window override in tokens (0 uses the built-in model registry)"""
+        return int(self.config.get("context_window", 0) or 0)
+    
+    def get_max_output_tokens(self) -> int:
+        """Get number of context window tokens reserved for the model's response"""
+        return int(self.config.get("max_output_tokens", 2048))
+    
+    def get_normalize_diff(self) -> bool:
+        """Get whether diffs are normalized to save prompt tokens"""
+        return bool(self.config.get("normalize_diff", True))
+    
+    def get_diff_context_lines(self) -> int:
+        """Get the widest context (in lines) kept around small edits in normalized diffs"""
+        return int(self.config.get("diff_context_lines", 3))
+    
+    def get_max_concurrency(self) -> int:
+        """Get maximum number of model calls run in parallel"""
+        return max(1, int(self.config.get("max_concurrency", 4)))
+    
+    def get_review_shard_tokens(self) -> int:
+        """Get approximate size in tokens of one shard for parallel reviews"""
+        return int(self.config.get("review_shard_tokens", 4000))
+    
+    def get_pr_map_reduce_threshold(self) -> int:
+        """Get branch diff size (in characters) above which PRs are generated from chunk summaries"""
+        return int(self.config.get("pr_map_reduce_threshold", 40000))
+    
+    def get_pr_strategy(self) -> str:
+        """Get how PR content is generated: auto, single, map_reduce or incremental"""
+        return self.config.get("pr_strategy", "auto")
+    
+    def get_pr_chunk_size(self) -> int:
+        """Get maximum size (in characters) of one diff chunk when summarizing large PRs"""
+        return int(self.config.get("pr_chunk_size", 12000))
+    
+    def get_replay_mode(self) -> str:
+        """Get whether the replay model records real responses ("record") or serves them ("replay")"""
+        return self.config.get("replay_mode", "replay")
+    
+    def get_replay_provider(self) -> str:
+        """Get the real language model service wrapped while recording"""
+        return self.config.get("replay_provider", "ollama")
+    
+    def get_replay_path(self) -> str:
+        """Get path of the compressed recording used by the replay model"""
+        return self.config.get("replay_path", "~/.git-sage/replay/recording.jsonl.gz")
+    
+    def get_replay_latency_scale(self) -> float:
+        """Get multiplier applied to recorded latencies when replaying (0 disables delays)"""
+        return float(self.config.get("replay_latency_scale", 1.0))
+    
     def update_config(self, key: str, value: str) -> None:
         """Update configuration item"""
         # 如果是更新language_model
@@ -1,96 +1,795 @@
-from typing import Dict, Union, List
-from langchain_ollama import OllamaLLM
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-import os
-
-# Import new AI services
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-except ImportError:
-    ChatGoogleGenerativeAI = None
-
-try:
-    from .modelscope_wrapper import ModelScopeInferenceChatModel
-except ImportError:
-    ModelScopeInferenceChatModel = None
+import sys
+import time
+import asyncio
+import inspect
+import threading
+import functools
+import contextvars
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from .diff_utils import split_diff_by_file, group_file_diffs
+from .providers import create_model, preconnect
+from .cancellation import track_http_clients
+from .hedging import HedgedRequest, HedgeStats
+from .provider_health import ProviderHealth, describe_provider, provider_key
+from .response_cache import ResponseCache
+from .usage_ledger import get_ledger
+from . import tracing
+from .diff_normalizer import normalize_diff
+from .token_budget import estimate_tokens, fit_diff_to_budget, get_context_window
+
+# Bump whenever the commit/PR prompt templates change so cached responses
+# generated from an older template are not reused
+PROMPT_VERSION = "2"
+
+# Facts about the next model call known only where its prompt is built (diff
+# size, response cache outcome), consumed when the call is recorded in the
+# usage ledger. Per thread and per asyncio task, so concurrent calls do not mix,
+# and scoped to the request that set them (see scoped_call_notes): pool threads
+# and tasks run many requests, and a failed or never-made call leaves notes behind.
+_call_notes: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("call_notes", default=None)
+
+
+def _note_call(**notes: Any) -> None:
+    _call_notes.set({**(_call_notes.get() or {}), **notes})
+
+
+def _take_call_notes() -> Dict[str, Any]:
+    notes = _call_notes.get() or {}
+    _call_notes.set(None)
+    return notes
+
+
+def scoped_call_notes(func: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Decorator that gives each call of a function its own call notes
+    
+    For functions that build a prompt and make the model call for it; notes
+    left over when the function returns or raises are discarded instead of
+    reaching the next call made in the same thread or task.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            token = _call_notes.set(None)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _call_notes.reset(token)
+        return async_wrapper
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _call_notes.set(None)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _call_notes.reset(token)
+    return wrapper
+
+
+# Set in the worker threads that build model clients for the async paths
+_async_caller: contextvars.ContextVar[bool] = contextvars.ContextVar("async_caller", default=False)
+
+
+def _in_async_path() -> bool:
+    """Check whether the caller runs on an event loop (or on its behalf), where printing is not wanted"""
+    if _async_caller.get():
+        return True
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class Prompt(NamedTuple):
+    """
+    A prompt split for provider prefix caching
+    
+    system is byte-identical across calls of the same kind, so Ollama's KV
+    cache and OpenAI-compatible prompt caching can reuse it; everything that
+    varies per call (language, ticket, diff) goes in user.
+    """
+    system: str
+    user: str
+
+
+PromptInput = Union[str, Prompt]
+
+
+def _prompt_text(prompt: PromptInput) -> str:
+    """Flatten a prompt for token estimates"""
+    return prompt if isinstance(prompt, str) else f"{prompt.system}\n\n{prompt.user}"
+
+
+# System prompts are module constants with no per-call interpolation: any
+# change to them invalidates every provider-side prefix cache
+COMMIT_SYSTEM_PROMPT = """IMPORTANT: You MUST respond in the language given as "Response language" in the request.
+For en: Use English only
+For zh-CN: Use Simplified Chinese (简体中文) only
+For zh-TW: Use Traditional Chinese (繁體中文) only
+
+Your response format MUST be:
+type: tag
+subject: brief description
+body: detailed explanation
+    - bullet point 1
+    - bullet point 2
+    ...
+
+All text in the response (including type, subject, and body) MUST be in the specified language.
+
+You are a professional code reviewer and commit message generator. Please carefully analyze the git diff content in the request and generate a structured commit message. Follow this thought process:
+
+1. Initial Understanding Phase
+- Quick overview of the entire diff to form a general impression
+- Identify main modified files and modules
+- Consider the potential purpose and impact of these changes
+
+2. Deep Analysis Phase
+- Detailed examination of each code change
+- Analyze technical characteristics of changes (new features, bug fixes, refactoring, etc.)
+- Consider the impact level of these changes on the system
+- Think about backward compatibility implications
+
+3. Multi-dimensional Evaluation
+- Functional Perspective: What new features are implemented or what issues are fixed?
+- Maintainability Perspective: Is code quality improved? Is technical debt addressed?
+- Compatibility Perspective: Are there any breaking changes?
+
+4. Verification and Summary
+- Double-check if all changes are correctly understood
+- Confirm if the chosen change type tag is most accurate
+- Verify if the description completely and accurately reflects the essence of changes
+
+IMPORTANT WRITING STYLE:
+Write commit messages in an active, direct style. Avoid self-referential phrases like "this commit", "this change", "this update", "this modification". Instead, describe what the change does directly using imperative mood.
+
+Examples:
+- Bad: "This commit adds user authentication"
+- Good: "Add user authentication"
+- Bad: "This change fixes a bug in user login" 
+- Good: "Fix user login validation issue"
+- Bad: "This update improves performance"
+- Good: "Improve database query performance"
+
+Commit Tags Explanation (Following Compass Conventional Commit Standards):
+
+Patch Version (PATCH) Tags:
+- fix: For bug fixes
+- build: Changes to build process only
+- maint/maintenance: For small maintenance tasks such as tech-debt cleanup, refactoring, build-process changes, and non-breaking dependency updates (bug fixes, security fixes, etc.)
+- test: Used for application e2e tests, which will build a new patch version to be deployed and run against e2e gates in pipelines
+- patch: Generic tag to denote a patch change when other tags are not applicable
+
+Minor Version (MINOR) Tags:
+- feat/feature/new: Implemented a new feature
+- minor: Generic tag to denote a minor change when other tags are not applicable
+- update: A backwards-compatible enhancement to an existing feature
+
+Major Version (MAJOR) Tags:
+- breaking: For a backwards-incompatible enhancement or feature
+- major: Generic tag to denote a major change when other tags are not applicable
+
+No Version Update (NO-OP) Tags:
+- docs: Changes to documentation only
+- chore: For any other changes that are not files that could affect a real environment, such as code comments, changes to files that are not in a package or app, unit tests, etc. Note: do not use Chore when updating e2e tests for applications, use Test instead
+"""
+
+PR_SYSTEM_PROMPT = """IMPORTANT: You MUST respond in the language given as "Response language" in the request.
+For en: Use English only
+For zh-CN: Use Simplified Chinese (简体中文) only
+For zh-TW: Use Traditional Chinese (繁體中文) only
+
+Your response format MUST be:
+title: PR_TITLE
+description: PR_DESCRIPTION
+
+All text in the response MUST be in the specified language.
+
+You are a professional software developer creating a Pull Request. Please analyze the information in the request and generate an appropriate PR title and description.
+
+IMPORTANT: Follow these strict formatting rules for the PR title:
+- Format: {TYPE}:[{TICKET}] {DESCRIPTION}
+- TYPE should be one of: Fix, Build, Maint, Maintenance, Test, Patch, Feat, Feature, New, Minor, Update, Breaking, Major, Docs, Chore
+- TICKET: Use the provided ticket number if available
+- DESCRIPTION: Brief, clear description of the change
+
+PR Description Requirements (MUST follow this exact three-section structure):
+
+### Description
+{Brief summary of what this PR does (1-2 sentences)}
+- {Detailed technical change 1}
+- {Detailed technical change 2}
+- {Detailed technical change 3}
+- {Detailed technical change 4 (if needed)}
+- {Detailed technical change 5 (if needed)}
+
+### Related issues or context
+- https://compass-tech.atlassian.net/browse/{TICKET}
+
+### QA
+{QA section, see below}
+
+QA section:
+- If the request gives "QA section: [QA: None]", write exactly [QA: None]
+- Otherwise decide from the code changes:
+  - If there are UI changes or user-visible functionality changes: [QA: Verify] + provide simple verification steps
+  - If no UI changes (backend logic, refactoring, config, etc.): [QA: None]
+
+QA Decision Rules:
+- UI components, pages, styles, user interactions → [QA: Verify]
+- API endpoints affecting frontend → [QA: Verify]  
+- Pure backend logic, database changes, refactoring, config → [QA: None]
+- Tests, docs, build scripts → [QA: None]
+
+Analysis Steps:
+1. Read branch commit messages to understand development intent
+2. Analyze code diff to confirm actual changes and impact scope
+3. Determine the most appropriate PR type
+4. Decide QA section based on whether changes are user-visible
+5. Generate description following the three-section structure
+"""
+
+CHUNK_SUMMARY_SYSTEM_PROMPT = """You are summarizing one part of a larger pull request diff. Another step will combine all parts into the final PR description.
+
+Summarize the technical changes in the diff in the request as at most 6 concise bullet points.
+- Describe what changed and its purpose, not line-by-line edits
+- Mention user-visible behavior changes (UI, API responses) explicitly
+- Respond in the language given as "Response language", with bullet points only and no preamble
+"""
+
+SUMMARY_MERGE_SYSTEM_PROMPT = """You are condensing summaries of parts of a larger pull request. Another step will combine the condensed summaries into the final PR description.
+
+Merge the summaries in the request into at most 8 concise bullet points.
+- Keep user-visible behavior changes (UI, API responses) and breaking changes
+- Drop repetition and minor details
+- Respond in the language given as "Response language", with bullet points only and no preamble
+"""
+
+PR_STRATEGIES = ("auto", "single", "map_reduce", "incremental")
+
+# Rounds of merging summaries that do not fit the final PR prompt before the rest is cut
+MAX_SUMMARY_MERGE_ROUNDS = 3
+
+CHUNK_SUMMARIES_TITLE = "Change Summaries (the full diff was too large and was summarized in parts)"
+COMMIT_SUMMARIES_TITLE = "Commit Summaries (each commit of the branch was summarized separately, newest first)"
+
 
 class AIProcessor:
-    def __init__(self, config_manager):
+    def __init__(self, config_manager, use_cache: bool = True, stream: Optional[bool] = None,
+                 notify: Optional[Callable[[str], None]] = None):
         self.config_manager = config_manager
-        self.model = self._setup_model()
+        self._model = None
+        self._model_lock = threading.Lock()
+        # Pending background construction of the model client, see start_model_setup
+        self._model_setup: Optional[Future] = None
+        # Secondary model for hedged requests, created when a hedge first fires
+        self._hedge_model = None
+        self.last_hedge: Optional[HedgedRequest] = None
+        self._hedge_lock = threading.Lock()
+        self.hedge_stats = HedgeStats()
+        # Ordered provider chain with health tracking; empty without a providers list
+        self.providers = config_manager.get_providers()
+        self.provider_health = ProviderHealth.from_config(config_manager) if self.providers else None
+        self._models: Dict[str, Any] = {}
+        self._models_lock = threading.Lock()
+        # Token counts and time to first token of the most recent model call
+        self.last_usage: Optional[Dict[str, Any]] = None
+        # Render tokens in the terminal as they arrive
+        self.stream = config_manager.get_stream() if stream is None else stream
+        self.cache = None
+        if use_cache and config_manager.get_cache_enabled():
+            self.cache = ResponseCache.from_config(config_manager)
+        self.usage_ledger = get_ledger() if config_manager.get_usage_ledger() else None
+        # Receives progress notices instead of the terminal; async paths only report through it
+        self.notify = notify
     
-    def _setup_model(self) -> Union[OllamaLLM, ChatOpenAI]:
-        """Setup language model based on configuration"""
+    def _notify(self, message: str) -> None:
+        """Report progress to the notify callback, or print it when there is none and the caller is not async"""
+        if self.notify is not None:
+            self.notify(message)
+        elif not _in_async_path():
+            print(message)
+    
+    @property
+    def model(self) -> Any:
+        """Language model client, created on first use so cache hits never build it"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    if self._model_setup is not None:
+                        self._notify(f"Setting up model: {self._model_description()}")
+                        # Waits for the background setup; re-raises its error, if any
+                        self._model = self._model_setup.result()
+                    else:
+                        self._model = self._setup_model()
+        return self._model
+    
+    async def amodel(self) -> Any:
+        """Async counterpart of model: a client still to be built is built on a worker thread"""
+        return await self._amodel_for(None)
+    
+    def start_model_setup(self) -> None:
+        """
+        Import the provider and build the model client on a background thread
+        
+        Lets a command overlap client construction (and, with preconnect, the
+        TCP/TLS handshake) with its git work. The first use of model waits for
+        the result. Runs on a daemon thread so a command that never calls the
+        model, e.g. on a cache hit, does not wait for it at exit.
+        """
+        # With a provider chain the model to use is only known once routed
+        if self._model is not None or self._model_setup is not None or self.provider_health is not None:
+            return
+        
         language_model = self.config_manager.get_language_model()
         model_name = self.config_manager.get_model()
         endpoint = self.config_manager.get_model_endpoint()
         api_key = self.config_manager.get_api_key()
+        connect = self.config_manager.get_preconnect()
         
-        print(f"Setting up model: {language_model} ({model_name}) at {endpoint}")
+        future: Future = Future()
         
-        if language_model == "ollama":
-            os.environ["OLLAMA_BASE_URL"] = endpoint
-            return OllamaLLM(
-                model=model_name,
-                base_url=endpoint,
-                temperature=0.5
-            )
-        elif language_model == "openrouter":
-            return ChatOpenAI(
-                model=model_name,
-                openai_api_key=api_key,
-                base_url=endpoint,
-                temperature=0.5,
-                default_headers={
-                    "HTTP-Referer": "git-sage-cli",
-                    "X-Title": "Git-Sage"
-                }
-            )
-        elif language_model == "deepseek":
-            return ChatOpenAI(
-                model=model_name,
-                openai_api_key=api_key,
-                base_url=endpoint,
-                temperature=0.5
-            )
-        elif language_model == "gemini":
-            if ChatGoogleGenerativeAI is None:
-                raise ValueError("Gemini support requires langchain-google-genai package. Install with: pip install langchain-google-genai")
-            return ChatGoogleGenerativeAI(
-                model=model_name,
-                google_api_key=api_key,
-                temperature=0.5
-            )
-        elif language_model == "modelscope":
-            if ModelScopeInferenceChatModel is None:
-                raise ValueError("ModelScope support is not available. Check modelscope_wrapper.py")
-            return ModelScopeInferenceChatModel(
-                model_name=model_name,
-                api_key=api_key,
-                base_url=endpoint,
-                temperature=0.5
+        def run() -> None:
+            try:
+                with tracing.span("model.setup", provider=language_model):
+                    model = self._track_if_hedged(
+                        create_model(language_model, model_name, endpoint, api_key, self.config_manager)
+                    )
+                    if connect:
+                        preconnect(model)
+                future.set_result(model)
+            except BaseException as e:
+                future.set_exception(e)
+        
+        self._model_setup = future
+        threading.Thread(target=run, name="model-setup", daemon=True).start()
+    
+    def prewarm(self) -> None:
+        """Start loading Ollama models in the background so they are ready by the time the prompt is"""
+        if not self.config_manager.get_prewarm():
+            return
+        ollama_providers = [provider for provider in self.routable_providers() if provider["language_model"] == "ollama"]
+        if not ollama_providers:
+            return
+        from .ollama_warmup import start_background_warmup
+        
+        for provider in ollama_providers:
+            start_background_warmup(
+                provider["endpoint"],
+                provider["model"],
+                self.config_manager.get_keep_alive(),
+                get_context_window("ollama", provider["model"], self.config_manager.get_context_window())
             )
+    
+    def _setup_model(self) -> Any:
+        """Setup language model based on configuration"""
+        language_model = self.config_manager.get_language_model()
+        model_name = self.config_manager.get_model()
+        endpoint = self.config_manager.get_model_endpoint()
+        api_key = self.config_manager.get_api_key()
+        
+        self._notify(f"Setting up model: {self._model_description()}")
+        
+        return self._track_if_hedged(create_model(language_model, model_name, endpoint, api_key, self.config_manager))
+    
+    def _model_description(self) -> str:
+        return (f"{self.config_manager.get_language_model()} ({self.config_manager.get_model()}) "
+                f"at {self.config_manager.get_model_endpoint()}")
+    
+    def _track_if_hedged(self, model: Any) -> Any:
+        """
+        Let hedged requests shut down the connection of the attempt that loses
+        
+        Only the models that race are tracked, and only with a hedge provider
+        configured; see cancellation.track_http_clients.
+        """
+        if self.config_manager.get_hedge_provider():
+            track_http_clients(model)
+        return model
+    
+    def _get_hedge_model(self) -> Any:
+        """Secondary model client for hedged requests, created on first use"""
+        with self._hedge_lock:
+            if self._hedge_model is None:
+                self._hedge_model = self._track_if_hedged(create_model(
+                    self.config_manager.get_hedge_provider(),
+                    self.config_manager.get_hedge_model(),
+                    self.config_manager.get_hedge_endpoint(),
+                    self.config_manager.get_hedge_api_key(),
+                    self.config_manager
+                ))
+            return self._hedge_model
+    
+    def _hedged_request(self, model: Any, messages: List[Any]) -> Optional[HedgedRequest]:
+        """A hedged request for the messages, or None when no hedge provider is configured"""
+        if not self.config_manager.get_hedge_provider():
+            self.last_hedge = None
+            return None
+        self.last_hedge = HedgedRequest(model, self._get_hedge_model, messages, self.config_manager.get_hedge_after(),
+                                        self._message_text, self.hedge_stats)
+        return self.last_hedge
+    
+    def _report_hedge(self, hedge: Optional[HedgedRequest]) -> None:
+        """Tell the user when a hedge fired and which provider won"""
+        if hedge is not None and hedge.hedged:
+            self._notify(f"No first token after {hedge.hedge_after:g}s, also asked {self.config_manager.get_hedge_provider()}; "
+                         f"{hedge.winner or 'neither'} answered first")
+    
+    def _to_messages(self, prompt: PromptInput) -> List[Any]:
+        """Convert a prompt into chat messages, marking the system prefix cacheable where supported"""
+        from langchain_core.messages import HumanMessage, SystemMessage
+        
+        if isinstance(prompt, str):
+            return [HumanMessage(content=prompt)]
+        
+        system_content: Any = prompt.system
+        if self._needs_cache_breakpoint():
+            # Anthropic and Gemini models behind OpenRouter only reuse a prefix
+            # that ends in an explicit cache breakpoint
+            system_content = [{"type": "text", "text": prompt.system, "cache_control": {"type": "ephemeral"}}]
+        return [SystemMessage(content=system_content), HumanMessage(content=prompt.user)]
+    
+    def _needs_cache_breakpoint(self) -> bool:
+        if not self.config_manager.get_prompt_caching():
+            return False
+        if self.config_manager.get_language_model() != "openrouter":
+            return False
+        return self.config_manager.get_model().startswith(("anthropic/", "google/gemini"))
+    
+    @staticmethod
+    def _message_text(message: Any) -> str:
+        """Text of a model result, which is a message for chat models and a string for LLMs"""
+        content = getattr(message, "content", message)
+        if isinstance(content, list):
+            return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+        return content or ""
+    
+    def _record_usage(self, message: Any, started: float, first_token_at: Optional[float], span: Any,
+                      provider: Optional[Dict[str, str]] = None, hedge: Optional[HedgedRequest] = None) -> Dict[str, Any]:
+        """Extract prompt/cached token counts and time to first token from a model result, and log the call"""
+        latency = time.perf_counter() - started
+        usage = dict(getattr(message, "usage_metadata", None) or {})
+        token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        cached = (usage.get("input_token_details") or {}).get("cache_read")
+        if cached is None:
+            # DeepSeek reports its context cache hits outside the OpenAI usage fields
+            cached = token_usage.get("prompt_cache_hit_tokens")
+        
+        record = {
+            "input_tokens": usage.get("input_tokens"),
+            "output_tokens": usage.get("output_tokens"),
+            "cached_tokens": cached,
+            "first_token_s": None if first_token_at is None else round(first_token_at - started, 3),
+        }
+        self.last_usage = record
+        span.add(**{key: value for key, value in record.items() if value is not None})
+        self._log_call(provider, hedge, record, latency)
+        return record
+    
+    def _log_call(self, provider: Optional[Dict[str, str]], hedge: Optional[HedgedRequest],
+                  usage: Optional[Dict[str, Any]], latency: float, error: Optional[str] = None) -> None:
+        """Add a model call to the usage ledger"""
+        # A failed attempt may be retried on another provider, which should still get the notes
+        notes = _take_call_notes() if error is None else (_call_notes.get() or {})
+        if self.usage_ledger is None:
+            return
+        if hedge is not None and hedge.winner == "secondary":
+            service, model_name = self.config_manager.get_hedge_provider(), self.config_manager.get_hedge_model()
+        elif provider is not None:
+            service, model_name = provider["language_model"], provider["model"]
         else:
-            raise ValueError(f"Unsupported language model service: {language_model}")
+            service, model_name = self.config_manager.get_language_model(), self.config_manager.get_model()
+        usage = usage or {}
+        self.usage_ledger.record(
+            provider=service, model=model_name,
+            prompt_tokens=usage.get("input_tokens"), completion_tokens=usage.get("output_tokens"),
+            cached_tokens=usage.get("cached_tokens"), first_token_s=usage.get("first_token_s"),
+            latency_s=round(latency, 3), cache=notes.get("cache"), diff_chars=notes.get("diff_chars"), error=error
+        )
+    
+    @staticmethod
+    def _format_usage(usage: Optional[Dict[str, Any]]) -> Optional[str]:
+        """One-line summary of prompt caching for the terminal, or None without usage data"""
+        if not usage or usage.get("input_tokens") is None:
+            return None
+        line = f"Prompt tokens: {usage['input_tokens']}"
+        if usage.get("cached_tokens") is not None:
+            line += f" ({usage['cached_tokens']} cached)"
+        if usage.get("first_token_s") is not None:
+            line += f", first token after {usage['first_token_s']:.2f}s"
+        return line
+    
+    def _routes(self) -> List[Optional[Dict[str, str]]]:
+        """Providers to try in order; [None] stands for the single configured model"""
+        if self.provider_health is None:
+            return [None]
+        routes, skipped = self.provider_health.route(self.providers)
+        for provider, reason in skipped:
+            self._notify(f"Skipping {describe_provider(provider)}: {reason}")
+        if not routes:
+            raise Exception("All configured language model services are unavailable")
+        return routes
+    
+    def _model_for(self, provider: Optional[Dict[str, str]]) -> Any:
+        """Model client for a provider of the chain, created on first use"""
+        if provider is None:
+            return self.model
+        key = provider_key(provider)
+        with self._models_lock:
+            if key not in self._models:
+                self._notify(f"Setting up model: {describe_provider(provider)} at {provider['endpoint']}")
+                self._models[key] = self._track_if_hedged(create_model(
+                    provider["language_model"], provider["model"], provider["endpoint"], provider["api_key"],
+                    self.config_manager
+                ))
+            return self._models[key]
+    
+    async def _amodel_for(self, provider: Optional[Dict[str, str]]) -> Any:
+        """Async counterpart of _model_for: a client still to be built is built on a worker thread"""
+        if provider is None and self._model is not None:
+            return self._model
+        if provider is not None and provider_key(provider) in self._models:
+            return self._models[provider_key(provider)]
+        
+        def build() -> Any:
+            # Runs in a copy of the caller's context, so this does not leak back
+            _async_caller.set(True)
+            return self._model_for(provider)
+        
+        return await asyncio.to_thread(build)
+    
+    def _record_outcome(self, provider: Optional[Dict[str, str]], started: float, error: Optional[Exception] = None) -> None:
+        """Add a call's latency or failure to the provider's health window, and failures to the usage ledger"""
+        if error is not None:
+            self._log_call(provider, None, None, time.perf_counter() - started, f"{type(error).__name__}: {error}")
+        if provider is not None:
+            self.provider_health.record(provider, time.perf_counter() - started,
+                                        None if error is None else f"{type(error).__name__}: {error}")
+    
+    def _fail_over(self, provider: Optional[Dict[str, str]], error: Exception, started: float,
+                   routes: List[Optional[Dict[str, str]]], attempt: int) -> bool:
+        """Record a failed call; True when another provider is left to try"""
+        self._record_outcome(provider, started, error)
+        if attempt >= len(routes):
+            return False
+        self._notify(f"{describe_provider(provider)} failed ({error}); trying {describe_provider(routes[attempt])}")
+        return True
+    
+    def _call_language_model(self, prompt: PromptInput) -> str:
+        """Call language model service, failing over along the provider chain"""
+        try:
+            messages = self._to_messages(prompt)
+            routes = self._routes()
+            
+            for attempt, provider in enumerate(routes, 1):
+                started = time.perf_counter()
+                try:
+                    model = self._model_for(provider)
+                    
+                    self._notify("Calling language model...")
+                    with tracing.span("model.invoke") as span:
+                        span.add_text("in", _prompt_text(prompt))
+                        started = time.perf_counter()
+                        hedge = self._hedged_request(model, messages)
+                        result = hedge.invoke() if hedge is not None else model.invoke(messages)
+                        response = self._message_text(result)
+                        span.add_text("out", response)
+                        usage_line = self._format_usage(
+                            self._record_usage(result, started, time.perf_counter(), span, provider, hedge)
+                        )
+                except Exception as e:
+                    if self._fail_over(provider, e, started, routes, attempt):
+                        continue
+                    raise
+                self._record_outcome(provider, started)
+                self._report_hedge(hedge)
+                if usage_line:
+                    self._notify(usage_line)
+                return response
+        except Exception as e:
+            raise Exception(f"Failed to call language model: {str(e)}") from e
+    
+    def _stream_language_model(self, prompt: PromptInput) -> Iterator[str]:
+        """
+        Call language model service, yielding text chunks as they are generated
+        
+        Fails over to the next provider of the chain only while nothing has
+        been yielded yet.
+        """
+        try:
+            messages = self._to_messages(prompt)
+            routes = self._routes()
+            
+            for attempt, provider in enumerate(routes, 1):
+                started = time.perf_counter()
+                first_token_at = None
+                try:
+                    model = self._model_for(provider)
+                    
+                    self._notify("Calling language model...")
+                    with tracing.span("model.stream") as span:
+                        span.add_text("in", _prompt_text(prompt))
+                        started = time.perf_counter()
+                        final = None
+                        hedge = self._hedged_request(model, messages)
+                        for chunk in hedge.stream() if hedge is not None else model.stream(messages):
+                            final = chunk if final is None else final + chunk
+                            text = self._message_text(chunk)
+                            if text:
+                                if first_token_at is None:
+                                    first_token_at = time.perf_counter()
+                                span.add_text("out", text)
+                                yield text
+                        self._record_usage(final, started, first_token_at, span, provider, hedge)
+                except Exception as e:
+                    if first_token_at is None:
+                        if self._fail_over(provider, e, started, routes, attempt):
+                            continue
+                    else:
+                        self._record_outcome(provider, started, e)
+                    raise
+                self._record_outcome(provider, started)
+                return
+        except Exception as e:
+            raise Exception(f"Failed to call language model: {str(e)}") from e
+    
+    async def _acall_language_model(self, prompt: PromptInput) -> str:
+        """Call language model service asynchronously, failing over along the provider chain"""
+        try:
+            messages = self._to_messages(prompt)
+            routes = self._routes()
+            
+            for attempt, provider in enumerate(routes, 1):
+                started = time.perf_counter()
+                try:
+                    model = await self._amodel_for(provider)
+                    with tracing.span("model.ainvoke") as span:
+                        span.add_text("in", _prompt_text(prompt))
+                        started = time.perf_counter()
+                        result = await model.ainvoke(messages)
+                        response = self._message_text(result)
+                        span.add_text("out", response)
+                        self._record_usage(result, started, time.perf_counter(), span, provider)
+                except Exception as e:
+                    if self._fail_over(provider, e, started, routes, attempt):
+                        continue
+                    raise
+                self._record_outcome(provider, started)
+                return response
+        except Exception as e:
+            raise Exception(f"Failed to call language model: {str(e)}") from e
     
-    def _call_language_model(self, prompt: str) -> str:
-        """Call language model service"""
+    async def _astream_language_model(self, prompt: PromptInput) -> AsyncIterator[str]:
+        """Call language model service asynchronously, yielding text chunks as they are generated"""
         try:
-            prompt_template = ChatPromptTemplate.from_template("{input}")
-            output_parser = StrOutputParser()
-            chain = prompt_template | self.model | output_parser
+            messages = self._to_messages(prompt)
+            routes = self._routes()
             
-            print("Calling language model...")
-            response = chain.invoke({"input": prompt})
-            return response
+            for attempt, provider in enumerate(routes, 1):
+                started = time.perf_counter()
+                first_token_at = None
+                try:
+                    model = await self._amodel_for(provider)
+                    with tracing.span("model.astream") as span:
+                        span.add_text("in", _prompt_text(prompt))
+                        started = time.perf_counter()
+                        final = None
+                        async for chunk in model.astream(messages):
+                            final = chunk if final is None else final + chunk
+                            text = self._message_text(chunk)
+                            if text:
+                                if first_token_at is None:
+                                    first_token_at = time.perf_counter()
+                                span.add_text("out", text)
+                                yield text
+                        self._record_usage(final, started, first_token_at, span, provider)
+                except Exception as e:
+                    if first_token_at is None:
+                        if self._fail_over(provider, e, started, routes, attempt):
+                            continue
+                    else:
+                        self._record_outcome(provider, started, e)
+                    raise
+                self._record_outcome(provider, started)
+                return
         except Exception as e:
             raise Exception(f"Failed to call language model: {str(e)}") from e
     
-    def _parse_response(self, response: str) -> Dict[str, str]:
-        """Parse AI response"""
-        lines = [line.strip() for line in response.strip().split('\n') if line.strip()]
+    def _render_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Echo chunks to the terminal as they pass through"""
+        rendered = False
+        for chunk in chunks:
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+            rendered = True
+            yield chunk
+        if rendered:
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+    
+    def _response_stream(self, prompt: PromptInput, kind: Optional[str] = None, *key_parts: str, stream: Optional[bool] = None) -> Iterator[str]:
+        """
+        Yield the model response in chunks
+        
+        With a kind and key parts, identical requests are served from the
+        response cache as one chunk, and a fully received response is stored
+        back. When streaming is enabled, chunks (including cached responses)
+        are rendered as they arrive.
+        """
+        render = self.stream if stream is None else stream
+        key = None
+        if self.cache is not None and kind is not None:
+            key = self._cache_key(kind, *key_parts)
+            cached = self.cache.get(key)
+            _note_call(cache="miss" if cached is None else "hit")
+            if cached is not None:
+                self._log_call(None, None, None, 0.0)
+                self._notify("Using cached response")
+                yield from self._render_stream([cached]) if render else [cached]
+                return
+        
+        if render:
+            chunks = self._render_stream(self._stream_language_model(prompt))
+        else:
+            chunks = iter([self._call_language_model(prompt)])
+        
+        received = []
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+        
+        if render:
+            # Printed once the rendered response is complete so it does not interleave with it
+            self._report_hedge(self.last_hedge)
+            usage_line = self._format_usage(self.last_usage)
+            if usage_line:
+                self._notify(usage_line)
+        
+        if key is not None:
+            self.cache.set(key, "".join(received))
+    
+    async def _aresponse_text(self, prompt: PromptInput, kind: Optional[str] = None, *key_parts: str) -> str:
+        """Async counterpart of _response_stream: the complete response, without terminal output"""
+        key = None
+        if self.cache is not None and kind is not None:
+            key = self._cache_key(kind, *key_parts)
+            cached = self.cache.get(key)
+            _note_call(cache="miss" if cached is None else "hit")
+            if cached is not None:
+                self._log_call(None, None, None, 0.0)
+                return cached
+        
+        received = []
+        async for chunk in self._astream_language_model(prompt):
+            received.append(chunk)
+        response = "".join(received)
+        
+        if key is not None:
+            self.cache.set(key, response)
+        return response
+    
+    @staticmethod
+    def _iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+        """Reassemble streamed chunks into complete lines"""
+        pending = ""
+        for chunk in chunks:
+            pending += chunk
+            if "\n" not in pending:
+                continue
+            *complete, pending = pending.split("\n")
+            for line in complete:
+                yield line
+        if pending:
+            yield pending
+    
+    def _parse_response(self, response: Union[str, Iterable[str]]) -> Dict[str, str]:
+        """Parse AI response, either a complete string or a stream of lines"""
+        if isinstance(response, str):
+            response = response.split('\n')
+        lines = (line.strip() for line in response if line.strip())
         analysis = {}
         body_lines = []
         in_body = False
@@ -145,9 +844,14 @@ class AIProcessor:
         
         return response
 
-    def _ensure_json_response(self, prompt: str) -> str:
+    def _ensure_json_response(self, prompt: PromptInput) -> str:
         """Ensure the response is in valid JSON format."""
-        system_prompt = """你是一个代码审查助手。请直接返回JSON格式的响应，不要添加markdown格式。
+        response = self._call_language_model(self._build_json_prompt(prompt))
+        return self._clean_response(response)
+
+    def _build_json_prompt(self, prompt: PromptInput) -> Prompt:
+        """Prefix the prompt with instructions to answer in bare JSON"""
+        json_instruction = """你是一个代码审查助手。请直接返回JSON格式的响应，不要添加markdown格式。
 确保响应包含以下字段：
 - status: "PASS" 或 "FAIL"
 - issues: 问题列表，每个问题包含 file、line、rule 和 description
@@ -156,119 +860,175 @@ class AIProcessor:
 即使没有发现问题，也要返回完整的 JSON 结构。
 注意：请直接返回 JSON，不要添加 ```json 或其他格式标记。"""
         
-        full_prompt = f"{system_prompt}\n\n{prompt}"
-        response = self._call_language_model(full_prompt)
-        return self._clean_response(response)
+        if isinstance(prompt, str):
+            return Prompt(json_instruction, prompt)
+        return Prompt(f"{json_instruction}\n\n{prompt.system}", prompt.user)
+
+    def get_context_window(self) -> int:
+        """Get the context window of the configured model in tokens"""
+        return get_context_window(
+            self.config_manager.get_language_model(),
+            self.config_manager.get_model(),
+            self.config_manager.get_context_window()
+        )
+    
+    def get_prompt_context_window(self) -> int:
+        """
+        Get the context window prompts are fitted to, in tokens
+        
+        A call can be served by any provider of the chain or by the hedge
+        provider, each with its own window (Ollama's num_ctx is capped), so
+        prompts are fitted to the smallest of them.
+        """
+        override = self.config_manager.get_context_window()
+        return min(get_context_window(provider["language_model"], provider["model"], override)
+                   for provider in self.routable_providers())
+    
+    def routable_providers(self) -> List[Dict[str, str]]:
+        """Every provider a call can be served by: the chain (or the single configured model) and the hedge provider"""
+        providers = list(self.providers) or [{
+            "language_model": self.config_manager.get_language_model(),
+            "model": self.config_manager.get_model(),
+            "endpoint": self.config_manager.get_model_endpoint(),
+            "api_key": self.config_manager.get_api_key(),
+        }]
+        if self.config_manager.get_hedge_provider():
+            hedge = {
+                "language_model": self.config_manager.get_hedge_provider(),
+                "model": self.config_manager.get_hedge_model(),
+                "endpoint": self.config_manager.get_hedge_endpoint(),
+                "api_key": self.config_manager.get_hedge_api_key(),
+            }
+            if provider_key(hedge) not in {provider_key(provider) for provider in providers}:
+                providers.append(hedge)
+        return providers
+    
+    @tracing.traced("ai.fit_diff")
+    def fit_diff(self, diff_content: str, prompt_overhead: PromptInput = "") -> str:
+        """
+        Shrink a diff to the token budget left in the context window
+        
+        The diff is normalized first (see diff_normalizer), which keeps every
+        change; only if it still does not fit are lines omitted.
+        
+        Args:
+            diff_content: The diff to place in the prompt
+            prompt_overhead: The rest of the prompt (everything except the diff)
+        """
+        if not diff_content:
+            return diff_content
+        _note_call(diff_chars=len(diff_content))
+        
+        budget = self._prompt_budget(prompt_overhead)
+        if self.config_manager.get_normalize_diff():
+            diff_content, normalized = normalize_diff(
+                diff_content, self.config_manager.get_diff_context_lines(), max(budget, 512)
+            )
+            tracing.add(tokens_raw=normalized["tokens_before"], tokens_normalized=normalized["tokens_after"])
+            if normalized["tokens_after"] < normalized["tokens_before"]:
+                saved = normalized["tokens_before"] - normalized["tokens_after"]
+                self._notify(f"Normalized diff: ~{normalized['tokens_before']} -> ~{normalized['tokens_after']} tokens "
+                             f"({saved * 100 // normalized['tokens_before']}% saved)")
+        fitted, stats = fit_diff_to_budget(diff_content, max(budget, 512))
+        if stats["lines_omitted"] or stats["files_dropped"]:
+            dropped = f", left out {stats['files_dropped']} files entirely" if stats["files_dropped"] else ""
+            self._notify(f"Diff is ~{stats['tokens_before']} tokens but only ~{budget} fit in the context window; "
+                         f"omitted {stats['lines_omitted']} lines from {stats['files_omitted']} files{dropped}")
+        return fitted
+    
+    def _prompt_budget(self, prompt_overhead: PromptInput) -> int:
+        """Tokens left in the context window for content added to the given prompt"""
+        return (self.get_prompt_context_window()
+                - self.config_manager.get_max_output_tokens()
+                - estimate_tokens(_prompt_text(prompt_overhead)))
+    
+    def _cache_key(self, kind: str, *parts: str) -> str:
+        """Build a response cache key from the request kind, model settings and content"""
+        return ResponseCache.make_key(
+            kind,
+            self.config_manager.get_language_model(),
+            self.config_manager.get_model(),
+            self.config_manager.get_language(),
+            *parts
+        )
+    
+    def get_response(self, prompt: PromptInput, cache_key_parts: Optional[List[str]] = None, stream: Optional[bool] = None) -> str:
+        """
+        Get response from language model
+        
+        Args:
+            prompt: The full prompt to send, or a Prompt with a stable system prefix
+            cache_key_parts: Inputs that uniquely determine the prompt; when given,
+                the response is served from and stored in the response cache
+            stream: Render tokens as they arrive (defaults to the configured setting)
+        """
+        try:
+            if cache_key_parts is not None:
+                return "".join(self._response_stream(prompt, "response", *cache_key_parts, stream=stream))
+            return "".join(self._response_stream(prompt, stream=stream))
+        except Exception as e:
+            raise Exception(f"Failed to get response: {str(e)}") from e
 
-    def get_response(self, prompt: str) -> str:
-        """Get response from language model"""
+    async def aget_response(self, prompt: PromptInput, cache_key_parts: Optional[List[str]] = None) -> str:
+        """Async counterpart of get_response; never renders to the terminal"""
         try:
-            return self._call_language_model(prompt)
+            if cache_key_parts is not None:
+                return await self._aresponse_text(prompt, "response", *cache_key_parts)
+            return await self._aresponse_text(prompt)
         except Exception as e:
             raise Exception(f"Failed to get response: {str(e)}") from e
 
+    @tracing.traced("ai.process_diff")
+    @scoped_call_notes
     def process_diff(self, diff_content: str) -> str:
         """Process git diff content and generate commit message"""
         try:
-            language = self.config_manager.get_language()
+            fitted = self.fit_diff(diff_content, self._build_commit_prompt(""))
+            prompt = self._build_commit_prompt(fitted)
             
-            # 构建系统角色指令
-            system_instruction = f"""IMPORTANT: You MUST respond in {language} language.
-For en: Use English only
-For zh-CN: Use Simplified Chinese (简体中文) only
-For zh-TW: Use Traditional Chinese (繁體中文) only
-
-Your response format MUST be:
-type: tag
-subject: brief description
-body: detailed explanation
-    - bullet point 1
-    - bullet point 2
-    ...
-
-All text in the response (including type, subject, and body) MUST be in the specified language ({language}).
-"""
+            # Call language model and parse the response line by line as it streams in;
+            # keyed on the diff actually sent, which depends on the budget and normalization
+            response_stream = self._response_stream(prompt, "commit", PROMPT_VERSION, fitted)
+            analysis = self._parse_response(self._iter_lines(response_stream))
             
-            prompt = f"""{system_instruction}
-
-You are a professional code reviewer and commit message generator. Please carefully analyze the following git diff content and generate a structured commit message. Follow this thought process:
-
-1. Initial Understanding Phase
-- Quick overview of the entire diff to form a general impression
-- Identify main modified files and modules
-- Consider the potential purpose and impact of these changes
-
-2. Deep Analysis Phase
-- Detailed examination of each code change
-- Analyze technical characteristics of changes (new features, bug fixes, refactoring, etc.)
-- Consider the impact level of these changes on the system
-- Think about backward compatibility implications
-
-3. Multi-dimensional Evaluation
-- Functional Perspective: What new features are implemented or what issues are fixed?
-- Maintainability Perspective: Is code quality improved? Is technical debt addressed?
-- Compatibility Perspective: Are there any breaking changes?
-
-4. Verification and Summary
-- Double-check if all changes are correctly understood
-- Confirm if the chosen change type tag is most accurate
-- Verify if the description completely and accurately reflects the essence of changes
-
-IMPORTANT WRITING STYLE:
-Write commit messages in an active, direct style. Avoid self-referential phrases like "this commit", "this change", "this update", "this modification". Instead, describe what the change does directly using imperative mood.
-
-Examples:
-- Bad: "This commit adds user authentication"
-- Good: "Add user authentication"
-- Bad: "This change fixes a bug in user login" 
-- Good: "Fix user login validation issue"
-- Bad: "This update improves performance"
-- Good: "Improve database query performance"
-
-Commit Tags Explanation (Following Compass Conventional Commit Standards):
-
-Patch Version (PATCH) Tags:
-- fix: For bug fixes
-- build: Changes to build process only
-- maint/maintenance: For small maintenance tasks such as tech-debt cleanup, refactoring, build-process changes, and non-breaking dependency updates (bug fixes, security fixes, etc.)
-- test: Used for application e2e tests, which will build a new patch version to be deployed and run against e2e gates in pipelines
-- patch: Generic tag to denote a patch change when other tags are not applicable
+            commit_message = self._format_commit_message(analysis)
+            print(f"\nGenerated commit message:\n{commit_message}")
+            
+            return commit_message
+            
+        except Exception as e:
+            raise Exception(f"Failed to process diff: {str(e)}") from e
 
-Minor Version (MINOR) Tags:
-- feat/feature/new: Implemented a new feature
-- minor: Generic tag to denote a minor change when other tags are not applicable
-- update: A backwards-compatible enhancement to an existing feature
+    @tracing.traced("ai.aprocess_diff")
+    @scoped_call_notes
+    async def aprocess_diff(self, diff_content: str) -> str:
+        """Async counterpart of process_diff; returns the commit message without printing it"""
+        try:
+            fitted = self.fit_diff(diff_content, self._build_commit_prompt(""))
+            prompt = self._build_commit_prompt(fitted)
+            response = await self._aresponse_text(prompt, "commit", PROMPT_VERSION, fitted)
+            return self._format_commit_message(self._parse_response(response))
+        except Exception as e:
+            raise Exception(f"Failed to process diff: {str(e)}") from e
 
-Major Version (MAJOR) Tags:
-- breaking: For a backwards-incompatible enhancement or feature
-- major: Generic tag to denote a major change when other tags are not applicable
+    def _format_commit_message(self, analysis: Dict[str, str]) -> str:
+        """Format parsed commit analysis as a commit message"""
+        return f"{analysis['type']}: {analysis['subject']}\n\n{analysis['body']}"
 
-No Version Update (NO-OP) Tags:
-- docs: Changes to documentation only
-- chore: For any other changes that are not files that could affect a real environment, such as code comments, changes to files that are not in a package or app, unit tests, etc. Note: do not use Chore when updating e2e tests for applications, use Test instead
+    def _build_commit_prompt(self, diff_content: str) -> Prompt:
+        """Build the commit message generation prompt"""
+        language = self.config_manager.get_language()
+        
+        return Prompt(COMMIT_SYSTEM_PROMPT, f"""Response language: {language}
 
 The diff content is:
 
 {diff_content}
 
 Remember: Your ENTIRE response MUST be in {language} language as specified above.
-"""
-            
-            # Call language model to get analysis result
-            response = self._call_language_model(prompt)
-            
-            # Parse response
-            analysis = self._parse_response(response)
-            
-            # Format commit message
-            commit_message = f"{analysis['type']}: {analysis['subject']}\n\n{analysis['body']}"
-            print(f"\nGenerated commit message:\n{commit_message}")
-            
-            return commit_message
-            
-        except Exception as e:
-            raise Exception(f"Failed to process diff: {str(e)}") from e
+""")
 
+    @scoped_call_notes
     def analyze_code(self, prompt: str, diff_content: str) -> str:
         """
         Analyze code changes using AI.
@@ -281,152 +1041,497 @@ Remember: Your ENTIRE response MUST be in {language} language as specified above
             str: JSON formatted analysis result
         """
         # Combine the prompt with the diff content
-        full_prompt = f"{prompt}\n\n这是要分析的代码变更：\n\n{diff_content}"
+        full_prompt = self._build_analysis_prompt(prompt, diff_content)
         
         # Get AI response using JSON-specific method
         return self._ensure_json_response(full_prompt)
     
-    def generate_pr_content(self, commits: List[Dict[str, str]], diff_content: str, ticket: str = None, no_verify: bool = False) -> Dict[str, str]:
+    @scoped_call_notes
+    async def aanalyze_code(self, prompt: str, diff_content: str) -> str:
+        """Async counterpart of analyze_code"""
+        full_prompt = self._build_analysis_prompt(prompt, diff_content)
+        response = await self._acall_language_model(self._build_json_prompt(full_prompt))
+        return self._clean_response(response)
+    
+    def _build_analysis_prompt(self, prompt: str, diff_content: str) -> Prompt:
+        """Combine analysis rules with the diff, fitted to the context window"""
+        overhead = self._build_json_prompt(Prompt(prompt, "这是要分析的代码变更：\n\n"))
+        return Prompt(prompt, f"这是要分析的代码变更：\n\n{self.fit_diff(diff_content, overhead)}")
+    
+    @tracing.traced("ai.generate_pr_content")
+    @scoped_call_notes
+    def generate_pr_content(self, commits: List[Dict[str, str]], diff_content: str, ticket: str = None, no_verify: bool = False,
+                            commit_diff_loader: Optional[Callable[[List[str]], Dict[str, str]]] = None) -> Dict[str, str]:
         """
         Generate PR title and description based on commits and diff content
         
+        How the changes reach the model depends on pr_strategy (see
+        _pr_strategy): the raw diff in one prompt, chunk summaries of a large
+        diff, or per-commit summaries cached by SHA, so regenerating a PR
+        after one more commit only summarizes that commit.
+        
         Args:
             commits: List of commit information dictionaries
             diff_content: The git diff content between current branch and main branch
             ticket: Optional ticket number extracted from branch name
+            commit_diff_loader: Returns the patch of each given commit SHA;
+                required for per-commit summaries
             
         Returns:
             Dict with 'title' and 'description' keys
         """
         try:
-            language = self.config_manager.get_language()
+            strategy = self._pr_strategy(commits, diff_content, commit_diff_loader)
+            if strategy == "incremental":
+                summaries, title = self._summarize_commits(commits, commit_diff_loader), COMMIT_SUMMARIES_TITLE
+            elif strategy == "map_reduce":
+                summaries, title = self._summarize_diff_chunks(diff_content), CHUNK_SUMMARIES_TITLE
+            if strategy in ("incremental", "map_reduce"):
+                overhead = self._build_pr_request(commits, diff_content, ticket, no_verify, "", title)
+                prompt = self._build_pr_request(commits, diff_content, ticket, no_verify,
+                                                self._reduce_summaries(summaries, overhead), title)
+            else:
+                prompt = self._build_pr_request(commits, diff_content, ticket, no_verify)
             
-            # Build commit summary
-            commit_summary = ""
-            if commits:
-                commit_summary = "\n".join([f"- {commit['hash']}: {commit['message']}" for commit in commits])
+            # Call language model and parse the response line by line as it streams in
+            result = self._parse_pr_response(self._iter_lines(self._response_stream(prompt)))
+            return self._apply_pr_defaults(result, commits, diff_content, ticket, no_verify)
             
-            # Build system instruction
-            system_instruction = f"""IMPORTANT: You MUST respond in {language} language.
-For en: Use English only
-For zh-CN: Use Simplified Chinese (简体中文) only
-For zh-TW: Use Traditional Chinese (繁體中文) only
-
-Your response format MUST be:
-title: PR_TITLE
-description: PR_DESCRIPTION
-
-All text in the response MUST be in the specified language ({language}).
-"""
+        except Exception as e:
+            raise Exception(f"Failed to generate PR content: {str(e)}") from e
+    
+    @tracing.traced("ai.agenerate_pr_content")
+    @scoped_call_notes
+    async def agenerate_pr_content(self, commits: List[Dict[str, str]], diff_content: str, ticket: str = None, no_verify: bool = False,
+                                   commit_diff_loader: Optional[Callable[[List[str]], Dict[str, str]]] = None) -> Dict[str, str]:
+        """Async counterpart of generate_pr_content"""
+        try:
+            strategy = self._pr_strategy(commits, diff_content, commit_diff_loader)
+            if strategy == "incremental":
+                summaries, title = await self._asummarize_commits(commits, commit_diff_loader), COMMIT_SUMMARIES_TITLE
+            elif strategy == "map_reduce":
+                summaries, title = await self._asummarize_diff_chunks(diff_content), CHUNK_SUMMARIES_TITLE
+            if strategy in ("incremental", "map_reduce"):
+                overhead = self._build_pr_request(commits, diff_content, ticket, no_verify, "", title)
+                prompt = self._build_pr_request(commits, diff_content, ticket, no_verify,
+                                                await self._areduce_summaries(summaries, overhead), title)
+            else:
+                prompt = self._build_pr_request(commits, diff_content, ticket, no_verify)
             
-            # Determine QA section content based on no_verify flag
-            qa_instruction = "[QA: None]" if no_verify else """{{Based on code changes, determine:}}
-- If there are UI changes or user-visible functionality changes: [QA: Verify] + provide simple verification steps
-- If no UI changes (backend logic, refactoring, config, etc.): [QA: None]
-
-QA Decision Rules:
-- UI components, pages, styles, user interactions → [QA: Verify]
-- API endpoints affecting frontend → [QA: Verify]  
-- Pure backend logic, database changes, refactoring, config → [QA: None]
-- Tests, docs, build scripts → [QA: None]"""
+            result = self._parse_pr_response(await self._aresponse_text(prompt))
+            return self._apply_pr_defaults(result, commits, diff_content, ticket, no_verify)
             
-            prompt = f"""{system_instruction}
-
-You are a professional software developer creating a Pull Request. Please analyze the following information and generate an appropriate PR title and description.
-
-IMPORTANT: Follow these strict formatting rules for the PR title:
-- Format: {{TYPE}}:[{{TICKET}}] {{DESCRIPTION}}
-- TYPE should be one of: Fix, Build, Maint, Maintenance, Test, Patch, Feat, Feature, New, Minor, Update, Breaking, Major, Docs, Chore
-- TICKET: Use the provided ticket number if available
-- DESCRIPTION: Brief, clear description of the change
-
-PR Description Requirements (MUST follow this exact three-section structure):
-
-### Description
-{{Brief summary of what this PR does (1-2 sentences)}}
-- {{Detailed technical change 1}}
-- {{Detailed technical change 2}}
-- {{Detailed technical change 3}}
-- {{Detailed technical change 4 (if needed)}}
-- {{Detailed technical change 5 (if needed)}}
-
-### Related issues or context
-- https://compass-tech.atlassian.net/browse/{{TICKET}}
-
-### QA
-{qa_instruction}
-
-Analysis Steps:
-1. Read branch commit messages to understand development intent
-2. Analyze code diff to confirm actual changes and impact scope
-3. Determine the most appropriate PR type
-4. Decide QA section based on whether changes are user-visible
-5. Generate description following the three-section structure
+        except Exception as e:
+            raise Exception(f"Failed to generate PR content: {str(e)}") from e
+    
+    def _pr_strategy(self, commits: List[Dict[str, str]], diff_content: str,
+                     commit_diff_loader: Optional[Callable[[List[str]], Dict[str, str]]]) -> str:
+        """
+        Resolve the configured pr_strategy for this branch
+        
+        auto uses per-commit summaries for a branch of several commits when
+        they can be cached and either the diff is above
+        pr_map_reduce_threshold or most of them are cached already; a small
+        branch is cheaper as one prompt with the diff in it. Otherwise it
+        falls back to a single prompt, or chunk summaries for a large diff.
+        """
+        strategy = self.config_manager.get_pr_strategy()
+        if strategy not in PR_STRATEGIES:
+            raise ValueError(f"Unsupported pr_strategy: {strategy} (expected one of {', '.join(PR_STRATEGIES)})")
+        
+        can_summarize_commits = commit_diff_loader is not None and bool(commits) and all('sha' in c for c in commits)
+        if strategy == "incremental" and can_summarize_commits:
+            return strategy
+        if strategy == "auto" and can_summarize_commits and self.cache is not None and len(commits) > 1:
+            if self._needs_map_reduce(diff_content) or self._mostly_cached(commits):
+                return "incremental"
+        if strategy == "single":
+            return strategy
+        if strategy == "map_reduce" and diff_content:
+            return strategy
+        return "map_reduce" if self._needs_map_reduce(diff_content) else "single"
+    
+    def _mostly_cached(self, commits: List[Dict[str, str]]) -> bool:
+        """Check whether more than half of the commits have a cached summary"""
+        cached = sum(1 for commit in commits if self.cache.contains(self._commit_summary_key(commit)))
+        return cached * 2 > len(commits)
+    
+    def _needs_map_reduce(self, diff_content: str) -> bool:
+        """Check whether the branch diff is too large to send in one prompt"""
+        return bool(diff_content) and len(diff_content) > self.config_manager.get_pr_map_reduce_threshold()
+    
+    def _build_pr_request(self, commits: List[Dict[str, str]], diff_content: str, ticket: Optional[str], no_verify: bool,
+                          change_summaries: Optional[str] = None, summaries_title: str = CHUNK_SUMMARIES_TITLE) -> Prompt:
+        """Build the PR prompt from the raw diff, or from change summaries when given"""
+        # Build commit summary
+        commit_summary = ""
+        if commits:
+            commit_summary = "\n".join([f"- {commit['hash']}: {commit['message']}" for commit in commits])
+        
+        if change_summaries is not None:
+            return self._build_pr_prompt(commit_summary, ticket, no_verify, summaries_title, change_summaries)
+        overhead = self._build_pr_prompt(commit_summary, ticket, no_verify, "Code Diff Content", "")
+        return self._build_pr_prompt(
+            commit_summary, ticket, no_verify,
+            "Code Diff Content",
+            self.fit_diff(diff_content, overhead) if diff_content else "No diff content available"
+        )
+    
+    def _build_pr_prompt(self, commit_summary: str, ticket: Optional[str], no_verify: bool, changes_title: str, changes: str) -> Prompt:
+        """Build the PR generation prompt around the given change information"""
+        language = self.config_manager.get_language()
+        qa_mode = "[QA: None]" if no_verify else "Decide from the code changes"
+        
+        return Prompt(PR_SYSTEM_PROMPT, f"""Response language: {language}
+QA section: {qa_mode}
 
 Branch Commits Information:
 {commit_summary if commit_summary else "No commits found"}
 
 Ticket Number: {ticket if ticket else "No ticket found"}
 
-Code Diff Content:
-{diff_content if diff_content else "No diff content available"}
+{changes_title}:
+{changes}
 
 Remember: Your ENTIRE response MUST be in {language} language as specified above.
 IMPORTANT: You MUST follow the exact three-section format shown above.
-"""
-            
-            # Call language model
-            response = self._call_language_model(prompt)
+""")
+    
+    def _summarize_diff_chunks(self, diff_content: str) -> List[str]:
+        """
+        Summarize a large diff chunk by chunk on a bounded thread pool
+        
+        The diff is split per file, files are packed into chunks of at most
+        pr_chunk_size characters (grouped by top-level directory), and every
+        chunk is summarized concurrently with at most max_concurrency calls in
+        flight. Summaries are returned in diff order.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        file_diffs, chunks = self._chunk_diff(diff_content)
+        workers = max(1, min(self.config_manager.get_max_concurrency(), len(chunks)))
+        
+        self._notify(f"Diff is large ({len(diff_content)} chars, {len(file_diffs)} files); "
+                     f"summarizing {len(chunks)} chunks with {workers} workers...")
+        
+        # Build the model client once before fanning out
+        if self.provider_health is None:
+            _ = self.model
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self._summarize_diff_chunk, chunks))
+    
+    async def _asummarize_diff_chunks(self, diff_content: str) -> List[str]:
+        """Async counterpart of _summarize_diff_chunks, bounded by a semaphore"""
+        _, chunks = self._chunk_diff(diff_content)
+        semaphore = asyncio.Semaphore(self.config_manager.get_max_concurrency())
+        
+        async def summarize(chunk: List[Tuple[str, str]]) -> str:
+            async with semaphore:
+                summary = await self._acall_language_model(self._build_chunk_summary_prompt(chunk))
+            return self._format_chunk_summary(chunk, summary)
+        
+        return list(await asyncio.gather(*(summarize(chunk) for chunk in chunks)))
+    
+    def _chunk_diff(self, diff_content: str) -> Tuple[List[Tuple[str, str]], List[List[Tuple[str, str]]]]:
+        """Split a diff per file and pack the files into directory-grouped chunks"""
+        file_diffs = split_diff_by_file(diff_content)
+        chunks = group_file_diffs(file_diffs, self.config_manager.get_pr_chunk_size(), by_directory=True)
+        return file_diffs, chunks
+    
+    @tracing.traced("ai.summarize_chunk")
+    @scoped_call_notes
+    def _summarize_diff_chunk(self, chunk: List[Tuple[str, str]]) -> str:
+        """Summarize one chunk of per-file diffs"""
+        summary = self._call_language_model(self._build_chunk_summary_prompt(chunk))
+        return self._format_chunk_summary(chunk, summary)
+    
+    def _format_chunk_summary(self, chunk: List[Tuple[str, str]], summary: str) -> str:
+        """Label a chunk summary with the files it covers"""
+        files = [path for path, _ in chunk]
+        return f"Files: {', '.join(files)}\n{summary.strip()}"
+    
+    def _build_chunk_summary_prompt(self, chunk: List[Tuple[str, str]]) -> Prompt:
+        """Build the prompt that summarizes one chunk of a large diff"""
+        files = [path for path, _ in chunk]
+        chunk_diff = "".join(text for _, text in chunk)
+        # A single huge file can still exceed the window on its own
+        overhead = self._chunk_summary_template(files, "")
+        return self._chunk_summary_template(files, self.fit_diff(chunk_diff, overhead))
+    
+    def _chunk_summary_template(self, files: List[str], chunk_diff: str) -> Prompt:
+        language = self.config_manager.get_language()
+        
+        return Prompt(CHUNK_SUMMARY_SYSTEM_PROMPT, f"""Response language: {language}
+
+Files in this part:
+{chr(10).join(f"- {path}" for path in files)}
+
+Diff:
+{chunk_diff}
+""")
+    
+    def _summarize_commits(self, commits: List[Dict[str, str]],
+                           commit_diff_loader: Callable[[List[str]], Dict[str, str]]) -> List[str]:
+        """
+        Summarize each branch commit, reusing summaries cached by commit SHA
+        
+        A commit's patch never changes, so only commits without a cached
+        summary are loaded and sent to the model, concurrently with at most
+        max_concurrency calls in flight. Summaries are returned in commit order.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        summaries, missing = self._cached_commit_summaries(commits)
+        if missing:
+            diffs = commit_diff_loader([commit['sha'] for commit in missing])
+            workers = max(1, min(self.config_manager.get_max_concurrency(), len(missing)))
             
-            # Parse response to extract title and description
-            lines = response.strip().split('\n')
-            result = {'title': '', 'description': ''}
+            # Build the model client once before fanning out
+            if self.provider_health is None:
+                _ = self.model
             
-            # Find title
-            for line in lines:
-                if line.strip().lower().startswith('title:'):
-                    result['title'] = line.strip()[6:].strip()
-                    break
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(lambda commit: self._summarize_commit(commit, diffs.get(commit['sha'], "")), missing)
+                for commit, summary in zip(missing, results):
+                    self._store_commit_summary(commit, summary)
+                    summaries[commit['sha']] = summary
+        
+        return self._label_commit_summaries(commits, summaries)
+    
+    async def _asummarize_commits(self, commits: List[Dict[str, str]],
+                                  commit_diff_loader: Callable[[List[str]], Dict[str, str]]) -> List[str]:
+        """Async counterpart of _summarize_commits, bounded by a semaphore"""
+        summaries, missing = self._cached_commit_summaries(commits)
+        if missing:
+            loop = asyncio.get_running_loop()
+            diffs = await loop.run_in_executor(None, commit_diff_loader, [commit['sha'] for commit in missing])
+            semaphore = asyncio.Semaphore(self.config_manager.get_max_concurrency())
             
-            # Extract description (everything after title line)
-            description_lines = []
-            title_found = False
+            async def summarize(commit: Dict[str, str]) -> None:
+                diff = diffs.get(commit['sha'], "")
+                if diff.strip():
+                    async with semaphore:
+                        summary = (await self._acall_language_model(self._build_commit_summary_prompt(commit, diff))).strip()
+                else:
+                    summary = commit['message']
+                self._store_commit_summary(commit, summary)
+                summaries[commit['sha']] = summary
             
-            for line in lines:
-                if line.strip().lower().startswith('title:'):
+            await asyncio.gather(*(summarize(commit) for commit in missing))
+        
+        return self._label_commit_summaries(commits, summaries)
+    
+    def _cached_commit_summaries(self, commits: List[Dict[str, str]]) -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+        """Split commits into cached summaries by SHA and the commits still to summarize"""
+        summaries = {}
+        missing = []
+        for commit in commits:
+            cached = None
+            if self.cache is not None:
+                cached = self.cache.get(self._commit_summary_key(commit))
+            if cached is None:
+                missing.append(commit)
+            else:
+                summaries[commit['sha']] = cached
+        
+        self._notify(f"Summarizing {len(missing)} of {len(commits)} commits ({len(commits) - len(missing)} cached)...")
+        tracing.add(commits=len(commits), commits_summarized=len(missing))
+        return summaries, missing
+    
+    def _commit_summary_key(self, commit: Dict[str, str]) -> str:
+        # The patch is not loaded for a cache lookup, so key on the settings that shape how it is fitted
+        return self._cache_key("commit-summary", PROMPT_VERSION, commit['sha'], self._diff_fit_settings())
+    
+    def _diff_fit_settings(self) -> str:
+        """The settings that decide what fit_diff makes of a diff"""
+        return (f"{self.get_prompt_context_window()}:{self.config_manager.get_max_output_tokens()}:"
+                f"{self.config_manager.get_normalize_diff()}:{self.config_manager.get_diff_context_lines()}")
+    
+    def _store_commit_summary(self, commit: Dict[str, str], summary: str) -> None:
+        if self.cache is not None:
+            self.cache.set(self._commit_summary_key(commit), summary)
+    
+    @tracing.traced("ai.summarize_commit")
+    @scoped_call_notes
+    def _summarize_commit(self, commit: Dict[str, str], diff: str) -> str:
+        """Summarize one commit from its own patch; merge commits keep their message"""
+        if not diff.strip():
+            return commit['message']
+        return self._call_language_model(self._build_commit_summary_prompt(commit, diff)).strip()
+    
+    def _label_commit_summaries(self, commits: List[Dict[str, str]], summaries: Dict[str, str]) -> List[str]:
+        """Label each commit summary with the commit it describes"""
+        return [
+            f"Commit {commit['hash']}: {commit['message'].splitlines()[0] if commit['message'] else ''}\n{summaries[commit['sha']]}"
+            for commit in commits
+        ]
+    
+    def _reduce_summaries(self, summaries: List[str], overhead: Prompt) -> str:
+        """
+        Join change summaries for the final PR prompt, merging them until they fit
+        
+        While the joined summaries exceed the budget left next to overhead,
+        they are packed into groups that each fit one prompt and every group
+        is merged into one summary, on a bounded thread pool. After
+        MAX_SUMMARY_MERGE_ROUNDS rounds whatever still does not fit is cut.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        budget = self._prompt_budget(overhead)
+        for _ in range(MAX_SUMMARY_MERGE_ROUNDS):
+            groups = self._summary_merge_groups(summaries, budget)
+            if not groups:
+                break
+            workers = max(1, min(self.config_manager.get_max_concurrency(), len(groups)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                summaries = list(executor.map(self._merge_summaries, groups))
+        return self._join_summaries(summaries, budget)
+    
+    async def _areduce_summaries(self, summaries: List[str], overhead: Prompt) -> str:
+        """Async counterpart of _reduce_summaries, bounded by a semaphore"""
+        budget = self._prompt_budget(overhead)
+        semaphore = asyncio.Semaphore(self.config_manager.get_max_concurrency())
+        
+        async def merge(group: List[str]) -> str:
+            if len(group) == 1:
+                return group[0]
+            async with semaphore:
+                return (await self._acall_language_model(self._build_summary_merge_prompt(group))).strip()
+        
+        for _ in range(MAX_SUMMARY_MERGE_ROUNDS):
+            groups = self._summary_merge_groups(summaries, budget)
+            if not groups:
+                break
+            summaries = list(await asyncio.gather(*(merge(group) for group in groups)))
+        return self._join_summaries(summaries, budget)
+    
+    def _summary_merge_groups(self, summaries: List[str], budget: int) -> List[List[str]]:
+        """Groups of summaries to merge so they fit in budget tokens, or [] when they already do"""
+        tokens = estimate_tokens("\n\n".join(summaries))
+        if tokens <= budget or len(summaries) < 2:
+            return []
+        group_budget = self._prompt_budget(self._summary_merge_template(""))
+        groups = [[text for _, text in group] for group in
+                  group_file_diffs([("", summary) for summary in summaries], group_budget, size=estimate_tokens)]
+        if len(groups) == len(summaries):
+            # Every summary fills a prompt on its own; pair them so each round halves the count
+            groups = [summaries[index:index + 2] for index in range(0, len(summaries), 2)]
+        self._notify(f"Summaries are ~{tokens} tokens but only ~{budget} fit in the context window; "
+                     f"merging {len(summaries)} summaries into {len(groups)}...")
+        return groups
+    
+    @tracing.traced("ai.merge_summaries")
+    @scoped_call_notes
+    def _merge_summaries(self, group: List[str]) -> str:
+        """Merge a group of summaries into one"""
+        if len(group) == 1:
+            return group[0]
+        return self._call_language_model(self._build_summary_merge_prompt(group)).strip()
+    
+    def _build_summary_merge_prompt(self, group: List[str]) -> Prompt:
+        """Build the prompt that merges a group of summaries, cut to the context window"""
+        overhead = self._summary_merge_template("")
+        return self._summary_merge_template(self._join_summaries(group, self._prompt_budget(overhead)))
+    
+    def _summary_merge_template(self, summaries: str) -> Prompt:
+        language = self.config_manager.get_language()
+        
+        return Prompt(SUMMARY_MERGE_SYSTEM_PROMPT, f"""Response language: {language}
+
+Summaries:
+{summaries}
+""")
+    
+    @staticmethod
+    def _join_summaries(summaries: List[str], budget: int) -> str:
+        """Join summaries, cutting those past budget tokens with a marker saying so"""
+        joined = "\n\n".join(summaries)
+        if estimate_tokens(joined) <= budget:
+            return joined
+        # Room for the marker
+        budget -= 32
+        kept: List[str] = []
+        used = 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary) + 1
+            if used + tokens > budget:
+                break
+            kept.append(summary)
+            used += tokens
+        if not kept:
+            # The first summary alone exceeds the budget; one character is at most one token
+            return summaries[0][:max(0, budget)] + "\n\n[git-sage: summaries cut to fit the model context window]"
+        return ("\n\n".join(kept) + f"\n\n[git-sage: {len(summaries) - len(kept)} more summaries left out "
+                f"to fit the model context window]")
+    
+    def _build_commit_summary_prompt(self, commit: Dict[str, str], diff: str) -> Prompt:
+        """Build the prompt that summarizes one commit of the branch"""
+        overhead = self._commit_summary_template(commit, "")
+        return self._commit_summary_template(commit, self.fit_diff(diff, overhead))
+    
+    def _commit_summary_template(self, commit: Dict[str, str], diff: str) -> Prompt:
+        language = self.config_manager.get_language()
+        
+        # Shares the chunk summary instructions, so both hit the same cached prefix
+        return Prompt(CHUNK_SUMMARY_SYSTEM_PROMPT, f"""Response language: {language}
+
+Commit message:
+{commit['message']}
+
+Diff:
+{diff}
+""")
+    
+    def _parse_pr_response(self, response: Union[str, Iterable[str]]) -> Dict[str, str]:
+        """Parse title and three-section description from the PR response, either a complete string or a stream of lines"""
+        if isinstance(response, str):
+            response = response.strip().split('\n')
+        result = {'title': '', 'description': ''}
+        
+        # Everything after the first title line is the description
+        description_lines = []
+        title_found = False
+        
+        for line in response:
+            if line.strip().lower().startswith('title:'):
+                if not title_found:
+                    result['title'] = line.strip()[6:].strip()
                     title_found = True
-                    continue
-                
-                if title_found:
-                    # Skip empty lines at the beginning
-                    if not description_lines and not line.strip():
-                        continue
-                    description_lines.append(line)
-            
-            # Process description to handle the three-section format
-            description_content = '\n'.join(description_lines).strip()
+                continue
             
-            # If the response doesn't start with ### Description, add it
-            if description_content and not description_content.startswith('###'):
-                # Try to find where the actual description content starts
-                if 'description:' in description_content.lower():
-                    # Remove "description:" prefix if present
-                    desc_start = description_content.lower().find('description:')
-                    description_content = description_content[desc_start + 12:].strip()
-            
-            result['description'] = description_content
-            
-            # Set defaults if missing
-            if not result['title']:
-                pr_type = self._determine_pr_type(commits, diff_content)
-                ticket_part = f"[{ticket}] " if ticket else ""
-                result['title'] = f"{pr_type}:{ticket_part}Update codebase"
-            
-            if not result['description']:
-                # Generate default three-section description
-                ticket_link = f"- https://compass-tech.atlassian.net/browse/{ticket}" if ticket else "- No related ticket"
-                qa_section = "[QA: None]" if no_verify else "[QA: Verify]"
-                result['description'] = f"""### Description
+            if title_found:
+                # Skip empty lines at the beginning
+                if not description_lines and not line.strip():
+                    continue
+                description_lines.append(line)
+        
+        # Process description to handle the three-section format
+        description_content = '\n'.join(description_lines).strip()
+        
+        # If the response doesn't start with ### Description, add it
+        if description_content and not description_content.startswith('###'):
+            # Try to find where the actual description content starts
+            if 'description:' in description_content.lower():
+                # Remove "description:" prefix if present
+                desc_start = description_content.lower().find('description:')
+                description_content = description_content[desc_start + 12:].strip()
+        
+        result['description'] = description_content
+        return result
+    
+    def _apply_pr_defaults(self, result: Dict[str, str], commits: List[Dict[str, str]], diff_content: str, ticket: Optional[str], no_verify: bool) -> Dict[str, str]:
+        """Fill in a default title and description when the response lacks them"""
+        if not result['title']:
+            pr_type = self._determine_pr_type(commits, diff_content)
+            ticket_part = f"[{ticket}] " if ticket else ""
+            result['title'] = f"{pr_type}:{ticket_part}Update codebase"
+        
+        if not result['description']:
+            # Generate default three-section description
+            ticket_link = f"- https://compass-tech.atlassian.net/browse/{ticket}" if ticket else "- No related ticket"
+            qa_section = "[QA: None]" if no_verify else "[QA: Verify]"
+            result['description'] = f"""### Description
 Update codebase with latest changes.
 - Implement code improvements and modifications
 - Update existing functionality
@@ -436,11 +1541,8 @@ Update codebase with latest changes.
 
 ### QA
 {qa_section}"""
-            
-            return result
-            
-        except Exception as e:
-            raise Exception(f"Failed to generate PR content: {str(e)}") from e
+        
+        return result
     
     def _determine_pr_type(self, commits: List[Dict[str, str]], diff_content: str) -> str:
         """Determine PR type based on commits and diff content"""
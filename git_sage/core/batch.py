@@ -0,0 +1,178 @@
+"""
+Batch runs over many repositories in one gsg process.
+
+Diffs are collected in a pool of worker processes, so git work for
+different repositories runs on all cores and a slow repository does not
+hold up the others. As each diff arrives, its model calls are queued on the
+event loop behind one semaphore, so at most `concurrency` calls are in
+flight across all repositories, and they share one model client and its
+connection pool. Imports, configuration and model setup are paid once for
+the whole batch instead of once per repository.
+"""
+import asyncio
+import contextlib
+import glob
+import io
+import os
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional
+
+from .ai_processor import AIProcessor
+from .code_validator import CodeValidator
+from .git_operations import GitOperations
+from . import tracing
+
+TASKS = ("commit", "review")
+
+
+def expand_repo_paths(patterns: List[str]) -> List[str]:
+    """
+    Expand repository paths and glob patterns into directories
+
+    Glob matches that are not directories are ignored, duplicates are
+    dropped and the order of the arguments is kept.
+    """
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        pattern = os.path.expanduser(pattern)
+        if glob.has_magic(pattern):
+            matches = [path for path in sorted(glob.glob(pattern)) if os.path.isdir(path)]
+        else:
+            matches = [pattern]
+        for path in matches:
+            key = os.path.realpath(path)
+            if key not in seen:
+                seen.add(key)
+                paths.append(path)
+    return paths
+
+
+def collect_repo(path: str, staged: bool = True, branch: bool = False) -> Dict[str, Any]:
+    """
+    Read the diffs one repository needs; runs in a worker process
+
+    Never raises, so one broken repository does not fail the batch; the
+    error is returned in the result instead.
+    """
+    started = time.perf_counter()
+    result: Dict[str, Any] = {"repo": path, "root": None, "staged_diff": None, "branch_diff": None, "error": None}
+    try:
+        # GitOperations reports progress with print(); keep it out of the batch output
+        with contextlib.redirect_stdout(io.StringIO()):
+            git_ops = GitOperations(path)
+            result["root"] = git_ops.get_repo_root()
+            if staged and git_ops.has_staged_changes():
+                result["staged_diff"] = git_ops.get_staged_diff()
+            if branch:
+                result["branch_diff"] = git_ops.get_branch_diff()
+    except Exception as e:
+        result["error"] = str(e)
+    result["collect_s"] = time.perf_counter() - started
+    return result
+
+
+class BatchRunner:
+    """Run commit message and review generation for many repositories"""
+
+    def __init__(self, ai_processor: AIProcessor, tasks: List[str], review_rule: str = "common",
+                 review_branch: bool = False, concurrency: Optional[int] = None):
+        self.ai_processor = ai_processor
+        self.tasks = list(tasks)
+        self.review_rule = review_rule
+        self.review_branch = review_branch
+        self.concurrency = max(1, concurrency or ai_processor.config_manager.get_max_concurrency())
+        self.validator = CodeValidator(ai_processor, None)
+        self._started: Optional[float] = None
+
+    def submit_all(self, pool: Executor, paths: List[str]) -> List[Any]:
+        """Start collecting every repository's diffs on the process pool"""
+        self._started = time.perf_counter()
+        staged = "commit" in self.tasks or ("review" in self.tasks and not self.review_branch)
+        branch = "review" in self.tasks and self.review_branch
+        return [pool.submit(collect_repo, path, staged, branch) for path in paths]
+
+    async def run(self, futures: List[Any], emit: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        """
+        Generate results as diffs arrive and emit one record per repository
+
+        Records are emitted in completion order. Returns the batch summary.
+        """
+        started = self._started or time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        if self.ai_processor.provider_health is None:
+            # Wait for the model client off the event loop before fanning out
+            await self.ai_processor.amodel()
+
+        async def process(future: Any) -> Dict[str, Any]:
+            collected = await asyncio.wrap_future(future)
+            record = await self._process_repo(collected, semaphore)
+            emit(record)
+            return record
+
+        with tracing.span("batch.run", repos=len(futures), concurrency=self.concurrency):
+            records = await asyncio.gather(*(process(future) for future in futures))
+        return self._summary(records, time.perf_counter() - started)
+
+    async def _process_repo(self, collected: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        record: Dict[str, Any] = {
+            "repo": collected["repo"],
+            "root": collected["root"],
+            "status": "ok",
+            "error": collected["error"],
+            "collect_s": round(collected["collect_s"], 3),
+            "model_s": 0.0,
+        }
+        if record["error"]:
+            record["status"] = "error"
+            return record
+
+        staged_diff = collected["staged_diff"]
+        review_diff = collected["branch_diff"] if self.review_branch else staged_diff
+        if not staged_diff and not (self.review_branch and review_diff):
+            record["status"] = "skipped"
+            record["error"] = "no staged changes" if not self.review_branch else "no changes against the main branch"
+            return record
+
+        model_s = 0.0
+        try:
+            if "commit" in self.tasks:
+                if staged_diff:
+                    async with semaphore:
+                        call_started = time.perf_counter()
+                        record["commit_message"] = await self.ai_processor.aprocess_diff(staged_diff)
+                        model_s += time.perf_counter() - call_started
+                else:
+                    record["commit_message"] = None
+            if "review" in self.tasks:
+                async with semaphore:
+                    call_started = time.perf_counter()
+                    review = await self.validator.areview_diff(self.review_rule, review_diff)
+                    model_s += time.perf_counter() - call_started
+                record["review"] = {"status": review["status"], "message": review["message"]}
+                if review["status"] == "ERROR":
+                    record["status"] = "error"
+                    record["error"] = review["message"]
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+        record["model_s"] = round(model_s, 3)
+        return record
+
+    def _summary(self, records: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+        collect_total = sum(r["collect_s"] for r in records)
+        model_total = sum(r["model_s"] for r in records)
+        return {
+            "repos": len(records),
+            "ok": sum(1 for r in records if r["status"] == "ok"),
+            "skipped": sum(1 for r in records if r["status"] == "skipped"),
+            "errors": sum(1 for r in records if r["status"] == "error"),
+            "wall_s": round(elapsed, 3),
+            "collect_s_total": round(collect_total, 3),
+            "model_s_total": round(model_total, 3),
+            # The same work done one repository at a time
+            "sequential_estimate_s": round(collect_total + model_total, 3),
+            "concurrency": self.concurrency,
+        }
@@ -0,0 +1,192 @@
+"""
+Cancellation of in-flight HTTP requests by thread.
+
+A thread blocked reading a response cannot be stopped by closing its HTTP
+client: the socket stays open until the server answers, and so does the
+request on the provider's side. A thread that calls watch_current_thread()
+on behalf of some owner has the connections it reads from recorded, and
+cancel(owner) shuts them down, which makes the blocked read fail at once
+and drops the connection.
+
+Recording happens in the connection layer of the model clients passed to
+track_http_clients: the httpx connection pools of the OpenAI-compatible and
+Ollama clients and the requests session of the pooled HTTP models. Only
+the models of a hedged request are tracked; other clients keep their
+connection layer untouched, and threads that never call
+watch_current_thread() pay nothing beyond a dictionary lookup.
+"""
+import socket
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+_lock = threading.Lock()
+# Watched thread ident -> (owner, {id(connection): connection} currently in use)
+_watched: Dict[int, Tuple[Any, Dict[int, Any]]] = {}
+_cancelled = set()
+
+
+class RequestCancelled(OSError):
+    """Raised in a watched thread whose requests were cancelled"""
+
+
+def watch_current_thread(owner: Any) -> None:
+    """Record the connections this thread uses, so cancel(owner) can close them"""
+    with _lock:
+        _watched[threading.get_ident()] = (owner, {})
+        _cancelled.discard(threading.get_ident())
+
+
+def release_current_thread() -> None:
+    """Stop watching this thread (thread idents are reused after a thread ends)"""
+    with _lock:
+        _watched.pop(threading.get_ident(), None)
+        _cancelled.discard(threading.get_ident())
+
+
+def cancel(owner: Any) -> None:
+    """
+    Shut down the connections of the thread watched for owner and fail its further I/O
+
+    Does nothing once that thread released itself, even if its ident was
+    reused by another watched thread.
+    """
+    with _lock:
+        ident = next((ident for ident, (watcher, _) in _watched.items() if watcher is owner), None)
+        if ident is None:
+            return
+        _cancelled.add(ident)
+        connections = list(_watched[ident][1].values())
+    for connection in connections:
+        _shutdown(connection)
+
+
+def track(connection: Any) -> None:
+    """Note that the current thread is using a connection; fails if the thread was cancelled"""
+    ident = threading.get_ident()
+    if ident not in _watched:
+        # Unwatched threads skip the lock
+        return
+    with _lock:
+        watched = _watched.get(ident)
+        if watched is None:
+            return
+        watched[1][id(connection)] = connection
+        cancelled = ident in _cancelled
+    if cancelled:
+        _shutdown(connection)
+        raise RequestCancelled("Request cancelled")
+
+
+def untrack(connection: Any) -> None:
+    ident = threading.get_ident()
+    if ident not in _watched:
+        return
+    with _lock:
+        watched = _watched.get(ident)
+        if watched is not None:
+            watched[1].pop(id(connection), None)
+
+
+def _socket_of(connection: Any) -> Optional[socket.socket]:
+    if isinstance(connection, socket.socket):
+        return connection
+    get_extra_info = getattr(connection, "get_extra_info", None)
+    if callable(get_extra_info):
+        return get_extra_info("socket")
+    return getattr(connection, "sock", None)
+
+
+def _shutdown(connection: Any) -> None:
+    try:
+        sock = _socket_of(connection)
+        if sock is not None:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        # Already closed
+        pass
+
+
+class _TrackedStream:
+    """httpcore network stream that records which thread is reading or writing it"""
+
+    def __init__(self, stream: Any):
+        self._stream = stream
+
+    def read(self, max_bytes: int, timeout: Optional[float] = None) -> bytes:
+        track(self._stream)
+        try:
+            return self._stream.read(max_bytes, timeout)
+        finally:
+            untrack(self._stream)
+
+    def write(self, buffer: bytes, timeout: Optional[float] = None) -> None:
+        track(self._stream)
+        try:
+            self._stream.write(buffer, timeout)
+        finally:
+            untrack(self._stream)
+
+    def close(self) -> None:
+        self._stream.close()
+
+    def start_tls(self, *args: Any, **kwargs: Any) -> "_TrackedStream":
+        return _TrackedStream(self._stream.start_tls(*args, **kwargs))
+
+    def get_extra_info(self, info: str) -> Any:
+        return self._stream.get_extra_info(info)
+
+
+class _TrackingBackend:
+    """httpcore network backend whose streams are _TrackedStreams"""
+
+    def __init__(self, backend: Any):
+        self._backend = backend
+
+    def connect_tcp(self, *args: Any, **kwargs: Any) -> _TrackedStream:
+        return _TrackedStream(self._backend.connect_tcp(*args, **kwargs))
+
+    def connect_unix_socket(self, *args: Any, **kwargs: Any) -> _TrackedStream:
+        return _TrackedStream(self._backend.connect_unix_socket(*args, **kwargs))
+
+    def sleep(self, seconds: float) -> None:
+        self._backend.sleep(seconds)
+
+
+def track_http_clients(model: Any) -> bool:
+    """
+    Route the connections of a model's HTTP clients through the tracking layer
+
+    Best effort, like preconnect: clients without a known connection pool
+    are left alone, and so are httpx transports whose httpcore pool has no
+    replaceable network backend (it is private to httpcore). Must run
+    before the client opens its first connection. Returns whether anything
+    is tracked.
+    """
+    inner = getattr(model, "inner", None)
+    if inner is not None:
+        # A recording replay model forwards to a real client
+        return track_http_clients(inner)
+    hook = getattr(model, "track_connections", None)
+    if callable(hook):
+        hook()
+        return True
+    tracked = False
+    clients = [
+        # langchain_openai: the OpenAI SDK's httpx client
+        getattr(getattr(model, "root_client", None), "_client", None),
+        # langchain_ollama: the ollama package's httpx client
+        getattr(getattr(model, "_client", None), "_client", None),
+    ]
+    for client in clients:
+        if client is None:
+            continue
+        transports = [getattr(client, "_transport", None)] + list((getattr(client, "_mounts", None) or {}).values())
+        for transport in transports:
+            pool = getattr(transport, "_pool", None)
+            backend = getattr(pool, "_network_backend", None)
+            if isinstance(backend, _TrackingBackend):
+                tracked = True
+            elif backend is not None and callable(getattr(backend, "connect_tcp", None)):
+                pool._network_backend = _TrackingBackend(backend)
+                tracked = True
+    return tracked
@@ -1,12 +1,18 @@
 import os
 import json
-from typing import Dict, List, Optional, Union
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple, Union
 from ..config.config_manager import ConfigManager
-from .ai_processor import AIProcessor
+from .ai_processor import AIProcessor, Prompt, scoped_call_notes
+from .diff_utils import split_diff_by_file, group_file_diffs
 from .git_operations import GitOperations
+from .token_budget import estimate_tokens
+from . import tracing
 
 class CodeValidator:
-    def __init__(self, ai_processor: AIProcessor, git_ops: GitOperations):
+    def __init__(self, ai_processor: AIProcessor, git_ops: Optional[GitOperations]):
         """Initialize the code validator with necessary dependencies."""
         self.ai_processor = ai_processor
         self.git_ops = git_ops
@@ -35,43 +41,211 @@ class CodeValidator:
                 
         return None
         
-    def validate_changes(self, prompt_type: str) -> Dict:
-        """Validate changes using specified prompt type"""
-        # Load prompts
-        common_prompt = self._load_prompt('common')
-        specific_prompt = self._load_prompt(prompt_type)
+    @tracing.traced("review.validate")
+    @scoped_call_notes
+    def validate_changes(self, prompt_type: str, parallel: bool = False, workers: Optional[int] = None, shard_by: str = "file", staged: bool = False) -> Dict:
+        """
+        Validate changes using specified prompt type
         
-        if not common_prompt or not specific_prompt:
-            return {
-                "status": "ERROR",
-                "message": f"无法加载 prompt 文件。请确保以下文件存在：\n"
-                          f"1. {self.user_prompts_dir}/common.txt 或 {self.config_prompts_dir}/common.txt\n"
-                          f"2. {self.user_prompts_dir}/{prompt_type}.txt 或 {self.config_prompts_dir}/{prompt_type}.txt"
-            }
+        Args:
+            prompt_type: Name of the rule prompt to apply
+            parallel: Split the diff into shards and review them concurrently
+            workers: Maximum concurrent shard reviews (defaults to max_concurrency)
+            shard_by: 'file' for one shard per file, 'tokens' to pack files
+                into shards of about review_shard_tokens tokens
+            staged: Review the staged changes instead of the branch diff
+        """
+        # Load prompts
+        prompts = self._load_review_prompts(prompt_type)
+        if "status" in prompts:
+            return prompts
             
         # Get diff
-        diff = self.git_ops.get_branch_diff()
+        diff = self._get_diff(staged)
         if not diff:
-            return {
-                "status": "ERROR",
-                "message": "没有发现代码变更，请确保：\n1. 当前分支有提交的改动\n2. 当前分支与主分支有差异"
-            }
+            return self._no_changes_result()
+        
+        if parallel:
+            return self._validate_in_shards(prompt_type, prompts, diff, workers, shard_by)
             
-        # Combine prompts
-        full_prompt = f"{common_prompt}\n{specific_prompt}\n\n以下是代码变更：\n{diff}"
+        fitted = self.ai_processor.fit_diff(diff, self._build_review_prompt(prompts, ""))
+        full_prompt = self._build_review_prompt(prompts, fitted)
         
         # Get AI feedback
         try:
-            response = self.ai_processor.get_response(full_prompt)
-            return {
-                "status": "PASS" if "符合规范" in response or "质量良好" in response else "FAIL",
-                "message": response
+            response = self.ai_processor.get_response(
+                full_prompt,
+                cache_key_parts=[prompt_type, prompts["common"], prompts["specific"], fitted]
+            )
+            result = self._review_result(response)
+            # The message was already rendered in the terminal while streaming
+            result["streamed"] = self.ai_processor.stream
+            return result
+        except Exception as e:
+            return self._feedback_error_result(e)
+    
+    @tracing.traced("review.avalidate")
+    async def avalidate_changes(self, prompt_type: str, staged: bool = False) -> Dict:
+        """Async counterpart of validate_changes; git work runs in the default executor"""
+        loop = asyncio.get_running_loop()
+        prompts = await loop.run_in_executor(None, self._load_review_prompts, prompt_type)
+        if "status" in prompts:
+            return prompts
+        
+        diff = await loop.run_in_executor(None, self._get_diff, staged)
+        return await self.areview_diff(prompt_type, diff, prompts)
+    
+    @scoped_call_notes
+    async def areview_diff(self, prompt_type: str, diff: Optional[str], prompts: Optional[Dict[str, str]] = None) -> Dict:
+        """Review a diff that was already collected, e.g. from another repository"""
+        if prompts is None:
+            prompts = self._load_review_prompts(prompt_type)
+            if "status" in prompts:
+                return prompts
+        
+        if not diff:
+            return self._no_changes_result()
+        
+        fitted = self.ai_processor.fit_diff(diff, self._build_review_prompt(prompts, ""))
+        full_prompt = self._build_review_prompt(prompts, fitted)
+        
+        try:
+            response = await self.ai_processor.aget_response(
+                full_prompt,
+                cache_key_parts=[prompt_type, prompts["common"], prompts["specific"], fitted]
+            )
+            return self._review_result(response)
+        except Exception as e:
+            return self._feedback_error_result(e)
+    
+    def _get_diff(self, staged: bool) -> Optional[str]:
+        """Get the staged diff or the diff between the current branch and the main branch"""
+        if staged:
+            return self.git_ops.get_staged_diff()
+        return self.git_ops.get_branch_diff()
+    
+    def _validate_in_shards(self, prompt_type: str, prompts: Dict[str, str], diff: str, workers: Optional[int], shard_by: str) -> Dict:
+        """Review diff shards concurrently and merge the findings into one result"""
+        shards = self._shard_diff(diff, shard_by)
+        workers = max(1, min(workers or self.ai_processor.config_manager.get_max_concurrency(), len(shards)))
+        print(f"正在并行审查 {len(shards)} 个分片（{workers} 个并发）...")
+        
+        if self.ai_processor.provider_health is None:
+            # Build the model client once before fanning out
+            _ = self.ai_processor.model
+        
+        results: List[Optional[Dict]] = [None] * len(shards)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self._review_shard, prompt_type, prompts, shard): index
+                for index, shard in enumerate(shards)
             }
+            for done, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+                results[index] = future.result()
+                shard_result = results[index]
+                print(f"[{done}/{len(shards)}] {shard_result['status']} "
+                      f"{', '.join(shard_result['files'])} ({shard_result['seconds']:.1f}s)")
+        
+        return self._merge_shard_results(results, time.perf_counter() - started, workers)
+    
+    def _shard_diff(self, diff: str, shard_by: str) -> List[List[Tuple[str, str]]]:
+        """Split a diff into per-file shards, or token-sized shards of whole files"""
+        file_diffs = split_diff_by_file(diff)
+        if shard_by == "tokens":
+            max_tokens = self.ai_processor.config_manager.get_review_shard_tokens()
+            return group_file_diffs(file_diffs, max_tokens, size=estimate_tokens)
+        return [[file_diff] for file_diff in file_diffs]
+    
+    @tracing.traced("review.shard")
+    @scoped_call_notes
+    def _review_shard(self, prompt_type: str, prompts: Dict[str, str], shard: List[Tuple[str, str]]) -> Dict:
+        """Review one shard; never raises so one failed shard does not abort the others"""
+        shard_diff = "".join(text for _, text in shard)
+        started = time.perf_counter()
+        try:
+            fitted = self.ai_processor.fit_diff(shard_diff, self._build_review_prompt(prompts, ""))
+            full_prompt = self._build_review_prompt(prompts, fitted)
+            response = self.ai_processor.get_response(
+                full_prompt,
+                cache_key_parts=[prompt_type, prompts["common"], prompts["specific"], fitted],
+                stream=False
+            )
+            result = self._review_result(response)
         except Exception as e:
+            result = self._feedback_error_result(e)
+        
+        result["files"] = [path for path, _ in shard]
+        result["seconds"] = time.perf_counter() - started
+        return result
+    
+    def _merge_shard_results(self, results: List[Dict], elapsed: float, workers: int) -> Dict:
+        """Merge shard reviews into one report with a single overall status"""
+        statuses = {result["status"] for result in results}
+        if statuses == {"PASS"}:
+            status = "PASS"
+        elif "FAIL" in statuses:
+            status = "FAIL"
+        else:
+            status = "ERROR"
+        
+        sections = []
+        for result in results:
+            sections.append(f"### [{result['status']}] {', '.join(result['files'])}\n\n{result['message'].strip()}")
+        
+        timings = [f"- {', '.join(r['files'])}: {r['seconds']:.2f}s ({r['status']})" for r in results]
+        shard_total = sum(r["seconds"] for r in results)
+        timings.append(f"- 总计: {elapsed:.2f}s 实际耗时, {shard_total:.2f}s 分片耗时之和, {workers} 个并发")
+        
+        message = "\n\n".join(sections) + "\n\n### 分片耗时\n" + "\n".join(timings)
+        return {
+            "status": status,
+            "message": message,
+            "shards": [
+                {"files": r["files"], "status": r["status"], "seconds": round(r["seconds"], 3)}
+                for r in results
+            ],
+            "elapsed": round(elapsed, 3)
+        }
+    
+    def _load_review_prompts(self, prompt_type: str) -> Dict[str, str]:
+        """Load common and rule-specific prompts, or an ERROR result if either is missing"""
+        common_prompt = self._load_prompt('common')
+        specific_prompt = self._load_prompt(prompt_type)
+        
+        if not common_prompt or not specific_prompt:
             return {
                 "status": "ERROR",
-                "message": f"获取 AI 反馈失败：{str(e)}"
+                "message": f"无法加载 prompt 文件。请确保以下文件存在：\n"
+                          f"1. {self.user_prompts_dir}/common.txt 或 {self.config_prompts_dir}/common.txt\n"
+                          f"2. {self.user_prompts_dir}/{prompt_type}.txt 或 {self.config_prompts_dir}/{prompt_type}.txt"
             }
+        
+        return {"common": common_prompt, "specific": specific_prompt}
+    
+    def _build_review_prompt(self, prompts: Dict[str, str], diff: str) -> Prompt:
+        """Combine prompts with the diff under review; the rules form the cacheable system prefix"""
+        return Prompt(f"{prompts['common']}\n{prompts['specific']}", f"以下是代码变更：\n{diff}")
+    
+    def _review_result(self, response: str) -> Dict:
+        """Derive the validation status from the model response"""
+        return {
+            "status": "PASS" if "符合规范" in response or "质量良好" in response else "FAIL",
+            "message": response
+        }
+    
+    def _no_changes_result(self) -> Dict:
+        return {
+            "status": "ERROR",
+            "message": "没有发现代码变更，请确保：\n1. 当前分支有提交的改动\n2. 当前分支与主分支有差异"
+        }
+    
+    def _feedback_error_result(self, error: Exception) -> Dict:
+        return {
+            "status": "ERROR",
+            "message": f"获取 AI 反馈失败：{str(error)}"
+        }
             
     def format_validation_result(self, result: Dict) -> str:
         """Format validation result for display"""
@@ -81,4 +255,7 @@ class CodeValidator:
             "ERROR": "⚠️ 错误"
         }
         
-        return f"{status_map.get(result['status'], '❓ 未知')}\n\n{result['message']}"
+        status = status_map.get(result['status'], '❓ 未知')
+        if result.get('streamed'):
+            return status
+        return f"{status}\n\n{result['message']}"
@@ -0,0 +1,266 @@
+"""
+Token-reducing normalization of git diffs before they reach a prompt.
+
+Raw `git diff` output spends a lot of tokens on lines that tell the model
+nothing: index lines, `---`/`+++` lines repeating the paths of the file
+header, hunks that only re-indent code or change line endings, and
+unchanged context far away from the edit. normalize_diff rewrites a diff
+into a shorter one that keeps every change:
+
+1. index lines and redundant `---`/`+++` lines are dropped, and the default
+   file mode is dropped from new/deleted file lines
+2. hunks that only change whitespace or line endings become a one-line note;
+   as with `git diff -b`, that is lines which differ only in the amount of
+   whitespace outside string literals (leading whitespace is kept
+   significant in indentation-sensitive files)
+3. context is trimmed adaptively: small edits keep up to max_context lines
+   around them, large blocks of changes keep one, and when a token budget
+   is given the width is narrowed further until the diff fits
+
+Rename and copy detection happens in git itself (`-M -C`), which turns a
+moved file into a three-line header instead of a full delete and add.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+from .diff_utils import split_diff_by_file
+from .token_budget import estimate_tokens
+
+_HUNK_HEADER_RE = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@(.*)$')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Quoted string literals, whose whitespace is content; an unterminated quote runs to the end of the line
+_STRING_LITERAL_RE = re.compile(r'("(?:\\.|[^"\\])*"?|\'(?:\\.|[^\'\\])*\'?|`(?:\\.|[^`\\])*`?)')
+
+# Change blocks up to this many lines keep the full context width
+SMALL_CHANGE_LINES = 8
+
+# Mode of a regular non-executable file, implied when not shown
+DEFAULT_FILE_MODE = "100644"
+
+# Files where a change of leading whitespace changes meaning
+INDENTATION_SENSITIVE_SUFFIXES = (".py", ".pyi", ".yml", ".yaml", ".coffee", ".pug", ".haml", ".slim", ".nim")
+INDENTATION_SENSITIVE_FILENAMES = {"Makefile", "makefile", "GNUmakefile"}
+
+
+def is_indentation_sensitive(path: str) -> bool:
+    """Check whether leading whitespace is significant in a file"""
+    name = path.rsplit("/", 1)[-1]
+    return name in INDENTATION_SENSITIVE_FILENAMES or path.endswith(INDENTATION_SENSITIVE_SUFFIXES)
+
+
+class _Hunk:
+    __slots__ = ("old_start", "new_start", "section", "lines")
+
+    def __init__(self, old_start: int, new_start: int, section: str):
+        self.old_start = old_start
+        self.new_start = new_start
+        # Function context git prints after the line numbers
+        self.section = section
+        # Body lines without their newline; "\ No newline" markers included
+        self.lines: List[str] = []
+
+    def changes(self) -> Tuple[List[str], List[str]]:
+        removed = [line[1:] for line in self.lines if line.startswith("-")]
+        added = [line[1:] for line in self.lines if line.startswith("+")]
+        return removed, added
+
+    def whitespace_note(self, keep_indentation: bool) -> Optional[str]:
+        """A note replacing the hunk when it only changes whitespace, else None"""
+        removed, added = self.changes()
+        if not removed and not added:
+            return None
+        if [line.rstrip("\r") for line in removed] == [line.rstrip("\r") for line in added]:
+            return f"... (line-ending-only change in {_lines(len(added))})"
+        # Like `git diff -b`, line by line: only the amount of whitespace may
+        # differ, never whether there is any, and string literals must match
+        same = (len(removed) == len(added)
+                and [_squeeze(line, keep_indentation) for line in removed]
+                == [_squeeze(line, keep_indentation) for line in added])
+        if same:
+            return f"... (whitespace-only change in {_lines(len(added))})"
+        return None
+
+    def rows(self) -> List[Tuple[str, int, int]]:
+        """
+        Body lines with their old and new line numbers
+
+        A line not present on one side gets the number of the next line on
+        that side, which is what a hunk starting at it reports.
+        """
+        rows = []
+        old_no, new_no = self.old_start, self.new_start
+        for line in self.lines:
+            rows.append((line, old_no, new_no))
+            if line.startswith(" "):
+                old_no += 1
+                new_no += 1
+            elif line.startswith("-"):
+                old_no += 1
+            elif line.startswith("+"):
+                new_no += 1
+        return rows
+
+    def render(self, max_context: int) -> List[str]:
+        """Render the hunk with trimmed context, split where long context runs are dropped"""
+        rows = self.rows()
+
+        # Runs of changed lines; a "\ No newline" marker belongs to the line before it
+        blocks: List[List[int]] = []
+        for index, (line, _, _) in enumerate(rows):
+            if not line.startswith(("-", "+")):
+                continue
+            if blocks and blocks[-1][1] == index:
+                blocks[-1][1] = index + 1
+            else:
+                blocks.append([index, index + 1])
+
+        ranges: List[List[int]] = []
+        for start, end in blocks:
+            width = self._context_width(end - start, max_context)
+            keep_start, keep_end = max(0, start - width), min(len(rows), end + width)
+            if ranges and keep_start <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], keep_end)
+            else:
+                ranges.append([keep_start, keep_end])
+        for kept in ranges:
+            while kept[1] < len(rows) and rows[kept[1]][0].startswith("\\"):
+                kept[1] += 1
+
+        rendered = []
+        for start, end in ranges:
+            rendered.append(self._header(rows[start:end]))
+            rendered.extend(line for line, _, _ in rows[start:end])
+        return rendered
+
+    def _header(self, rows: List[Tuple[str, int, int]]) -> str:
+        old_count = sum(1 for line, _, _ in rows if line.startswith((" ", "-")))
+        new_count = sum(1 for line, _, _ in rows if line.startswith((" ", "+")))
+        _, old_first, new_first = rows[0]
+        # An empty side reports the line before the change
+        old_begin = old_first if old_count else old_first - 1
+        new_begin = new_first if new_count else new_first - 1
+        return f"@@ -{_range(old_begin, old_count)} +{_range(new_begin, new_count)} @@{self.section}"
+
+    def note_header(self) -> str:
+        """Hunk header covering only the changed lines, for a hunk collapsed to a note"""
+        return self._header([row for row in self.rows() if row[0].startswith(("-", "+"))])
+
+    @staticmethod
+    def _context_width(changed: int, max_context: int) -> int:
+        return max_context if changed <= SMALL_CHANGE_LINES else min(1, max_context)
+
+
+def _squeeze(line: str, keep_indentation: bool) -> str:
+    """A line with whitespace runs outside string literals collapsed to one space and ends stripped"""
+    indentation = line[:len(line) - len(line.lstrip())] if keep_indentation else ""
+    parts = []
+    for index, part in enumerate(_STRING_LITERAL_RE.split(line.strip())):
+        # split() puts the literals it matched at odd indexes
+        parts.append(part if index % 2 else _WHITESPACE_RE.sub(" ", part))
+    return indentation + "".join(parts)
+
+
+def _lines(count: int) -> str:
+    return "1 line" if count == 1 else f"{count} lines"
+
+
+def _range(start: int, count: int) -> str:
+    # git leaves out a count of one
+    return str(start) if count == 1 else f"{start},{count}"
+
+
+class _FileDiff:
+    __slots__ = ("path", "header", "hunks", "keep_indentation")
+
+    def __init__(self, path: str, text: str):
+        self.path = path
+        self.header: List[str] = []
+        self.hunks: List[_Hunk] = []
+        self.keep_indentation = is_indentation_sensitive(path)
+
+        for line in text.split("\n"):
+            match = _HUNK_HEADER_RE.match(line)
+            if match:
+                self.hunks.append(_Hunk(int(match.group(1)), int(match.group(3)), match.group(5)))
+            elif self.hunks:
+                self.hunks[-1].lines.append(line)
+            else:
+                self.header.append(line)
+
+        for hunk in self.hunks:
+            # split() leaves an empty string after the final newline
+            while hunk.lines and hunk.lines[-1] == "":
+                hunk.lines.pop()
+
+    def render_header(self) -> List[str]:
+        lines = []
+        for line in self.header:
+            if line.startswith("index "):
+                continue
+            if line.startswith(("--- ", "+++ ")):
+                # The diff --git line and new/deleted file lines already say this
+                continue
+            if line in (f"new file mode {DEFAULT_FILE_MODE}", f"deleted file mode {DEFAULT_FILE_MODE}"):
+                line = line[:-len(f" mode {DEFAULT_FILE_MODE}")]
+            if line:
+                lines.append(line)
+        return lines
+
+    def render(self, max_context: int) -> Tuple[List[str], int]:
+        """Return the rendered lines and how many hunks were collapsed to notes"""
+        lines = self.render_header()
+        collapsed = 0
+        for hunk in self.hunks:
+            note = hunk.whitespace_note(self.keep_indentation)
+            if note is not None:
+                collapsed += 1
+                lines.append(hunk.note_header())
+                lines.append(note)
+            else:
+                lines.extend(hunk.render(max_context))
+        return lines, collapsed
+
+
+def normalize_diff(diff_content: str, max_context: int = 3, max_tokens: Optional[int] = None) -> Tuple[str, Dict[str, int]]:
+    """
+    Rewrite a diff into a shorter one with the same changes.
+
+    Args:
+        diff_content: Unified git diff output
+        max_context: Widest context kept around small edits
+        max_tokens: When given, context is narrowed (down to none) until the
+            diff fits, before anything else would have to be omitted
+
+    Returns:
+        Tuple of (diff text, stats) where stats has tokens_before,
+        tokens_after, context_lines and hunks_collapsed
+    """
+    tokens_before = estimate_tokens(diff_content)
+    stats = {"tokens_before": tokens_before, "tokens_after": tokens_before,
+             "context_lines": max_context, "hunks_collapsed": 0}
+    if not diff_content:
+        return diff_content, stats
+
+    files = [_FileDiff(path, text) for path, text in split_diff_by_file(diff_content)]
+
+    width = max(0, max_context)
+    while True:
+        parts: List[str] = []
+        collapsed = 0
+        for file_diff in files:
+            lines, file_collapsed = file_diff.render(width)
+            parts.extend(lines)
+            collapsed += file_collapsed
+        normalized = "\n".join(parts)
+        tokens_after = estimate_tokens(normalized)
+        if max_tokens is None or tokens_after <= max_tokens or width == 0:
+            break
+        width -= 1
+
+    # Never hand back something longer than the input
+    if tokens_after >= tokens_before:
+        return diff_content, stats
+
+    stats.update(tokens_after=tokens_after, context_lines=width, hunks_collapsed=collapsed)
+    return normalized, stats
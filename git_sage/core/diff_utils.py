@@ -0,0 +1,68 @@
+import re
+from typing import Callable, List, Tuple
+
+_FILE_HEADER_RE = re.compile(r'^diff --git a/(.*?) b/(.*)$')
+
+
+def split_diff_by_file(diff_content: str) -> List[Tuple[str, str]]:
+    """
+    Split unified git diff output into per-file sections.
+
+    Returns:
+        List of (path, diff_text) tuples in the original order. Text before the
+        first file header, if any, is attached to the first section.
+    """
+    if not diff_content:
+        return []
+
+    sections = []
+    current_path = None
+    current_lines: List[str] = []
+
+    for line in diff_content.splitlines(True):
+        match = _FILE_HEADER_RE.match(line.rstrip('\n'))
+        if match:
+            if current_lines and current_path is not None:
+                sections.append((current_path, ''.join(current_lines)))
+                current_lines = []
+            current_path = match.group(2)
+        current_lines.append(line)
+
+    if current_lines:
+        sections.append((current_path or '', ''.join(current_lines)))
+
+    return sections
+
+
+def group_file_diffs(file_diffs: List[Tuple[str, str]], max_chars: int, by_directory: bool = False, size: Callable[[str], int] = len) -> List[List[Tuple[str, str]]]:
+    """
+    Pack per-file diffs into chunks of at most max_chars characters.
+
+    A single file larger than max_chars becomes its own chunk. With
+    by_directory, files from different top-level directories never share a
+    chunk, which keeps each chunk about one area of the codebase. Pass a
+    different size function (e.g. a token estimator) to measure chunks in
+    other units.
+    """
+    chunks: List[List[Tuple[str, str]]] = []
+    current: List[Tuple[str, str]] = []
+    current_size = 0
+    current_group = None
+
+    for path, text in file_diffs:
+        # Files at the repository root share one group
+        group = path.split('/', 1)[0] if '/' in path else ''
+        starts_new_group = by_directory and current and group != current_group
+        text_size = size(text)
+        if current and (starts_new_group or current_size + text_size > max_chars):
+            chunks.append(current)
+            current = []
+            current_size = 0
+        current.append((path, text))
+        current_size += text_size
+        current_group = group
+
+    if current:
+        chunks.append(current)
+
+    return chunks
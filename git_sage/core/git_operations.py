@@ -2,20 +2,77 @@ import os
 import tempfile
 import subprocess
 import re
+import shlex
 from typing import List, Tuple, Optional, Dict
 from git import Repo, GitCommandError
+from .repo_metadata import RepoMetadataCache, RepoRootIndex
+from .staged_snapshot import StagedSnapshot
+from .object_reader import ObjectReader, build_new_file_patch
+from . import terminal, tracing
 
 class GitOperations:
-    def __init__(self):
-        self.repo = self._get_repo()
+    # Repo handles opened ahead of time by gsg daemon, by working tree root
+    _warm_repos: Dict[str, Repo] = {}
     
-    def _get_repo(self) -> Repo:
-        """Get Git repository for current directory"""
+    def __init__(self, path: Optional[str] = None):
+        self.repo = self._get_repo(path)
+        self.metadata = RepoMetadataCache(self.repo.git_dir, self.repo.common_dir)
+        self._staged_snapshot: Optional[StagedSnapshot] = None
+        self._object_reader: Optional[ObjectReader] = None
+    
+    @tracing.traced("git.discover_repo")
+    def _get_repo(self, path: Optional[str] = None) -> Repo:
+        """Get Git repository for the given directory, or the current one"""
+        cwd = os.path.abspath(path) if path else os.getcwd()
+        root_index = RepoRootIndex()
+        root = root_index.lookup(cwd)
+        if root in self._warm_repos:
+            return self._warm_repos[root]
+        if root:
+            try:
+                return Repo(root)
+            except Exception:
+                pass
         try:
-            return Repo(os.getcwd(), search_parent_directories=True)
+            repo = Repo(cwd, search_parent_directories=True)
         except Exception as e:
             raise Exception("Not a git repository") from e
+        if repo.working_tree_dir:
+            root_index.remember(cwd, repo.working_tree_dir)
+        return repo
+
+    @classmethod
+    def preload_repo(cls, path: str, limit: int = 64) -> None:
+        """
+        Open the repository containing path and keep the handle for later instances
+        
+        Opening a Repo only reads files, so a kept handle carries no git
+        processes or open pipes into the processes that later use it.
+        """
+        repo = cls.__new__(cls)._get_repo(path)
+        root = repo.working_tree_dir
+        if root and root not in cls._warm_repos:
+            if len(cls._warm_repos) >= limit:
+                cls._warm_repos.pop(next(iter(cls._warm_repos)))
+            cls._warm_repos[root] = repo
+    
+    def get_repo_root(self) -> str:
+        """Get the root directory of the working tree"""
+        return self.repo.working_tree_dir
+
+    def get_staged_snapshot(self) -> StagedSnapshot:
+        """Get the staged changes, read once and shared until the next commit"""
+        if self._staged_snapshot is None:
+            self._staged_snapshot = StagedSnapshot(self.repo)
+        return self._staged_snapshot
+    
+    def get_object_reader(self) -> ObjectReader:
+        """Get the shared cat-file reader for blob lookups"""
+        if self._object_reader is None:
+            self._object_reader = ObjectReader(self.repo.working_tree_dir)
+        return self._object_reader
     
+    @tracing.traced("git.staged_files")
     def get_staged_files(self) -> List[str]:
         """Get list of files that have been git added"""
         try:
@@ -23,47 +80,31 @@ class GitOperations:
             
             # Get modified files in staging area
             if self.repo.head.is_valid():
-                diff_staged = self.repo.git.diff("--cached", "--name-only").split('\n')
-                staged_files.extend([f for f in diff_staged if f])
+                staged_files.extend(self.get_staged_snapshot().paths)
             else:
-                # For initial commit, get all staged files
-                staged_files.extend([item.a_path for item in self.repo.index.diff(None)])
-                # Get all new files added to staging area
-                for entry in self.repo.index.entries:
-                    if isinstance(entry, tuple) and len(entry) > 0:
-                        staged_files.append(entry[0])
-                    elif isinstance(entry, str):
-                        staged_files.append(entry)
+                # For initial commit, every index entry is staged
+                staged_files.extend(entry.path for entry in self.get_object_reader().list_index())
                 
             return list(set(staged_files))  # Remove duplicates
         except Exception as e:
             raise Exception(f"Failed to get staged files: {e}") from e
     
+    @tracing.traced("git.staged_diff")
     def get_staged_diff(self) -> str:
         """Get changes in staged files"""
         try:
             # Get differences between staging area and HEAD
             if self.repo.head.is_valid():
-                diff = self.repo.git.diff("--cached")
+                diff = self.get_staged_snapshot().patch
             else:
-                # For initial repository, show content of files in staging area
-                diff = ""
-                for file_path in self.get_staged_files():
-                    try:
-                        with open(file_path, 'r') as f:
-                            content = f.read()
-                        diff += f"diff --git a/{file_path} b/{file_path}\n"
-                        diff += f"new file mode 100644\n"
-                        diff += f"--- /dev/null\n"
-                        diff += f"+++ b/{file_path}\n"
-                        diff += "".join(f"+{line}" for line in content.splitlines(True))
-                        diff += "\n"
-                    except Exception as e:
-                        print(f"Warning: Could not read file {file_path}: {e}")
+                # For initial repository, build the new-file patch from the staged blobs
+                reader = self.get_object_reader()
+                diff = build_new_file_patch(reader.list_index(), reader)
             return diff
         except Exception as e:
             raise Exception(f"Failed to get diff: {e}") from e
     
+    @tracing.traced("git.commit")
     def commit(self, message: str, confirm: bool = True) -> bool:
         """
         Commit changes
@@ -83,7 +124,8 @@ class GitOperations:
                 try:
                     # Open temporary file with system default editor
                     editor = os.environ.get('EDITOR', 'vim')
-                    os.system(f'{editor} {temp_file_path}')
+                    with tracing.span("editor"):
+                        terminal.run(f'{editor} {temp_file_path}')
 
                     # Read edited commit message
                     with open(temp_file_path, 'r') as temp_file:
@@ -103,6 +145,7 @@ class GitOperations:
                     if confirm_input == '' or confirm_input == 'y':
                         # Execute commit
                         self.repo.index.commit(edited_message)
+                        self._staged_snapshot = None
                         print("Commit completed.")
                         return True
                     else:
@@ -118,6 +161,7 @@ class GitOperations:
             else:
                 # If no confirmation needed, commit directly
                 self.repo.index.commit(message)
+                self._staged_snapshot = None
                 return True
 
         except Exception as e:
@@ -158,7 +202,17 @@ class GitOperations:
             # If we can't check, assume it might exist
             return True
     
+    @tracing.traced("git.main_branch")
     def get_main_branch_name(self) -> str:
+        """Get the name of the main branch, cached until refs or HEAD change"""
+        branch_name = self.metadata.get('main_branch')
+        if branch_name:
+            return branch_name
+        branch_name = self._detect_main_branch_name()
+        self.metadata.set('main_branch', branch_name)
+        return branch_name
+
+    def _detect_main_branch_name(self) -> str:
         """Get the name of the main branch using multiple detection strategies"""
         print("检测主分支名称...")
         
@@ -187,11 +241,13 @@ class GitOperations:
         print("使用默认主分支名称: main")
         return 'main'
             
+    @tracing.traced("git.branch_diff")
     def get_branch_diff(self) -> Optional[str]:
         """Get diff between current branch and main branch"""
         try:
             main_branch = self.get_main_branch_name()
-            return self.repo.git.diff(f'{main_branch}...HEAD')
+            # Detect renames and copies explicitly rather than relying on diff.renames
+            return self.repo.git.diff('-M', '-C', f'{main_branch}...HEAD')
         except GitCommandError as e:
             print(f"Warning: Failed to get branch diff: {e}")
             return None
@@ -203,6 +259,7 @@ class GitOperations:
         except Exception as e:
             raise Exception(f"Failed to get current branch: {e}") from e
     
+    @tracing.traced("git.branch_commits")
     def get_branch_commits(self) -> List[Dict[str, str]]:
         """Get commits in current branch that are not in main branch"""
         try:
@@ -216,15 +273,79 @@ class GitOperations:
             for commit in commits:
                 commit_list.append({
                     'hash': commit.hexsha[:7],
+                    'sha': commit.hexsha,
                     'message': commit.message.strip(),
                     'author': str(commit.author),
                     'date': commit.committed_datetime.strftime('%Y-%m-%d %H:%M:%S')
                 })
             
+            tracing.add(commits=len(commit_list))
             return commit_list
         except Exception as e:
             raise Exception(f"Failed to get branch commits: {e}") from e
     
+    @tracing.traced("git.commit_diffs")
+    def get_commit_diffs(self, shas: List[str]) -> Dict[str, str]:
+        """
+        Get the patch each commit introduces, keyed by full SHA
+        
+        One git process covers all commits. Merge commits have no patch of
+        their own and map to an empty string.
+        """
+        if not shas:
+            return {}
+        try:
+            output = self.repo.git.log('--no-walk=unsorted', '-p', '-M', '-C', '--format=%x00%H', *shas)
+        except GitCommandError as e:
+            raise Exception(f"Failed to get commit diffs: {e}") from e
+        
+        diffs = {sha: "" for sha in shas}
+        for part in output.split('\x00')[1:]:
+            sha, _, patch = part.partition('\n')
+            diffs[sha.strip()] = patch.strip('\n')
+        tracing.add(commits=len(shas))
+        return diffs
+    
+    @tracing.traced("git.range_commits")
+    def get_range_commits(self, rev_range: str) -> List[str]:
+        """Get full SHAs of the non-merge commits in a revision range, oldest first"""
+        try:
+            output = self.repo.git.rev_list('--reverse', '--no-merges', rev_range)
+        except GitCommandError as e:
+            raise Exception(f"Failed to list commits in {rev_range}: {e}") from e
+        shas = output.split()
+        tracing.add(commits=len(shas))
+        return shas
+    
+    def get_git_dir(self) -> str:
+        """Get the git directory of the repository (per worktree)"""
+        return self.repo.git_dir
+    
+    def is_dirty(self) -> bool:
+        """Check whether the index or working tree has uncommitted changes"""
+        return self.repo.is_dirty(index=True, working_tree=True, untracked_files=False)
+    
+    @tracing.traced("git.rewrite_messages")
+    def rewrite_messages(self, rev_range: str, message_dir: str) -> None:
+        """
+        Replace commit messages in a range with git filter-branch --msg-filter
+        
+        message_dir holds one file per original commit SHA with its new
+        message; commits without a file keep their message. filter-branch
+        keeps the previous refs under refs/original/.
+        """
+        message_dir = os.path.abspath(message_dir)
+        msg_filter = (f'if [ -f {shlex.quote(message_dir)}/"$GIT_COMMIT" ]; '
+                      f'then cat {shlex.quote(message_dir)}/"$GIT_COMMIT"; else cat; fi')
+        env = dict(os.environ, FILTER_BRANCH_SQUELCH_WARNING='1')
+        try:
+            subprocess.run(
+                ['git', 'filter-branch', '-f', '--msg-filter', msg_filter, '--', rev_range],
+                cwd=self.repo.working_tree_dir, env=env, capture_output=True, text=True, check=True
+            )
+        except subprocess.CalledProcessError as e:
+            raise Exception(f"Failed to rewrite commit messages: {e.stderr.strip() or e}") from e
+    
     def extract_ticket_from_branch(self) -> Optional[str]:
         """Extract ticket number from branch name"""
         try:
@@ -250,10 +371,14 @@ class GitOperations:
         except (subprocess.CalledProcessError, FileNotFoundError):
             return False
     
+    @tracing.traced("git.push")
     def push_branch(self) -> bool:
         """Push current branch to remote"""
         try:
             current_branch = self.get_current_branch()
+            if terminal.is_forwarded():
+                # Credential and passphrase prompts need the user's terminal
+                return terminal.run(shlex.join(['git', 'push', 'origin', current_branch])) == 0
             origin = self.repo.remote('origin')
             
             # Push current branch to origin
@@ -265,12 +390,18 @@ class GitOperations:
     
     def get_remote_url(self) -> Optional[str]:
         """Get remote origin URL"""
+        url = self.metadata.get('remote_url')
+        if url:
+            return url
         try:
-            return self.repo.remote('origin').url
+            url = self.repo.remote('origin').url
+            self.metadata.set('remote_url', url)
+            return url
         except Exception as e:
             print(f"Warning: Failed to get remote URL: {e}")
             return None
     
+    @tracing.traced("editor.pr_content")
     def edit_pr_content(self, pr_content: Dict[str, str], allow_edit: bool = True) -> Optional[Dict[str, str]]:
         """
         Allow user to edit PR content (title and description)
@@ -292,7 +423,8 @@ class GitOperations:
             try:
                 # Open temporary file with system default editor
                 editor = os.environ.get('EDITOR', 'vim')
-                os.system(f'{editor} {temp_file_path}')
+                with tracing.span("editor"):
+                    terminal.run(f'{editor} {temp_file_path}')
 
                 # Read edited content
                 with open(temp_file_path, 'r', encoding='utf-8') as temp_file:
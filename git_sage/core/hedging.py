@@ -0,0 +1,225 @@
+"""
+Hedged model requests.
+
+A request goes to the primary model first. If no token has arrived after
+hedge_after seconds, the same messages are sent to a secondary model and
+the two race: the first to finish wins (or, when streaming, the first to
+produce a token) and the other is cancelled. Outcomes are counted in
+~/.git-sage/cache/hedge_stats.json together with a window of primary
+first-token latencies, which is what the threshold should be tuned against.
+"""
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from . import cancellation, tracing
+
+DEFAULT_STATS_PATH = "~/.git-sage/cache/hedge_stats.json"
+
+# Primary first-token latencies kept for percentile estimates
+MAX_LATENCY_SAMPLES = 500
+
+
+class HedgeStats:
+    """Persistent counters of hedged requests"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.expanduser(path or DEFAULT_STATS_PATH)
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, Any]:
+        stats = {"requests": 0, "hedged": 0, "primary_wins": 0, "secondary_wins": 0,
+                 "failures": 0, "primary_first_token_s": []}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stats.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        return stats
+
+    def record(self, hedged: bool, winner: Optional[str], primary_first_token_s: Optional[float]) -> None:
+        """Count one request; winner is "primary", "secondary" or None when both failed"""
+        with self._lock:
+            try:
+                stats = self.load()
+                stats["requests"] += 1
+                if hedged:
+                    stats["hedged"] += 1
+                if winner is None:
+                    stats["failures"] += 1
+                else:
+                    stats[f"{winner}_wins"] += 1
+                if primary_first_token_s is not None:
+                    samples = stats["primary_first_token_s"]
+                    samples.append(round(primary_first_token_s, 3))
+                    del samples[:-MAX_LATENCY_SAMPLES]
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._atomic_write(stats)
+            except OSError:
+                pass
+
+    def _atomic_write(self, data: Dict[str, Any]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+class _Attempt:
+    """One model stream consumed on a daemon thread, reporting to a shared event queue"""
+
+    def __init__(self, name: str, get_model: Callable[[], Any], messages: List[Any],
+                 events: "queue.Queue", text_of: Callable[[Any], str]):
+        self.name = name
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        # Chunks received before this attempt was chosen
+        self.pending: List[Any] = []
+        self.cancelled = threading.Event()
+        self._get_model = get_model
+        self._messages = messages
+        self._events = events
+        self._text_of = text_of
+        threading.Thread(target=self._run, name=f"hedge-{name}", daemon=True).start()
+
+    def cancel(self) -> None:
+        """Stop the attempt, closing its connection even while it waits for the first token"""
+        self.cancelled.set()
+        cancellation.cancel(self)
+
+    def _run(self) -> None:
+        cancellation.watch_current_thread(self)
+        try:
+            if self.cancelled.is_set():
+                # Lost before it started
+                return
+            stream = self._get_model().stream(self._messages)
+            final = None
+            try:
+                for chunk in stream:
+                    if self.cancelled.is_set():
+                        return
+                    final = chunk if final is None else final + chunk
+                    if self.first_token_at is None and self._text_of(chunk):
+                        self.first_token_at = time.perf_counter()
+                    self._events.put((self, "chunk", chunk))
+            finally:
+                # Releases the HTTP stream when the attempt stops between chunks
+                stream.close()
+            self._events.put((self, "done", final))
+        except Exception as e:
+            self._events.put((self, "error", e))
+        finally:
+            cancellation.release_current_thread()
+
+    @property
+    def first_token_s(self) -> Optional[float]:
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+
+class HedgedRequest:
+    """Race a primary model against a secondary one started after a delay"""
+
+    def __init__(self, primary: Any, get_secondary: Callable[[], Any], messages: List[Any], hedge_after: float,
+                 text_of: Callable[[Any], str], stats: Optional[HedgeStats] = None):
+        self.primary = primary
+        self.get_secondary = get_secondary
+        self.messages = messages
+        self.hedge_after = hedge_after
+        self.text_of = text_of
+        self.stats = stats
+        self.winner: Optional[str] = None
+        self.hedged = False
+
+    def invoke(self) -> Any:
+        """The complete response of whichever model finishes first"""
+        final = None
+        for kind, payload in self._race(commit_on_token=False):
+            if kind == "done":
+                final = payload
+        return final
+
+    def stream(self) -> Iterator[Any]:
+        """Chunks from whichever model produces a token first"""
+        for kind, payload in self._race(commit_on_token=True):
+            if kind == "chunk":
+                yield payload
+
+    def _race(self, commit_on_token: bool) -> Iterator[Any]:
+        events: "queue.Queue" = queue.Queue()
+        primary = _Attempt("primary", lambda: self.primary, self.messages, events, self.text_of)
+        attempts = [primary]
+        committed: Optional[_Attempt] = None
+        errors: Dict[str, Exception] = {}
+        deadline = primary.started + self.hedge_after
+
+        with tracing.span("model.hedge", hedge_after_s=self.hedge_after) as span:
+            try:
+                while True:
+                    timeout = None
+                    if not self.hedged and primary.first_token_at is None and "primary" not in errors:
+                        timeout = max(0.0, deadline - time.perf_counter())
+                    try:
+                        attempt, kind, payload = events.get(timeout=timeout)
+                    except queue.Empty:
+                        # No first token from the primary in time: fire the secondary
+                        self.hedged = True
+                        attempts.append(_Attempt("secondary", self.get_secondary, self.messages, events, self.text_of))
+                        continue
+
+                    if committed is not None and attempt is not committed:
+                        continue
+
+                    if kind == "error":
+                        errors[attempt.name] = payload
+                        if committed is attempt or len(errors) == len(attempts):
+                            raise errors.get("primary") or payload
+                        continue
+
+                    if committed is None:
+                        if kind == "chunk" and not (commit_on_token and self.text_of(payload)):
+                            attempt.pending.append(payload)
+                            continue
+                        committed = attempt
+                        self._cancel_others(attempts, attempt)
+                        for chunk in attempt.pending:
+                            yield "chunk", chunk
+
+                    yield kind, payload
+                    if kind == "done":
+                        self.winner = attempt.name
+                        return
+            finally:
+                # Also reached when the consumer stops early or an error is raised
+                for attempt in attempts:
+                    if attempt is not committed:
+                        attempt.cancel()
+                span.add(hedged=self.hedged, winner=self.winner or "none")
+                if self.stats is not None:
+                    self.stats.record(self.hedged, self.winner, primary.first_token_s)
+
+    @staticmethod
+    def _cancel_others(attempts: List[_Attempt], winner: _Attempt) -> None:
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel()
+
+
+def percentile(samples: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of the samples, or None when there are none"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
@@ -0,0 +1,156 @@
+"""
+Commit message generation for a range of existing commits.
+
+Commits are read from git in batches (one `git log -p` per batch) and their
+messages generated concurrently, with at most `concurrency` model calls in
+flight. Every generated message is appended to a checkpoint file in the
+git directory as soon as it arrives, so an interrupted run picks up where
+it stopped: commits already in the checkpoint are not sent again.
+
+The checkpoint is keyed by the list of commits in the range, so a range
+that gained or lost commits starts a new one.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Callable, Dict, List, Optional
+
+from .ai_processor import AIProcessor
+from .git_operations import GitOperations
+from . import tracing
+
+# Commits whose patches are loaded from git at once
+DIFF_BATCH_SIZE = 50
+
+
+class RewriteCheckpoint:
+    """Append-only JSON lines of generated messages for one commit range"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @classmethod
+    def for_range(cls, git_dir: str, shas: List[str]) -> "RewriteCheckpoint":
+        """The checkpoint of a range, identified by the commits it contains"""
+        key = hashlib.sha256("\n".join(shas).encode("utf-8")).hexdigest()[:16]
+        return cls(os.path.join(git_dir, "git-sage", "log-rewrite", f"{key}.jsonl"))
+
+    def load(self) -> Dict[str, str]:
+        """Messages generated so far, by original commit SHA"""
+        messages = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        messages[entry["sha"]] = entry["message"]
+                    except (ValueError, KeyError, TypeError):
+                        # A line cut short by an interrupted write
+                        continue
+        except OSError:
+            pass
+        return messages
+
+    def append(self, sha: str, message: str) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"sha": sha, "message": message}, ensure_ascii=False) + "\n")
+
+    def discard(self) -> None:
+        """Forget all progress of this range"""
+        for path in (self.path, self.message_dir):
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.unlink(path)
+
+    @property
+    def message_dir(self) -> str:
+        """Directory of per-commit message files read by the filter-branch msg-filter"""
+        return self.path[:-len(".jsonl")] + ".messages"
+
+    def write_message_files(self, messages: Dict[str, str]) -> str:
+        os.makedirs(self.message_dir, exist_ok=True)
+        for sha, message in messages.items():
+            with open(os.path.join(self.message_dir, sha), "w", encoding="utf-8") as f:
+                f.write(message.rstrip("\n") + "\n")
+        return self.message_dir
+
+
+class LogRewriter:
+    """Generate new messages for the commits of a range"""
+
+    def __init__(self, ai_processor: AIProcessor, git_ops: GitOperations, concurrency: Optional[int] = None):
+        self.ai_processor = ai_processor
+        self.git_ops = git_ops
+        self.concurrency = max(1, concurrency or ai_processor.config_manager.get_max_concurrency())
+        self.failures: Dict[str, str] = {}
+
+    async def generate(self, shas: List[str], checkpoint: RewriteCheckpoint,
+                       progress: Optional[Callable[[int, int, str, Optional[str], Optional[str]], None]] = None) -> Dict[str, str]:
+        """
+        Generate messages for every commit not in the checkpoint yet
+
+        progress is called with (done, total, sha, message, error) after each
+        commit. Failed commits are left out of the result and the checkpoint,
+        so the next run retries them. Returns all messages, old and new.
+        """
+        messages = checkpoint.load()
+        pending = [sha for sha in shas if sha not in messages]
+        total = len(shas)
+        done = total - len(pending)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        loop = asyncio.get_running_loop()
+
+        if pending and self.ai_processor.provider_health is None:
+            # Wait for the model client off the event loop before fanning out
+            await self.ai_processor.amodel()
+
+        async def rewrite(sha: str, diff: str) -> None:
+            nonlocal done
+            message, error = None, None
+            try:
+                if not diff.strip():
+                    raise Exception("commit has no changes")
+                async with semaphore:
+                    message = await self.ai_processor.aprocess_diff(diff)
+                messages[sha] = message
+                checkpoint.append(sha, message)
+            except Exception as e:
+                error = str(e)
+                self.failures[sha] = error
+            done += 1
+            if progress is not None:
+                progress(done, total, sha, message, error)
+
+        with tracing.span("log_rewrite.generate", commits=total, pending=len(pending), concurrency=self.concurrency):
+            tasks = set()
+            for start in range(0, len(pending), DIFF_BATCH_SIZE):
+                batch = pending[start:start + DIFF_BATCH_SIZE]
+                diffs = await loop.run_in_executor(None, self.git_ops.get_commit_diffs, batch)
+                tasks.update(asyncio.ensure_future(rewrite(sha, diffs.get(sha, ""))) for sha in batch)
+                # Keep loading patches ahead of the model, but not the whole range at once
+                while len(tasks) > DIFF_BATCH_SIZE:
+                    _, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            if tasks:
+                await asyncio.wait(tasks)
+
+        return {sha: messages[sha] for sha in shas if sha in messages}
+
+
+def run_rewrite(ai_processor: AIProcessor, git_ops: GitOperations, shas: List[str], checkpoint: RewriteCheckpoint,
+                concurrency: Optional[int] = None,
+                progress: Optional[Callable[[int, int, str, Optional[str], Optional[str]], None]] = None) -> Dict[str, object]:
+    """Generate messages for a range and return them with the failures and timing"""
+    started = time.perf_counter()
+    rewriter = LogRewriter(ai_processor, git_ops, concurrency)
+    messages = asyncio.run(rewriter.generate(shas, checkpoint, progress))
+    return {
+        "messages": messages,
+        "failures": rewriter.failures,
+        "elapsed": time.perf_counter() - started,
+        "concurrency": rewriter.concurrency,
+    }
@@ -1,18 +1,197 @@
 """
 ModelScope Chat Model Wrapper for LangChain integration
 """
-from typing import Any, Dict, Iterator, List, Optional
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import gzip
 import json
 import os
-from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage
-from langchain_core.outputs import ChatGeneration, ChatResult
-from pydantic import Field
+from langchain_core.messages import BaseMessage, AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field, PrivateAttr
+from . import cancellation
 
 
-class ModelScopeChatModel(BaseChatModel):
+class _SSEDecoder:
+    """Incremental decoder for server-sent event streams, fed one line at a time"""
+    
+    def __init__(self):
+        self._data_lines: List[str] = []
+    
+    def feed(self, line: str) -> Optional[str]:
+        """Consume one line; return the event data when the line completes an event"""
+        if not line:
+            # A blank line terminates the current event
+            return self.flush()
+        if line.startswith(":"):
+            # SSE comment / keep-alive
+            return None
+        field, _, value = line.partition(":")
+        if field == "data":
+            self._data_lines.append(value[1:] if value.startswith(" ") else value)
+        return None
+    
+    def flush(self) -> Optional[str]:
+        """Return data of a pending, unterminated event"""
+        if not self._data_lines:
+            return None
+        data = "\n".join(self._data_lines)
+        self._data_lines = []
+        return data
+
+
+class _TrackedPoolMixin:
+    """Record which thread holds a pooled connection, so a hedged request can be cancelled"""
+    
+    def _get_conn(self, *args: Any, **kwargs: Any) -> Any:
+        conn = super()._get_conn(*args, **kwargs)
+        try:
+            cancellation.track(conn)
+        except cancellation.RequestCancelled:
+            self._put_conn(conn)
+            raise
+        return conn
+    
+    def _put_conn(self, conn: Any) -> None:
+        if conn is not None:
+            cancellation.untrack(conn)
+        super()._put_conn(conn)
+
+
+class _TrackedHTTPConnectionPool(_TrackedPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _TrackedHTTPSConnectionPool(_TrackedPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _TrackedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TrackedHTTPConnectionPool, "https": _TrackedHTTPSConnectionPool}
+
+
+class PooledHTTPChatModel(BaseChatModel):
+    """Base for chat models that talk to an HTTP API over a pooled keep-alive session"""
+    
+    connect_timeout: float = Field(default=10.0)
+    read_timeout: float = Field(default=60.0)
+    pool_maxsize: int = Field(default=10)
+    compress_requests: bool = Field(default=False)
+    compress_min_bytes: int = Field(default=16384)
+    
+    _session: Optional[requests.Session] = PrivateAttr(default=None)
+    _async_client: Any = PrivateAttr(default=None)
+    _async_loop: Any = PrivateAttr(default=None)
+    _track_connections: bool = PrivateAttr(default=False)
+    
+    @property
+    def session(self) -> requests.Session:
+        """HTTP session owned by this model, created on first use"""
+        if self._session is None:
+            session = requests.Session()
+            self._mount_adapter(session)
+            self._session = session
+        return self._session
+    
+    def _mount_adapter(self, session: requests.Session) -> None:
+        adapter_class = _TrackedHTTPAdapter if self._track_connections else HTTPAdapter
+        adapter = adapter_class(
+            pool_connections=2,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=False
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    
+    def track_connections(self) -> None:
+        """Let cancellation.cancel() shut down this model's connections (see cancellation.track_http_clients)"""
+        if self._track_connections:
+            return
+        self._track_connections = True
+        if self._session is not None:
+            previous = self._session.get_adapter("https://")
+            self._mount_adapter(self._session)
+            previous.close()
+    
+    @property
+    def async_client(self) -> Any:
+        """httpx.AsyncClient owned by this model, bound to the running event loop"""
+        import httpx
+        
+        loop = asyncio.get_running_loop()
+        # Pooled connections belong to the loop that opened them
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize
+                )
+            )
+            self._async_loop = loop
+        return self._async_client
+    
+    def preconnect(self) -> None:
+        """Open a pooled connection (TCP and TLS) to the service ahead of the first request"""
+        response = self.session.head(self.base_url, timeout=(self.connect_timeout, self.connect_timeout))
+        response.close()
+    
+    def close(self) -> None:
+        """Close pooled connections"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+    
+    async def aclose(self) -> None:
+        """Close pooled async connections"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_loop = None
+    
+    def _encode_body(self, headers: Dict[str, str], payload: Dict[str, Any]) -> bytes:
+        """Serialize a JSON payload, gzip-compressing it (and updating headers) when large"""
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        if self.compress_requests and len(body) >= self.compress_min_bytes:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return body
+    
+    def _apost(self, url: str, headers: Dict[str, str], payload: Dict[str, Any], stream: bool = False) -> Any:
+        """
+        POST a JSON payload over the pooled async client
+        
+        Returns an awaitable response, or with stream=True an async context
+        manager yielding a response whose body has not been read yet.
+        """
+        headers = dict(headers)
+        body = self._encode_body(headers, payload)
+        if stream:
+            return self.async_client.stream("POST", url, headers=headers, content=body)
+        return self.async_client.post(url, headers=headers, content=body)
+    
+    def _post(self, url: str, headers: Dict[str, str], payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+        """POST a JSON payload over the pooled session"""
+        headers = dict(headers)
+        body = self._encode_body(headers, payload)
+        
+        return self.session.post(
+            url,
+            headers=headers,
+            data=body,
+            timeout=(self.connect_timeout, self.read_timeout),
+            stream=stream
+        )
+
+
+class ModelScopeChatModel(PooledHTTPChatModel):
     """ModelScope Chat Model implementation using DashScope API"""
     
     model_name: str = Field(default="qwen-max")
@@ -72,28 +251,49 @@ class ModelScopeChatModel(BaseChatModel):
         **kwargs: Any,
     ) -> ChatResult:
         """Call ModelScope API and return result"""
+        headers = self._build_headers()
+        payload = self._convert_messages_to_prompt(messages)
         
+        try:
+            response = self._post(self.base_url, headers, payload)
+            response.raise_for_status()
+            return self._parse_result(response.json())
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to call ModelScope API: {str(e)}")
+    
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Call ModelScope API asynchronously and return result"""
+        import httpx
+        
+        headers = self._build_headers()
+        payload = self._convert_messages_to_prompt(messages)
+        
+        try:
+            response = await self._apost(self.base_url, headers, payload)
+            response.raise_for_status()
+            return self._parse_result(response.json())
+        except httpx.HTTPError as e:
+            raise Exception(f"Failed to call ModelScope API: {str(e)}")
+    
+    def _build_headers(self) -> Dict[str, str]:
+        """Build request headers, failing early without an API key"""
         if not self.api_key:
             raise ValueError("API key is required for ModelScope. Set DASHSCOPE_API_KEY environment variable or provide api_key parameter.")
         
-        headers = {
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
-        payload = self._convert_messages_to_prompt(messages)
-        
+    
+    def _parse_result(self, result: Dict[str, Any]) -> ChatResult:
+        """Convert a DashScope response body into a ChatResult"""
         try:
-            response = requests.post(
-                self.base_url,
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            
             # 解析响应
             if result.get("status_code") == 200:
                 output_text = result["output"]["text"]
@@ -103,14 +303,11 @@ class ModelScopeChatModel(BaseChatModel):
             else:
                 error_msg = result.get("message", "Unknown error")
                 raise Exception(f"ModelScope API error: {error_msg}")
-                
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to call ModelScope API: {str(e)}")
         except KeyError as e:
             raise Exception(f"Unexpected response format from ModelScope API: {str(e)}")
 
 
-class ModelScopeInferenceChatModel(BaseChatModel):
+class ModelScopeInferenceChatModel(PooledHTTPChatModel):
     """ModelScope Chat Model implementation using Inference API (alternative endpoint)"""
     
     model_name: str = Field(default="qwen/Qwen2.5-Coder-32B-Instruct")
@@ -161,45 +358,177 @@ class ModelScopeInferenceChatModel(BaseChatModel):
         **kwargs: Any,
     ) -> ChatResult:
         """Call ModelScope Inference API and return result"""
+        headers = self._build_headers()
+        payload = self._build_payload(messages, stream=False)
         
-        if not self.api_key:
-            raise ValueError("API key is required for ModelScope. Set MODELSCOPE_API_KEY environment variable or provide api_key parameter.")
-        
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        try:
+            response = self._post(self.base_url, headers, payload)
+            response.raise_for_status()
+            return self._parse_result(response.json())
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to call ModelScope API: {str(e)}")
+    
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Call ModelScope Inference API asynchronously and return result"""
+        import httpx
         
-        payload = {
-            "model": self.model_name,
-            "messages": self._convert_messages_to_openai_format(messages),
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens,
-            "stream": False
-        }
+        headers = self._build_headers()
+        payload = self._build_payload(messages, stream=False)
         
         try:
-            response = requests.post(
-                self.base_url,
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
+            response = await self._apost(self.base_url, headers, payload)
             response.raise_for_status()
-            
-            result = response.json()
-            
+            return self._parse_result(response.json())
+        except httpx.HTTPError as e:
+            raise Exception(f"Failed to call ModelScope API: {str(e)}")
+    
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        """Call ModelScope Inference API with server-sent events and yield tokens as they arrive"""
+        headers = self._build_headers()
+        headers["Accept"] = "text/event-stream"
+        payload = self._build_payload(messages, stream=True)
+        
+        try:
+            with self._post(self.base_url, headers, payload, stream=True) as response:
+                response.raise_for_status()
+                if response.encoding is None:
+                    response.encoding = "utf-8"
+                
+                decoder = _SSEDecoder()
+                for line in response.iter_lines(decode_unicode=True):
+                    data = decoder.feed(line)
+                    if data is None:
+                        continue
+                    if data == "[DONE]":
+                        break
+                    
+                    chunk = self._event_to_chunk(data)
+                    if chunk is None:
+                        continue
+                    if run_manager:
+                        run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                    yield chunk
+                    
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Failed to call ModelScope API: {str(e)}")
+    
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """Asynchronously call ModelScope Inference API with server-sent events and yield tokens as they arrive"""
+        import httpx
+        
+        headers = self._build_headers()
+        headers["Accept"] = "text/event-stream"
+        payload = self._build_payload(messages, stream=True)
+        
+        try:
+            async with self._apost(self.base_url, headers, payload, stream=True) as response:
+                response.raise_for_status()
+                
+                decoder = _SSEDecoder()
+                async for line in response.aiter_lines():
+                    data = decoder.feed(line)
+                    if data is None:
+                        continue
+                    if data == "[DONE]":
+                        break
+                    
+                    chunk = self._event_to_chunk(data)
+                    if chunk is None:
+                        continue
+                    if run_manager:
+                        await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                    yield chunk
+                    
+        except httpx.HTTPError as e:
+            raise Exception(f"Failed to call ModelScope API: {str(e)}")
+    
+    def _parse_result(self, result: Dict[str, Any]) -> ChatResult:
+        """Convert an OpenAI-compatible response body into a ChatResult"""
+        try:
             # 解析OpenAI格式的响应
             if "choices" in result and len(result["choices"]) > 0:
                 output_text = result["choices"][0]["message"]["content"]
-                message = AIMessage(content=output_text)
+                message = AIMessage(content=output_text, usage_metadata=self._usage_metadata(result.get("usage")))
                 generation = ChatGeneration(message=message)
                 return ChatResult(generations=[generation])
             else:
                 error_msg = result.get("error", {}).get("message", "Unknown error")
                 raise Exception(f"ModelScope API error: {error_msg}")
-                
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to call ModelScope API: {str(e)}")
         except KeyError as e:
             raise Exception(f"Unexpected response format from ModelScope API: {str(e)}")
+    
+    def _event_to_chunk(self, data: str) -> Optional[ChatGenerationChunk]:
+        """Convert one streamed event payload into a chunk, or None if it carries no text or usage"""
+        try:
+            event = json.loads(data)
+        except ValueError as e:
+            raise Exception(f"Unexpected response format from ModelScope API: {str(e)}")
+        
+        if "error" in event:
+            error_msg = event["error"].get("message", "Unknown error")
+            raise Exception(f"ModelScope API error: {error_msg}")
+        
+        usage = self._usage_metadata(event.get("usage"))
+        choices = event.get("choices") or []
+        content = (choices[0].get("delta") or {}).get("content") if choices else None
+        if not content:
+            # With include_usage the last event has no choices, only token usage
+            if usage is None:
+                return None
+            return ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+        
+        return ChatGenerationChunk(message=AIMessageChunk(content=content, usage_metadata=usage))
+    
+    @staticmethod
+    def _usage_metadata(usage: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Convert OpenAI-style token usage, including cached prompt tokens, to LangChain usage metadata"""
+        if not usage:
+            return None
+        metadata = {
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+        }
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        if cached is not None:
+            metadata["input_token_details"] = {"cache_read": cached}
+        return metadata
+    
+    def _build_headers(self) -> Dict[str, str]:
+        """Build request headers, failing early without an API key"""
+        if not self.api_key:
+            raise ValueError("API key is required for ModelScope. Set MODELSCOPE_API_KEY environment variable or provide api_key parameter.")
+        
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _build_payload(self, messages: List[BaseMessage], stream: bool) -> Dict[str, Any]:
+        """Build an OpenAI-compatible chat completion request body"""
+        return {
+            "model": self.model_name,
+            "messages": self._convert_messages_to_openai_format(messages),
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": stream,
+            **({"stream_options": {"include_usage": True}} if stream else {})
+        }
@@ -0,0 +1,197 @@
+"""
+Blob access through one long-lived `git cat-file --batch` process.
+
+Spawning git per object is what makes large initial imports slow; a single
+batch process answers every lookup over its pipes instead. Requests for many
+objects are written from a helper thread while the caller reads responses,
+so neither side blocks on a full pipe.
+"""
+import subprocess
+import threading
+import weakref
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Git treats a blob as binary if a NUL byte appears in its first 8000 bytes
+BINARY_CHECK_BYTES = 8000
+
+EMPTY_SHA = "0000000"
+DEFAULT_ABBREV = 7
+
+
+class IndexEntry(NamedTuple):
+    mode: str
+    sha: str
+    stage: int
+    path: str
+
+
+def _close_process(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        try:
+            process.stdin.close()
+            process.wait(timeout=5)
+        except Exception:
+            process.kill()
+
+
+class ObjectReader:
+    """Read git objects by name through a persistent cat-file process"""
+
+    def __init__(self, working_dir: str):
+        self.working_dir = working_dir
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def _ensure_process(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                cwd=self.working_dir,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE
+            )
+            weakref.finalize(self, _close_process, self._process)
+        return self._process
+
+    def _read_response(self, stdout) -> Optional[Tuple[str, bytes]]:
+        header = stdout.readline()
+        if not header:
+            raise Exception("git cat-file exited unexpectedly")
+        parts = header.split()
+        if len(parts) != 3:
+            # "<name> missing" or "<name> ambiguous"
+            return None
+        size = int(parts[2])
+        data = stdout.read(size)
+        # Each object is followed by a newline
+        stdout.read(1)
+        return parts[1].decode("ascii"), data
+
+    def read(self, name: str) -> Optional[Tuple[str, bytes]]:
+        """
+        Get an object's type and content.
+
+        Args:
+            name: Anything cat-file accepts, e.g. a sha, "HEAD:path" or ":path"
+                for the staged version of a file
+
+        Returns:
+            Tuple of (type, content), or None if the object does not exist
+        """
+        with self._lock:
+            process = self._ensure_process()
+            process.stdin.write(name.encode("utf-8") + b"\n")
+            process.stdin.flush()
+            return self._read_response(process.stdout)
+
+    def read_blob(self, name: str) -> Optional[bytes]:
+        """Get the content of a blob, or None if it does not exist"""
+        result = self.read(name)
+        if result is None or result[0] != "blob":
+            return None
+        return result[1]
+
+    def iter_objects(self, names: Iterable[str]) -> Iterator[Tuple[str, Optional[Tuple[str, bytes]]]]:
+        """Stream (name, (type, content) or None) for many objects, in order"""
+        names = list(names)
+        with self._lock:
+            process = self._ensure_process()
+            errors: List[BaseException] = []
+
+            def write_requests():
+                try:
+                    for name in names:
+                        process.stdin.write(name.encode("utf-8") + b"\n")
+                    process.stdin.flush()
+                except BaseException as e:
+                    errors.append(e)
+
+            writer = threading.Thread(target=write_requests, daemon=True)
+            writer.start()
+            try:
+                for name in names:
+                    yield name, self._read_response(process.stdout)
+            finally:
+                writer.join()
+            if errors:
+                raise errors[0]
+
+    def list_index(self) -> List[IndexEntry]:
+        """Get all index entries from a single `git ls-files -s -z`"""
+        output = subprocess.run(
+            ["git", "ls-files", "-s", "-z"],
+            cwd=self.working_dir,
+            capture_output=True,
+            check=True
+        ).stdout
+        entries = []
+        for record in output.split(b"\0"):
+            if not record:
+                continue
+            info, path = record.split(b"\t", 1)
+            mode, sha, stage = info.decode("ascii").split(" ")
+            entries.append(IndexEntry(mode, sha, int(stage), path.decode("utf-8", "surrogateescape")))
+        return entries
+
+    def close(self) -> None:
+        """Stop the cat-file process"""
+        if self._process is not None:
+            _close_process(self._process)
+            self._process = None
+
+
+def build_new_file_patch(entries: List[IndexEntry], reader: ObjectReader) -> str:
+    """
+    Build the `git diff --cached` output for an initial commit from index blobs.
+
+    Blobs are streamed through the batch reader and the patch is assembled
+    from a list of parts joined once, so the cost is linear in the size of
+    the staged tree.
+    """
+    parts: List[str] = []
+    entries = [entry for entry in entries if entry.stage == 0]
+    blob_names = [entry.sha for entry in entries if entry.mode != "160000"]
+    blobs = reader.iter_objects(blob_names)
+
+    for entry in entries:
+        path = entry.path
+        # git terminates file names containing spaces with a tab in ---/+++ lines
+        marker_path = f"{path}\t" if " " in path else path
+        parts.append(f"diff --git a/{path} b/{path}\n")
+        parts.append(f"new file mode {entry.mode}\n")
+        parts.append(f"index {EMPTY_SHA}..{entry.sha[:DEFAULT_ABBREV]}\n")
+
+        if entry.mode == "160000":
+            # Submodules have no blob; git shows the commit they point to
+            parts.append(f"--- /dev/null\n+++ b/{marker_path}\n@@ -0,0 +1 @@\n+Subproject commit {entry.sha}\n")
+            continue
+
+        _, obj = next(blobs)
+        data = obj[1] if obj is not None else b""
+        if not data:
+            continue
+        if b"\0" in data[:BINARY_CHECK_BYTES]:
+            parts.append(f"Binary files /dev/null and b/{path} differ\n")
+            continue
+
+        text = data.decode("utf-8", "replace")
+        missing_newline = not text.endswith("\n")
+        lines = text.split("\n")
+        if not missing_newline:
+            lines.pop()
+        count = len(lines)
+        parts.append(f"--- /dev/null\n+++ b/{marker_path}\n")
+        parts.append(f"@@ -0,0 +1 @@\n" if count == 1 else f"@@ -0,0 +1,{count} @@\n")
+        parts.append("+")
+        parts.append("\n+".join(lines))
+        parts.append("\n")
+        if missing_newline:
+            parts.append("\\ No newline at end of file\n")
+
+    # Consume the rest of the stream so the writer thread is joined
+    for _ in blobs:
+        pass
+
+    patch = "".join(parts)
+    # Match GitPython, which drops the final newline of command output
+    return patch[:-1] if patch.endswith("\n") else patch
@@ -0,0 +1,73 @@
+"""
+Ollama model warm-up.
+
+Ollama loads model weights on the first request after a model was evicted,
+which can take tens of seconds. Sending a request without a prompt loads the
+model (and refreshes its keep_alive) without generating anything, so it can
+run in the background while a command is still reading the repository.
+
+Uses only the standard library so starting a warm-up never waits on the
+LangChain imports the real model call needs.
+"""
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Optional, Union
+
+from . import tracing
+
+# Loading a large model from disk can take minutes on slow machines
+WARMUP_TIMEOUT = 300.0
+
+
+def warm_model(endpoint: str, model_name: str, keep_alive: Union[str, int], num_ctx: Optional[int] = None,
+               timeout: float = WARMUP_TIMEOUT) -> float:
+    """
+    Load a model into Ollama's memory and return the seconds it took
+
+    num_ctx must match the value used for generation requests; Ollama
+    reloads the model when a request asks for a different context size.
+    """
+    payload = {"model": model_name, "keep_alive": keep_alive}
+    if num_ctx:
+        payload["options"] = {"num_ctx": num_ctx}
+    request = urllib.request.Request(
+        endpoint.rstrip("/") + "/api/generate",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+
+    started = time.perf_counter()
+    try:
+        with tracing.span("ollama.warmup", model=model_name):
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                body = json.loads(response.read() or b"{}")
+    except urllib.error.HTTPError as e:
+        raise Exception(f"Failed to warm up model: {e.read().decode('utf-8', 'replace') or e}") from e
+    except urllib.error.URLError as e:
+        raise Exception(f"Failed to warm up model: cannot reach {endpoint} ({e.reason})") from e
+    if body.get("error"):
+        raise Exception(f"Failed to warm up model: {body['error']}")
+    return time.perf_counter() - started
+
+
+def start_background_warmup(endpoint: str, model_name: str, keep_alive: Union[str, int],
+                            num_ctx: Optional[int] = None) -> threading.Thread:
+    """
+    Warm the model on a daemon thread
+
+    Failures are ignored: if the server is unreachable, the real model call
+    reports the error. A generation request sent while the warm-up is still
+    loading simply waits for the same load instead of starting another.
+    """
+    def run() -> None:
+        try:
+            warm_model(endpoint, model_name, keep_alive, num_ctx)
+        except Exception:
+            pass
+
+    thread = threading.Thread(target=run, name="ollama-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,163 @@
+"""
+Health tracking and routing for a chain of language model providers.
+
+Every call outcome is appended to a rolling window per provider (endpoint
+and model included), persisted in ~/.git-sage/cache/provider_health.json so
+the next gsg invocation starts from what the last one learned. A provider
+that fails breaker_failures times in a row has its circuit opened: it is
+skipped without a connection attempt for breaker_cooldown seconds, then
+allowed a trial call (half-open) that either closes the circuit again or
+re-opens it.
+
+Healthy providers are tried fastest first, by median latency of recent
+successful calls. A provider without samples yet ranks first so it gets
+measured, ties keep the configured order, and half-open providers and
+those failing most of their recent calls go last.
+"""
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_HEALTH_PATH = "~/.git-sage/cache/provider_health.json"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+def provider_key(provider: Dict[str, str]) -> str:
+    return f"{provider['language_model']}|{provider['model']}|{provider['endpoint']}"
+
+
+def describe_provider(provider: Dict[str, str]) -> str:
+    return f"{provider['language_model']} ({provider['model']})"
+
+
+class ProviderHealth:
+    """Rolling latency/error windows and circuit breakers, shared across invocations"""
+
+    def __init__(self, path: Optional[str] = None, window: int = 20, failure_threshold: int = 3,
+                 cooldown_s: float = 60):
+        self.path = os.path.expanduser(path or DEFAULT_HEALTH_PATH)
+        self.window = max(1, window)
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config_manager) -> "ProviderHealth":
+        """Create a tracker using the breaker settings from configuration"""
+        return cls(
+            window=config_manager.get_health_window(),
+            failure_threshold=config_manager.get_breaker_failures(),
+            cooldown_s=config_manager.get_breaker_cooldown()
+        )
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("providers", {})
+        except (OSError, ValueError, AttributeError):
+            return {}
+
+    def _save(self, providers: Dict[str, Dict[str, Any]]) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"providers": providers}, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def state(self, entry: Dict[str, Any], now: Optional[float] = None) -> str:
+        """Breaker state of one provider entry"""
+        opened_at = entry.get("opened_at")
+        if opened_at is None:
+            return CLOSED
+        if (now or time.time()) - opened_at < self.cooldown_s:
+            return OPEN
+        return HALF_OPEN
+
+    def stats(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Median latency of successful calls and error rate over the window"""
+        samples = entry.get("samples", [])
+        latencies = [latency for _, latency, ok in samples if ok]
+        return {
+            "calls": len(samples),
+            "median_latency_s": statistics.median(latencies) if latencies else None,
+            "error_rate": (sum(1 for _, _, ok in samples if not ok) / len(samples)) if samples else 0.0,
+        }
+
+    def route(self, providers: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], List[Tuple[Dict[str, str], str]]]:
+        """
+        Order providers for a call
+
+        Returns the providers to try, best first, and the skipped ones with
+        the reason their circuit is open.
+        """
+        now = time.time()
+        entries = self._load()
+        ranked = []
+        skipped = []
+        for index, provider in enumerate(providers):
+            entry = entries.get(provider_key(provider), {})
+            state = self.state(entry, now)
+            if state == OPEN:
+                retry_in = entry["opened_at"] + self.cooldown_s - now
+                skipped.append((provider, f"circuit open after {entry.get('consecutive_failures', 0)} failures, "
+                                          f"retrying in {retry_in:.0f}s ({entry.get('last_error', 'unknown error')})"))
+                continue
+            stats = self.stats(entry)
+            ranked.append(((
+                state == HALF_OPEN,
+                stats["error_rate"] > 0.5,
+                stats["median_latency_s"] or 0.0,
+                index,
+            ), provider))
+        ranked.sort(key=lambda item: item[0])
+        return [provider for _, provider in ranked], skipped
+
+    def record(self, provider: Dict[str, str], latency_s: float, error: Optional[str] = None) -> None:
+        """Add one call outcome and update the provider's breaker"""
+        with self._lock:
+            try:
+                entries = self._load()
+                entry = entries.setdefault(provider_key(provider), {})
+                now = time.time()
+                samples = entry.setdefault("samples", [])
+                samples.append([round(now, 3), round(latency_s, 3), error is None])
+                del samples[:-self.window]
+                if error is None:
+                    entry["consecutive_failures"] = 0
+                    entry["opened_at"] = None
+                else:
+                    entry["consecutive_failures"] = entry.get("consecutive_failures", 0) + 1
+                    entry["last_error"] = error[:200]
+                    # A failed half-open trial re-opens the circuit straight away
+                    if entry["consecutive_failures"] >= self.failure_threshold:
+                        entry["opened_at"] = now
+                self._save(entries)
+            except OSError:
+                pass
+
+    def report(self, providers: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """State and window statistics of each provider, in configured order"""
+        entries = self._load()
+        rows = []
+        for provider in providers:
+            entry = entries.get(provider_key(provider), {})
+            row = {"provider": provider, "state": self.state(entry),
+                   "consecutive_failures": entry.get("consecutive_failures", 0),
+                   "last_error": entry.get("last_error")}
+            row.update(self.stats(entry))
+            rows.append(row)
+        return rows
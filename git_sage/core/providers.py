@@ -0,0 +1,218 @@
+"""
+Language model provider registry.
+
+Each backend is registered with a factory that imports its LangChain
+integration only when that backend is actually selected, so commands that
+never talk to a model never pay the import cost.
+"""
+import os
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# name -> factory(model_name, endpoint, api_key, config_manager) -> model
+_PROVIDERS: Dict[str, Callable[..., Any]] = {}
+
+# (name, model, endpoint, api_key, config path, client environment) ->
+# (model client, environment variables its factory set), see keep_clients_warm
+_warm_clients: Optional[Dict[Tuple[Any, ...], Tuple[Any, Dict[str, str]]]] = None
+
+# Environment variables that clients read when they are built: proxies, CA
+# bundles, and provider keys and hosts picked up by the SDKs
+CLIENT_ENV_PREFIXES = (
+    "HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "NO_PROXY", "SSL_", "REQUESTS_CA_BUNDLE", "CURL_CA_BUNDLE",
+    "OPENAI_", "OLLAMA_", "DASHSCOPE_", "MODELSCOPE_", "GOOGLE_", "GEMINI_",
+)
+
+# Variables set by the factories themselves, which a later call must not count as a different environment
+_factory_env: Set[str] = set()
+
+
+def register_provider(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Register a model factory under the given language_model name"""
+    def decorator(factory: Callable[..., Any]) -> Callable[..., Any]:
+        _PROVIDERS[name] = factory
+        return factory
+    return decorator
+
+
+def available_providers() -> List[str]:
+    """Get names of all registered providers"""
+    return list(_PROVIDERS.keys())
+
+
+def keep_clients_warm(enabled: bool = True) -> None:
+    """
+    Reuse model clients across create_model calls with the same settings
+    
+    Used by gsg daemon, whose forked workers inherit the clients built once
+    in the daemon. A kept client is only reused under the same client
+    environment (see CLIENT_ENV_PREFIXES), since a worker runs with the
+    caller's environment rather than the daemon's. Calling it again drops
+    the kept clients, e.g. after the configuration changed.
+    """
+    global _warm_clients
+    _warm_clients = {} if enabled else None
+
+
+def create_model(language_model: str, model_name: str, endpoint: str, api_key: str, config_manager=None) -> Any:
+    """Build the model client for the given provider"""
+    factory = _PROVIDERS.get(language_model)
+    if factory is None:
+        raise ValueError(f"Unsupported language model service: {language_model}")
+    if _warm_clients is None:
+        return factory(model_name, endpoint, api_key, config_manager)
+    key = (language_model, model_name, endpoint, api_key, getattr(config_manager, "config_path", None),
+           _client_environment())
+    if key not in _warm_clients:
+        before = dict(os.environ)
+        model = factory(model_name, endpoint, api_key, config_manager)
+        written = {name: value for name, value in os.environ.items() if before.get(name) != value}
+        _factory_env.update(written)
+        _warm_clients[key] = (model, written)
+    model, written = _warm_clients[key]
+    # Repeat what building the client did to the environment, as a fresh build would
+    os.environ.update(written)
+    return model
+
+
+def _client_environment() -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(
+        (name, value) for name, value in os.environ.items()
+        if name.upper().startswith(CLIENT_ENV_PREFIXES) and name not in _factory_env
+    ))
+
+
+def preconnect(model: Any, timeout: float = 5.0) -> None:
+    """
+    Open the model client's HTTP connection ahead of the first request
+    
+    Saves the TCP and TLS handshakes on the first model call. Best effort:
+    clients without a known connection pool are left alone and failures
+    are ignored, since the real request reports connection errors anyway.
+    """
+    try:
+        hook = getattr(model, "preconnect", None)
+        if callable(hook):
+            hook()
+            return
+        # langchain_openai clients share the OpenAI SDK's httpx connection pool
+        root_client = getattr(model, "root_client", None)
+        http_client = getattr(root_client, "_client", None)
+        if http_client is not None:
+            http_client.head(str(root_client.base_url), timeout=timeout).close()
+    except Exception:
+        pass
+
+
+@register_provider("ollama")
+def _create_ollama(model_name: str, endpoint: str, api_key: str, config_manager=None):
+    from langchain_ollama import ChatOllama
+    from .token_budget import get_context_window
+
+    override = config_manager.get_context_window() if config_manager is not None else None
+    os.environ["OLLAMA_BASE_URL"] = endpoint
+    # The chat API keeps the system prompt as its own message, so the stable
+    # prefix lines up with Ollama's KV cache from one request to the next
+    return ChatOllama(
+        model=model_name,
+        base_url=endpoint,
+        temperature=0.5,
+        keep_alive=config_manager.get_keep_alive() if config_manager is not None else None,
+        # Match Ollama's window to the one prompts are budgeted against, so
+        # nothing is silently truncated at the server's default num_ctx
+        num_ctx=get_context_window("ollama", model_name, override)
+    )
+
+
+@register_provider("openrouter")
+def _create_openrouter(model_name: str, endpoint: str, api_key: str, config_manager=None):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model_name,
+        openai_api_key=api_key,
+        base_url=endpoint,
+        temperature=0.5,
+        # Report token usage, including cached prompt tokens, when streaming
+        stream_usage=True,
+        default_headers={
+            "HTTP-Referer": "git-sage-cli",
+            "X-Title": "Git-Sage"
+        }
+    )
+
+
+@register_provider("deepseek")
+def _create_deepseek(model_name: str, endpoint: str, api_key: str, config_manager=None):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model=model_name,
+        openai_api_key=api_key,
+        base_url=endpoint,
+        temperature=0.5,
+        stream_usage=True
+    )
+
+
+@register_provider("gemini")
+def _create_gemini(model_name: str, endpoint: str, api_key: str, config_manager=None):
+    try:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+    except ImportError:
+        raise ValueError("Gemini support requires langchain-google-genai package. Install with: pip install langchain-google-genai")
+
+    return ChatGoogleGenerativeAI(
+        model=model_name,
+        google_api_key=api_key,
+        temperature=0.5
+    )
+
+
+@register_provider("modelscope")
+def _create_modelscope(model_name: str, endpoint: str, api_key: str, config_manager=None):
+    try:
+        from .modelscope_wrapper import ModelScopeInferenceChatModel
+    except ImportError:
+        raise ValueError("ModelScope support is not available. Check modelscope_wrapper.py")
+
+    http_options = {}
+    if config_manager is not None:
+        http_options = {
+            "connect_timeout": config_manager.get_connect_timeout(),
+            "read_timeout": config_manager.get_read_timeout(),
+            "compress_requests": config_manager.get_compress_requests(),
+        }
+
+    return ModelScopeInferenceChatModel(
+        model_name=model_name,
+        api_key=api_key,
+        base_url=endpoint,
+        temperature=0.5,
+        **http_options
+    )
+
+
+@register_provider("replay")
+def _create_replay(model_name: str, endpoint: str, api_key: str, config_manager=None):
+    from .replay_model import ReplayChatModel, DEFAULT_RECORDING_PATH
+
+    if config_manager is None:
+        return ReplayChatModel(recording_path=DEFAULT_RECORDING_PATH)
+
+    mode = config_manager.get_replay_mode()
+    if mode not in ("record", "replay"):
+        raise ValueError(f"Unsupported replay_mode: {mode} (expected record or replay)")
+
+    inner = None
+    if mode == "record":
+        inner_provider = config_manager.get_replay_provider()
+        if inner_provider == "replay":
+            raise ValueError("replay_provider must be a real language model service")
+        inner = create_model(inner_provider, model_name, endpoint, api_key, config_manager)
+
+    return ReplayChatModel(
+        mode=mode,
+        recording_path=config_manager.get_replay_path(),
+        latency_scale=config_manager.get_replay_latency_scale(),
+        inner=inner
+    )
@@ -0,0 +1,194 @@
+"""
+Record/replay chat model for offline, deterministic runs.
+
+In record mode the model wraps a real provider, forwards every request and
+appends the response, its latency and token counts to a gzip-compressed
+JSON-lines recording keyed by a hash of the prompt messages. In replay mode
+it serves responses from that recording without any network access,
+sleeping for the recorded latency multiplied by latency_scale.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.ai import add_usage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from .token_budget import estimate_tokens
+
+DEFAULT_RECORDING_PATH = "~/.git-sage/replay/recording.jsonl.gz"
+
+
+def prompt_hash(messages: List[BaseMessage]) -> str:
+    """Stable hash of the prompt messages (role and content)"""
+    digest = hashlib.sha256()
+    for message in messages:
+        for part in (message.type, str(message.content)):
+            encoded = part.encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "big"))
+            digest.update(encoded)
+    return digest.hexdigest()
+
+
+class Recording:
+    """Append-only store of recorded responses, one gzip member per entry"""
+
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(self.path):
+                # Concatenated gzip members read back as one stream
+                with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._entries[entry["key"]] = entry
+        return self._entries
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._load().get(key)
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._load()[entry["key"]] = entry
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(gzip.compress((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")))
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that records a real provider's responses or replays them"""
+
+    mode: str = "replay"
+    recording_path: str = DEFAULT_RECORDING_PATH
+    latency_scale: float = 1.0
+    # The real model; only needed in record mode
+    inner: Any = None
+
+    _recording: Optional[Recording] = PrivateAttr(default=None)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    @property
+    def recording(self) -> Recording:
+        if self._recording is None:
+            self._recording = Recording(self.recording_path)
+        return self._recording
+
+    def _lookup(self, messages: List[BaseMessage]) -> Dict[str, Any]:
+        key = prompt_hash(messages)
+        entry = self.recording.get(key)
+        if entry is None:
+            raise Exception(f"No recorded response for prompt {key[:12]} in {self.recording.path}")
+        return entry
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0 and self.latency_scale > 0:
+            time.sleep(seconds * self.latency_scale)
+
+    def _record(self, messages: List[BaseMessage], text: str, started: float, first_token_at: float,
+                usage: Optional[Dict[str, Any]]) -> None:
+        finished = time.perf_counter()
+        prompt = "".join(str(message.content) for message in messages)
+        self.recording.add({
+            "key": prompt_hash(messages),
+            "response": text,
+            "latency_s": round(finished - started, 4),
+            "first_token_s": round(first_token_at - started, 4),
+            "tokens_in": (usage or {}).get("input_tokens", estimate_tokens(prompt)),
+            "tokens_out": (usage or {}).get("output_tokens", estimate_tokens(text)),
+            "tokens_cached": ((usage or {}).get("input_token_details") or {}).get("cache_read"),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+
+    @staticmethod
+    def _recorded_usage(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Usage metadata of a replayed response, from the recorded token counts"""
+        usage = {
+            "input_tokens": entry.get("tokens_in", 0),
+            "output_tokens": entry.get("tokens_out", 0),
+            "total_tokens": entry.get("tokens_in", 0) + entry.get("tokens_out", 0),
+        }
+        if entry.get("tokens_cached") is not None:
+            usage["input_token_details"] = {"cache_read": entry["tokens_cached"]}
+        return usage
+
+    @staticmethod
+    def _text_of(result: Any) -> str:
+        return result.content if isinstance(result, BaseMessage) else str(result)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.mode == "record":
+            started = time.perf_counter()
+            result = self.inner.invoke(messages)
+            text = self._text_of(result)
+            usage = getattr(result, "usage_metadata", None)
+            self._record(messages, text, started, time.perf_counter(), usage)
+            # Pass the provider's token usage through to the caller
+            message = AIMessage(content=text, usage_metadata=usage,
+                                response_metadata=getattr(result, "response_metadata", None) or {})
+        else:
+            entry = self._lookup(messages)
+            self._sleep(entry["latency_s"])
+            message = AIMessage(content=entry["response"], usage_metadata=self._recorded_usage(entry))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        if self.mode == "record":
+            started = time.perf_counter()
+            first_token_at = None
+            parts = []
+            usage = None
+            for chunk in self.inner.stream(messages):
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                chunk_usage = getattr(chunk, "usage_metadata", None)
+                if chunk_usage:
+                    # Providers may report input and output tokens in different chunks
+                    usage = add_usage(usage, chunk_usage) if usage else chunk_usage
+                text = self._text_of(chunk)
+                parts.append(text)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=text, usage_metadata=chunk_usage))
+            self._record(messages, "".join(parts), started, first_token_at or time.perf_counter(), usage)
+            return
+
+        entry = self._lookup(messages)
+        text = entry["response"]
+        self._sleep(entry.get("first_token_s", entry["latency_s"]))
+        # Spread the remaining latency over the replayed lines
+        lines = text.splitlines(True) or [""]
+        remaining = max(0.0, entry["latency_s"] - entry.get("first_token_s", entry["latency_s"]))
+        for index, line in enumerate(lines):
+            if index:
+                self._sleep(remaining / len(lines))
+            # The recorded token counts arrive with the last chunk, as with include_usage
+            usage = self._recorded_usage(entry) if index == len(lines) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=line, usage_metadata=usage))
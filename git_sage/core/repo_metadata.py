@@ -0,0 +1,137 @@
+import os
+import json
+import tempfile
+from typing import Any, Dict, Optional
+
+# Files whose modification times decide whether cached metadata is still valid.
+# (path relative to the git dir or common dir, whether it lives in the common dir)
+_WATCHED_PATHS = (
+    ("HEAD", False),
+    ("packed-refs", True),
+    (os.path.join("refs", "remotes", "origin", "HEAD"), True),
+    # Directory mtimes change when loose branches are created or deleted
+    (os.path.join("refs", "heads"), True),
+    (os.path.join("refs", "remotes", "origin"), True),
+    # Remote URLs live in the repository config
+    ("config", True),
+)
+
+
+class RepoMetadataCache:
+    """Per-repository metadata (main branch, remote URL) persisted in the git dir.
+
+    Cached values are tied to the mtimes of HEAD, packed-refs,
+    refs/remotes/origin/HEAD and friends; if any of them changes, every
+    cached value is discarded on the next read.
+    """
+
+    FILENAME = "git-sage-metadata.json"
+
+    def __init__(self, git_dir: str, common_dir: Optional[str] = None):
+        self.git_dir = git_dir
+        self.common_dir = common_dir or git_dir
+        self.path = os.path.join(git_dir, self.FILENAME)
+        self._values: Optional[Dict[str, Any]] = None
+
+    def _fingerprint(self) -> Dict[str, Optional[int]]:
+        fingerprint = {}
+        for relative_path, in_common_dir in _WATCHED_PATHS:
+            base = self.common_dir if in_common_dir else self.git_dir
+            try:
+                fingerprint[relative_path] = os.stat(os.path.join(base, relative_path)).st_mtime_ns
+            except OSError:
+                fingerprint[relative_path] = None
+        return fingerprint
+
+    def _load(self) -> Dict[str, Any]:
+        if self._values is None:
+            self._values = {}
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                if stored.get("fingerprint") == self._fingerprint():
+                    self._values = stored.get("values", {})
+            except (OSError, ValueError, AttributeError):
+                pass
+        return self._values
+
+    def get(self, key: str) -> Any:
+        """Get a cached value, or None if missing or invalidated"""
+        return self._load().get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value and persist the cache"""
+        values = self._load()
+        values[key] = value
+        try:
+            _atomic_write_json(self.path, {"fingerprint": self._fingerprint(), "values": values})
+        except OSError:
+            # Read-only .git: keep the in-process value only
+            pass
+
+
+class RepoRootIndex:
+    """Maps working directories to repository roots so later runs skip discovery"""
+
+    DEFAULT_PATH = "~/.git-sage/cache/repo_roots.json"
+    MAX_ENTRIES = 256
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.expanduser(path or self.DEFAULT_PATH)
+        self._entries: Optional[Dict[str, str]] = None
+
+    def _load(self) -> Dict[str, str]:
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def lookup(self, cwd: str) -> Optional[str]:
+        """Get the remembered repository root for cwd if it still looks like a repository"""
+        root = self._load().get(cwd)
+        if not root or not os.path.exists(os.path.join(root, ".git")):
+            return None
+        relative = os.path.relpath(cwd, root)
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            # Not below the root as spelled (e.g. reached through a symlink); let discovery decide
+            return None
+        # A repository created since it was remembered, in cwd or any directory
+        # between cwd and the root, is the one discovery would find
+        parts = [] if relative == os.curdir else relative.split(os.sep)
+        for depth in range(len(parts), 0, -1):
+            if os.path.exists(os.path.join(root, *parts[:depth], ".git")):
+                return None
+        return root
+
+    def remember(self, cwd: str, root: str) -> None:
+        """Record the repository root for cwd"""
+        entries = self._load()
+        if entries.get(cwd) == root:
+            return
+        entries.pop(cwd, None)
+        entries[cwd] = root
+        # Keep the index small; dicts preserve insertion order, oldest first
+        while len(entries) > self.MAX_ENTRIES:
+            entries.pop(next(iter(entries)))
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            _atomic_write_json(self.path, entries)
+        except OSError:
+            pass
+
+
+def _atomic_write_json(path: str, data: Any) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".git-sage-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache for model responses.
+
+    Entries are stored as one JSON file per key. The file mtime doubles as
+    the last-access time, so eviction is LRU by mtime, bounded by both total
+    size and entry age.
+    """
+
+    DEFAULT_CACHE_DIR = "~/.git-sage/cache"
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size_mb: float = 50, max_age_days: float = 30):
+        self.cache_dir = os.path.expanduser(cache_dir or self.DEFAULT_CACHE_DIR)
+        self.entries_dir = os.path.join(self.cache_dir, "responses")
+        self.stats_path = os.path.join(self.cache_dir, "stats.json")
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config_manager) -> "ResponseCache":
+        """Create a cache using the limits from configuration"""
+        return cls(
+            max_size_mb=config_manager.get_cache_max_size_mb(),
+            max_age_days=config_manager.get_cache_max_age_days()
+        )
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """Hash the given parts into a cache key"""
+        digest = hashlib.sha256()
+        for part in parts:
+            data = (part or "").encode("utf-8")
+            # Length-prefix each part so ("ab", "c") and ("a", "bc") differ
+            digest.update(str(len(data)).encode("ascii") + b":")
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.entries_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response, or None on miss"""
+        path = self._entry_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                os.unlink(path)
+                raise FileNotFoundError(path)
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)["response"]
+            # Touch the entry so it counts as recently used
+            os.utime(path, None)
+        except (OSError, ValueError, KeyError):
+            self._record("misses")
+            return None
+
+        self._record("hits")
+        return value
+
+    def contains(self, key: str) -> bool:
+        """Check for an unexpired entry without reading it or counting a hit or miss"""
+        try:
+            return time.time() - os.path.getmtime(self._entry_path(key)) <= self.max_age_seconds
+        except OSError:
+            return False
+
+    def set(self, key: str, response: str) -> None:
+        """Store a response and evict old entries if the cache is over its limits"""
+        try:
+            os.makedirs(self.entries_dir, exist_ok=True)
+            self._atomic_write(self._entry_path(key), {"response": response, "created": time.time()})
+            self.evict()
+        except OSError as e:
+            print(f"Warning: Failed to write response cache: {e}")
+
+    def evict(self) -> int:
+        """Remove expired entries, then least recently used ones until under the size limit"""
+        entries = self._list_entries()
+        now = time.time()
+        removed = 0
+        total_size = 0
+        live: List[Tuple[float, int, str]] = []
+
+        for mtime, size, path in entries:
+            if now - mtime > self.max_age_seconds:
+                removed += self._remove(path)
+            else:
+                live.append((mtime, size, path))
+                total_size += size
+
+        live.sort()
+        for mtime, size, path in live:
+            if total_size <= self.max_size_bytes:
+                break
+            removed += self._remove(path)
+            total_size -= size
+
+        if removed:
+            self._record("evictions", removed)
+        return removed
+
+    def clear(self) -> int:
+        """Remove every cached response"""
+        return sum(self._remove(path) for _, _, path in self._list_entries())
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get hit/miss counters and current cache usage"""
+        stats = {"hits": 0, "misses": 0, "evictions": 0}
+        stats.update(self._load_stats())
+        entries = self._list_entries()
+        stats["entries"] = len(entries)
+        stats["size_bytes"] = sum(size for _, size, _ in entries)
+        return stats
+
+    def _list_entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        try:
+            with os.scandir(self.entries_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _remove(self, path: str) -> int:
+        try:
+            os.unlink(path)
+            return 1
+        except OSError:
+            return 0
+
+    def _load_stats(self) -> Dict[str, int]:
+        try:
+            with open(self.stats_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _record(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            try:
+                stats = self._load_stats()
+                stats[counter] = stats.get(counter, 0) + amount
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._atomic_write(self.stats_path, stats)
+            except OSError:
+                pass
+
+    def _atomic_write(self, path: str, data: Dict) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
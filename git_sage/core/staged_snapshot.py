@@ -0,0 +1,120 @@
+from typing import Dict, List, Optional, Tuple
+
+
+class StagedFile:
+    """One entry of the staged change set"""
+
+    __slots__ = ("path", "old_path", "status", "added", "deleted")
+
+    def __init__(self, path: str, old_path: Optional[str], status: str):
+        self.path = path
+        # Set for renames and copies
+        self.old_path = old_path
+        # Single-letter git status: A, M, D, R, C, T
+        self.status = status
+        # Line counts; None for binary files
+        self.added: Optional[int] = None
+        self.deleted: Optional[int] = None
+
+    @property
+    def is_binary(self) -> bool:
+        return self.added is None
+
+
+class StagedSnapshot:
+    """
+    Staged changes read with a single `git diff --cached -M -C --raw --numstat -p -z`.
+
+    Nothing runs until one of the properties is first accessed. The raw and
+    numstat sections are parsed into the file list on demand, and the patch
+    text is decoded separately, so a caller that only needs the file list
+    never decodes the patch.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self._output: Optional[bytes] = None
+        self._files: Optional[List[StagedFile]] = None
+        self._patch_offset = 0
+        self._patch: Optional[str] = None
+
+    def _read(self) -> bytes:
+        if self._output is None:
+            self._output = self.repo.git.execute(
+                ["git", "diff", "--cached", "-M", "-C", "--raw", "--numstat", "-p", "-z"],
+                stdout_as_string=False,
+                strip_newline_in_stdout=False
+            )
+        return self._output
+
+    def _parse_header(self) -> None:
+        """Parse the NUL-separated raw and numstat sections that precede the patch"""
+        output = self._read()
+        files: List[StagedFile] = []
+        pos = 0
+
+        def next_field() -> str:
+            nonlocal pos
+            end = output.index(b"\0", pos)
+            field = output[pos:end].decode("utf-8", "surrogateescape")
+            pos = end + 1
+            return field
+
+        # Raw: ":<modes> <shas> <status>\0<path>\0", with a second path for renames and copies
+        while pos < len(output) and output[pos:pos + 1] == b":":
+            status = next_field().rsplit(" ", 1)[-1][:1]
+            first = next_field()
+            if status in ("R", "C"):
+                files.append(StagedFile(next_field(), first, status))
+            else:
+                files.append(StagedFile(first, None, status))
+
+        # Numstat: "<added>\t<deleted>\t<path>\0", or an empty path followed by both paths
+        for staged_file in files:
+            added, deleted, path = next_field().split("\t", 2)
+            if not path:
+                next_field()
+                next_field()
+            if added != "-":
+                staged_file.added = int(added)
+                staged_file.deleted = int(deleted)
+
+        # An empty field separates the header from the patch
+        if files:
+            pos += 1
+        self._files = files
+        self._patch_offset = pos
+
+    @property
+    def files(self) -> List[StagedFile]:
+        """Get staged files with their status and line counts"""
+        if self._files is None:
+            self._parse_header()
+        return self._files
+
+    @property
+    def paths(self) -> List[str]:
+        """Get paths of the staged files"""
+        return [staged_file.path for staged_file in self.files]
+
+    @property
+    def stats(self) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+        """Get (added, deleted) line counts per path; (None, None) for binary files"""
+        return {f.path: (f.added, f.deleted) for f in self.files}
+
+    @property
+    def patch(self) -> str:
+        """Get the unified diff of the staged changes"""
+        if self._patch is None:
+            if self._files is None:
+                self._parse_header()
+            # Match GitPython, which drops the final newline of command output
+            patch = self._read()[self._patch_offset:]
+            if patch.endswith(b"\n"):
+                patch = patch[:-1]
+            self._patch = patch.decode("utf-8", "replace")
+        return self._patch
+
+    def is_empty(self) -> bool:
+        """Check whether nothing is staged"""
+        return not self.files
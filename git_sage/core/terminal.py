@@ -0,0 +1,32 @@
+"""
+Programs that need the user's terminal, such as the commit message editor.
+
+A command normally starts them itself. A gsg daemon worker writes to the
+client's stdin, stdout and stderr but has no controlling terminal, so a
+full-screen editor or a git credential prompt (anything that opens
+/dev/tty) cannot run there. The worker installs a runner with set_runner()
+that has the thin client start the program in its own terminal and report
+the exit status back.
+"""
+import os
+from typing import Callable, Optional
+
+_runner: Optional[Callable[[str], int]] = None
+
+
+def set_runner(runner: Optional[Callable[[str], int]]) -> None:
+    """Run terminal programs through runner instead of in this process (None restores the default)"""
+    global _runner
+    _runner = runner
+
+
+def is_forwarded() -> bool:
+    """Check whether terminal programs run in another process (the gsg client)"""
+    return _runner is not None
+
+
+def run(command: str) -> int:
+    """Run a shell command attached to the user's terminal; returns its wait status, like os.system"""
+    if _runner is not None:
+        return _runner(command)
+    return os.system(command)
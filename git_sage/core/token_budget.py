@@ -0,0 +1,254 @@
+"""
+Prompt token budgeting: a fast token estimator, a registry of model context
+windows, and a budgeter that shrinks diffs to fit what is left of the window.
+"""
+import math
+import os
+from typing import Dict, List, Optional, Set, Tuple
+from .diff_utils import split_diff_by_file
+
+# Context windows (in tokens) of the default models in ConfigManager.DEFAULT_MODELS
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "qwen2.5-coder:7b": 32768,
+    "anthropic/claude-3-sonnet": 200000,
+    "deepseek-chat": 65536,
+    "gemini-2.5-flash": 1048576,
+    "Qwen/Qwen3-Coder-480B-A35B-Instruct": 262144,
+}
+
+# Fallbacks for other models, matched by substring of the lower-cased name
+MODEL_FAMILY_CONTEXT_WINDOWS: List[Tuple[str, int]] = [
+    ("qwen3-coder", 262144),
+    ("qwen2.5", 32768),
+    ("qwen", 32768),
+    ("claude", 200000),
+    ("gemini", 1048576),
+    ("deepseek", 65536),
+    ("gpt-4o", 128000),
+    ("gpt-4.1", 1047576),
+    ("llama3", 8192),
+    ("codellama", 16384),
+    ("mistral", 32768),
+]
+
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Ollama allocates KV cache for the whole num_ctx up front, so unless the user
+# configures context_window explicitly we do not ask for more than this
+OLLAMA_MAX_DEFAULT_NUM_CTX = 16384
+
+# Tokens set aside for the omission markers appended to a shrunk diff
+OMISSION_MARKER_TOKENS = 64
+
+# Files whose content carries little information for a commit message or review
+LOW_VALUE_FILENAMES = {
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "Pipfile.lock",
+    "Cargo.lock", "go.sum", "composer.lock", "Gemfile.lock", "uv.lock",
+}
+LOW_VALUE_SUFFIXES = (".min.js", ".min.css", ".map", ".snap", "_pb2.py", ".pb.go", ".svg")
+LOW_VALUE_DIRS = ("dist/", "build/", "vendor/", "node_modules/", "__snapshots__/")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of text without a tokenizer.
+
+    ASCII text averages about four characters per token for BPE tokenizers,
+    while CJK and other non-ASCII characters are closer to one token each.
+    """
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    other_chars = len(text) - ascii_chars
+    return math.ceil(ascii_chars / 4) + other_chars
+
+
+def get_context_window(language_model: str, model_name: str, override: Optional[int] = None) -> int:
+    """Get the context window for a model, honouring an explicit override"""
+    if override:
+        return override
+
+    window = MODEL_CONTEXT_WINDOWS.get(model_name)
+    if window is None:
+        lowered = (model_name or "").lower()
+        window = next((size for family, size in MODEL_FAMILY_CONTEXT_WINDOWS if family in lowered), DEFAULT_CONTEXT_WINDOW)
+
+    if language_model == "ollama":
+        window = min(window, OLLAMA_MAX_DEFAULT_NUM_CTX)
+    return window
+
+
+def is_low_value_file(path: str) -> bool:
+    """Check whether a file is a lockfile, minified bundle or generated artifact"""
+    name = os.path.basename(path)
+    return (
+        name in LOW_VALUE_FILENAMES
+        or path.endswith(LOW_VALUE_SUFFIXES)
+        or any(path.startswith(d) or f"/{d}" in path for d in LOW_VALUE_DIRS)
+    )
+
+
+class _Hunk:
+    __slots__ = ("header", "lines", "tokens", "mode")
+
+    def __init__(self, header: str):
+        self.header = header
+        self.lines: List[str] = []
+        self.tokens = 0
+        # full | changes (context stripped) | dropped
+        self.mode = "full"
+
+    def render(self) -> Tuple[List[str], int]:
+        """Return the rendered lines and how many body lines were omitted"""
+        if self.mode == "full":
+            return [self.header] + self.lines, 0
+        if self.mode == "changes":
+            kept = [line for line in self.lines if not line.startswith(" ")]
+            omitted = len(self.lines) - len(kept)
+            if omitted:
+                kept.append(f"... ({omitted} context lines omitted)\n")
+            return [self.header] + kept, omitted
+        return [self.header, f"... ({len(self.lines)} lines omitted)\n"], len(self.lines)
+
+    def tokens_for(self, mode: str) -> int:
+        if mode == "full":
+            return self.tokens
+        if mode == "changes":
+            return estimate_tokens("".join(line for line in self.lines if not line.startswith(" "))) + 8
+        return 8
+
+
+class _FileDiff:
+    __slots__ = ("path", "header", "hunks", "deleted")
+
+    def __init__(self, path: str, text: str):
+        self.path = path
+        self.header: List[str] = []
+        self.hunks: List[_Hunk] = []
+        self.deleted = False
+
+        for line in text.splitlines(True):
+            if line.startswith("@@"):
+                self.hunks.append(_Hunk(line))
+            elif self.hunks:
+                self.hunks[-1].lines.append(line)
+            else:
+                if line.startswith("deleted file"):
+                    self.deleted = True
+                self.header.append(line)
+
+        for hunk in self.hunks:
+            hunk.tokens = estimate_tokens(hunk.header) + estimate_tokens("".join(hunk.lines))
+
+
+def fit_diff_to_budget(diff_content: str, max_tokens: int) -> Tuple[str, Dict[str, int]]:
+    """
+    Shrink a diff so it fits in max_tokens.
+
+    File headers and hunk headers are kept for every file. Content is dropped
+    in order of increasing value until the diff fits:
+
+    1. bodies of lockfiles, minified and generated files
+    2. bodies of deleted files
+    3. context lines, largest hunks first
+    4. whole hunk bodies, largest hunks first
+
+    An explicit "N files / M lines omitted" marker is appended when anything
+    was dropped. If the headers alone still do not fit, whole files are left
+    out (low-value, deleted, then largest first) and listed by path, or only
+    counted when even the list would not fit.
+
+    Returns:
+        Tuple of (diff text, stats) where stats has tokens_before, tokens_after,
+        files_omitted, lines_omitted and files_dropped
+    """
+    tokens_before = estimate_tokens(diff_content)
+    stats = {"tokens_before": tokens_before, "tokens_after": tokens_before,
+             "files_omitted": 0, "lines_omitted": 0, "files_dropped": 0}
+    if tokens_before <= max_tokens:
+        return diff_content, stats
+
+    files = [_FileDiff(path, text) for path, text in split_diff_by_file(diff_content)]
+    total = tokens_before
+
+    def downgrade(hunk: _Hunk, mode: str) -> None:
+        nonlocal total
+        if hunk.mode == mode or hunk.mode == "dropped":
+            return
+        total += hunk.tokens_for(mode) - hunk.tokens_for(hunk.mode)
+        hunk.mode = mode
+
+    low_value = [h for f in files if is_low_value_file(f.path) for h in f.hunks]
+    deleted = [h for f in files if f.deleted and not is_low_value_file(f.path) for h in f.hunks]
+    by_size = sorted((h for f in files for h in f.hunks), key=lambda h: h.tokens, reverse=True)
+
+    stages = [(low_value, "dropped"), (deleted, "dropped"), (by_size, "changes"), (by_size, "dropped")]
+    for hunks, mode in stages:
+        for hunk in hunks:
+            if total <= max_tokens:
+                break
+            downgrade(hunk, mode)
+
+    rendered: List[Tuple[_FileDiff, str, int]] = []
+    for f in files:
+        file_parts = list(f.header)
+        file_omitted = 0
+        for hunk in f.hunks:
+            lines, omitted = hunk.render()
+            file_parts.extend(lines)
+            file_omitted += omitted
+        rendered.append((f, "".join(file_parts), file_omitted))
+
+    dropped, listed = _drop_files(rendered, max_tokens)
+    parts: List[str] = []
+    for index, (f, text, file_omitted) in enumerate(rendered):
+        if index in dropped:
+            continue
+        parts.append(text)
+        if file_omitted:
+            stats["files_omitted"] += 1
+            stats["lines_omitted"] += file_omitted
+
+    if stats["lines_omitted"]:
+        parts.append(
+            f"\n[git-sage: {stats['files_omitted']} files / {stats['lines_omitted']} lines omitted "
+            f"to fit the model context window]\n"
+        )
+    if dropped:
+        stats["files_dropped"] = len(dropped)
+        parts.append(f"\n[git-sage: {len(dropped)} more files changed but left out to fit the model context window]\n")
+        if listed:
+            parts.extend(_dropped_file_line(rendered[index][0].path) for index in sorted(dropped))
+
+    result = "".join(parts)
+    stats["tokens_after"] = estimate_tokens(result)
+    return result, stats
+
+
+def _drop_files(rendered: List[Tuple[_FileDiff, str, int]], max_tokens: int) -> Tuple[Set[int], bool]:
+    """
+    Indexes of the files to leave out entirely so the rest fits, and whether
+    their paths can be listed in place of them or only counted
+    """
+    sizes = [estimate_tokens(text) for _, text, _ in rendered]
+    order = sorted(
+        range(len(rendered)),
+        key=lambda index: (not is_low_value_file(rendered[index][0].path), not rendered[index][0].deleted, -sizes[index])
+    )
+    for listed in (True, False):
+        total = sum(sizes)
+        dropped: Set[int] = set()
+        for index in order:
+            if total + OMISSION_MARKER_TOKENS <= max_tokens:
+                break
+            dropped.add(index)
+            total -= sizes[index]
+            if listed:
+                total += estimate_tokens(_dropped_file_line(rendered[index][0].path))
+        if total + OMISSION_MARKER_TOKENS <= max_tokens:
+            break
+    return dropped, listed
+
+
+def _dropped_file_line(path: str) -> str:
+    return f"- {path}\n"
@@ -0,0 +1,229 @@
+"""
+Lightweight per-stage tracing with Chrome trace-event export.
+
+Spans record wall time, subprocesses spawned, bytes and estimated tokens in
+and out, and optionally tracemalloc memory. Tracing is off unless enable()
+is called (the CLI does so for --trace or GSG_TRACE=path); while it is off,
+span() returns a shared no-op context manager and traced functions call
+straight through.
+
+The output loads in chrome://tracing or https://ui.perfetto.dev.
+"""
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+_tracer: Optional["Tracer"] = None
+_current_span: contextvars.ContextVar = contextvars.ContextVar("git_sage_span", default=None)
+
+# Updated by an audit hook once tracing is enabled
+_subprocess_count = 0
+
+
+def _audit_hook(event: str, args: Any) -> None:
+    global _subprocess_count
+    if event in ("subprocess.Popen", "os.system") and _tracer is not None:
+        _subprocess_count += 1
+
+
+class Span:
+    __slots__ = ("name", "args", "start", "start_subprocesses", "start_memory")
+
+    def __init__(self, name: str, args: Dict[str, Any]):
+        self.name = name
+        self.args = args
+        self.start = 0.0
+        self.start_subprocesses = 0
+        self.start_memory = 0
+
+    def add(self, **counters: Any) -> None:
+        """Add numeric counters (bytes_in, tokens_out, ...) or set other fields"""
+        for key, value in counters.items():
+            if isinstance(value, (int, float)) and isinstance(self.args.get(key), (int, float)):
+                self.args[key] += value
+            else:
+                self.args[key] = value
+
+    def add_text(self, direction: str, text: str) -> None:
+        """Count the bytes and estimated tokens of text going "in" to or "out" of this span"""
+        from .token_budget import estimate_tokens
+        self.add(**{f"bytes_{direction}": len(text.encode("utf-8", "ignore")),
+                    f"tokens_{direction}": estimate_tokens(text)})
+
+
+class _NullSpan:
+    """Stand-in returned while tracing is disabled"""
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+    def add(self, **counters: Any) -> None:
+        pass
+
+    def add_text(self, direction: str, text: str) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _SpanContext:
+    __slots__ = ("tracer", "span", "token")
+
+    def __init__(self, tracer: "Tracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+        self.token = None
+
+    def __enter__(self) -> Span:
+        self.token = _current_span.set(self.span)
+        self.tracer.start(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.span.args["error"] = exc_type.__name__
+        self.tracer.finish(self.span)
+        _current_span.reset(self.token)
+
+
+class Tracer:
+    """Collects finished spans and writes them as Chrome trace events"""
+
+    def __init__(self, path: str, memory: bool = False):
+        self.path = path
+        self.memory = memory
+        self.events: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        if memory:
+            import tracemalloc
+            tracemalloc.start()
+
+    def start(self, span: Span) -> None:
+        span.start_subprocesses = _subprocess_count
+        if self.memory:
+            import tracemalloc
+            span.start_memory = tracemalloc.get_traced_memory()[0]
+        span.start = time.perf_counter()
+
+    def finish(self, span: Span) -> None:
+        end = time.perf_counter()
+        span.args["subprocesses"] = _subprocess_count - span.start_subprocesses
+        if self.memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            span.args["memory_delta_kb"] = round((current - span.start_memory) / 1024, 1)
+            span.args["memory_peak_kb"] = round(peak / 1024, 1)
+        event = {
+            "name": span.name,
+            "ph": "X",
+            "ts": round((span.start - self.origin) * 1e6, 1),
+            "dur": round((end - span.start) * 1e6, 1),
+            "pid": self.pid,
+            "tid": threading.get_ident(),
+            "args": span.args,
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def write(self) -> None:
+        """Write collected spans to the trace file"""
+        with self.lock:
+            events = sorted(self.events, key=lambda e: e["ts"])
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        print(f"Trace written to {self.path}", file=sys.stderr)
+
+
+def enable(path: str, memory: bool = False) -> Tracer:
+    """Start tracing; spans are written to path when the process exits"""
+    global _tracer
+    if _tracer is None:
+        sys.addaudithook(_audit_hook)
+        _tracer = Tracer(path, memory)
+        atexit.register(_tracer.write)
+    return _tracer
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, **args: Any):
+    """Context manager timing a block; a no-op while tracing is disabled"""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _SpanContext(_tracer, Span(name, args))
+
+
+def add(**counters: Any) -> None:
+    """Add counters to the innermost active span"""
+    if _tracer is None:
+        return
+    current = _current_span.get()
+    if current is not None:
+        current.add(**counters)
+
+
+def _record_result(current: Span, result: Any) -> None:
+    if isinstance(result, str):
+        current.add(bytes_out=len(result.encode("utf-8", "ignore")))
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Decorator that runs a function inside a span.
+
+    String results are counted as bytes_out. Generator functions are traced
+    from the first to the last item they produce.
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        span_name = name or func.__qualname__
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                if _tracer is None:
+                    return (yield from func(*args, **kwargs))
+                with span(span_name) as current:
+                    for item in func(*args, **kwargs):
+                        if isinstance(item, str):
+                            current.add(bytes_out=len(item.encode("utf-8", "ignore")))
+                        yield item
+            return gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _tracer is None:
+                    return await func(*args, **kwargs)
+                with span(span_name) as current:
+                    result = await func(*args, **kwargs)
+                    _record_result(current, result)
+                    return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with span(span_name) as current:
+                result = func(*args, **kwargs)
+                _record_result(current, result)
+                return result
+        return wrapper
+    return decorator
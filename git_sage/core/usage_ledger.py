@@ -0,0 +1,134 @@
+"""
+Local ledger of model usage in SQLite.
+
+Every model call (and every response cache hit that saved one) becomes a
+row with the gsg command, provider, model, token counts, time to first
+token, total latency, cache outcome and diff size. Rows are buffered in
+memory and written in one transaction when the process exits, so recording
+a call costs a list append; sqlite3 is not even imported until then.
+Long-running processes flush on a background thread every FLUSH_EVERY rows.
+"""
+import atexit
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_LEDGER_PATH = "~/.git-sage/usage.db"
+
+# Buffered rows that trigger a background flush before exit
+FLUSH_EVERY = 200
+
+COLUMNS = (
+    "ts", "command", "provider", "model", "prompt_tokens", "completion_tokens", "cached_tokens",
+    "first_token_s", "latency_s", "cache", "diff_chars", "error",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    command TEXT,
+    provider TEXT,
+    model TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cached_tokens INTEGER,
+    first_token_s REAL,
+    latency_s REAL,
+    cache TEXT,
+    diff_chars INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS calls_ts ON calls (ts);
+"""
+
+_command: Optional[str] = None
+_shared: Optional["UsageLedger"] = None
+_shared_lock = threading.Lock()
+
+
+def set_command(command: Optional[str]) -> None:
+    """Name the gsg command that the calls of this process are recorded under"""
+    global _command
+    _command = command
+
+
+def get_ledger() -> "UsageLedger":
+    """The ledger shared by the whole process, flushed at exit"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = UsageLedger()
+            atexit.register(_shared.flush)
+        return _shared
+
+
+class UsageLedger:
+    """Buffered writer and reader of the usage database"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.expanduser(path or DEFAULT_LEDGER_PATH)
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def record(self, **fields: Any) -> None:
+        """Buffer one row; unknown fields are ignored and missing ones stored as NULL"""
+        fields.setdefault("ts", time.time())
+        fields.setdefault("command", _command)
+        row = tuple(fields.get(column) for column in COLUMNS)
+        with self._lock:
+            self._pending.append(row)
+            full = len(self._pending) >= FLUSH_EVERY
+        if full:
+            threading.Thread(target=self.flush, name="usage-ledger-flush", daemon=True).start()
+
+    def _connect(self):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def flush(self) -> None:
+        """Write all buffered rows in one transaction; never raises"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            try:
+                connection = self._connect()
+                try:
+                    with connection:
+                        connection.executemany(
+                            f"INSERT INTO calls ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})",
+                            rows
+                        )
+                finally:
+                    connection.close()
+            except Exception:
+                # Losing usage figures must never fail or slow down a command
+                pass
+
+    def query(self, since: Optional[float] = None, command: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Rows recorded since a timestamp, oldest first, including any still buffered"""
+        self.flush()
+        if not os.path.exists(self.path):
+            return []
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if command:
+            clauses.append("command = ?")
+            params.append(command)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        connection = self._connect()
+        try:
+            cursor = connection.execute(f"SELECT {', '.join(COLUMNS)} FROM calls{where} ORDER BY ts", params)
+            return [dict(zip(COLUMNS, row)) for row in cursor.fetchall()]
+        finally:
+            connection.close()
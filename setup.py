@@ -11,6 +11,7 @@ setup(
         'click>=8.1.7',
         'pyyaml>=6.0.1',
         'requests>=2.31.0',
+        'httpx>=0.24.0',
         'langchain-community>=0.0.10',
         'langchain-ollama>=0.2.0',
         'langchain-core>=0.3.0',
@@ -25,7 +26,7 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'gsg=git_sage.cli.main:cli',
+            'gsg=git_sage.cli.client:main',
         ],
     },
     python_requires='>=3.8',
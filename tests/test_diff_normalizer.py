@@ -0,0 +1,52 @@
+from git_sage.core.diff_normalizer import normalize_diff
+
+
+def file_diff(path: str, removed: list, added: list) -> str:
+    body = "".join(f"-{line}\n" for line in removed) + "".join(f"+{line}\n" for line in added)
+    return (f"diff --git a/{path} b/{path}\n"
+            f"index 1111111..2222222 100644\n"
+            f"--- a/{path}\n"
+            f"+++ b/{path}\n"
+            f"@@ -1,{len(removed)} +1,{len(added)} @@\n"
+            f"{body}")
+
+
+def is_collapsed(diff: str) -> bool:
+    normalized, _ = normalize_diff(diff)
+    return "whitespace-only change" in normalized
+
+
+def test_reindented_code_is_collapsed():
+    assert is_collapsed(file_diff("app.js", ["  if (a) {", "    run(a,  b);", "  }"],
+                                  ["    if (a) {", "        run(a, b);", "    }"]))
+
+
+def test_trailing_whitespace_is_collapsed():
+    assert is_collapsed(file_diff("app.c", ["int x = 1;   "], ["int x = 1;"]))
+
+
+def test_joined_lines_are_kept():
+    assert not is_collapsed(file_diff("app.c", ["return", "x;"], ["returnx;"]))
+
+
+def test_removed_spaces_are_kept():
+    assert not is_collapsed(file_diff("app.c", ["int x = a - b;"], ["intx=a-b;"]))
+
+
+def test_removed_space_before_a_literal_is_kept():
+    assert not is_collapsed(file_diff("app.js", ['x = "a";'], ['x ="a";']))
+
+
+def test_whitespace_inside_string_literals_is_kept():
+    assert not is_collapsed(file_diff("app.py", ['print("a  b")'], ['print("a b")']))
+    assert not is_collapsed(file_diff("app.js", ["const s = 'a b';"], ["const s = 'ab';"]))
+
+
+def test_indentation_is_significant_in_python():
+    assert not is_collapsed(file_diff("app.py", ["    return x"], ["        return x"]))
+    assert is_collapsed(file_diff("app.py", ["    return  x"], ["    return x"]))
+
+
+def test_line_ending_only_change_is_collapsed():
+    normalized, _ = normalize_diff(file_diff("app.c", ["int x;\r"], ["int x;"]))
+    assert "line-ending-only change" in normalized
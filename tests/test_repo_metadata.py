@@ -0,0 +1,49 @@
+from git_sage.core.repo_metadata import RepoRootIndex
+
+
+def make_index(tmp_path, cwd: str, root: str) -> RepoRootIndex:
+    index = RepoRootIndex(str(tmp_path / "repo_roots.json"))
+    index.remember(cwd, root)
+    return index
+
+
+def test_remembered_root_is_returned(tmp_path):
+    root = tmp_path / "repo"
+    cwd = root / "src" / "app"
+    (root / ".git").mkdir(parents=True)
+    cwd.mkdir(parents=True)
+    assert make_index(tmp_path, str(cwd), str(root)).lookup(str(cwd)) == str(root)
+
+
+def test_root_itself_is_returned(tmp_path):
+    root = tmp_path / "repo"
+    (root / ".git").mkdir(parents=True)
+    assert make_index(tmp_path, str(root), str(root)).lookup(str(root)) == str(root)
+
+
+def test_repository_created_between_cwd_and_root_wins(tmp_path):
+    root = tmp_path / "repo"
+    cwd = root / "vendor" / "lib" / "src"
+    (root / ".git").mkdir(parents=True)
+    cwd.mkdir(parents=True)
+    index = make_index(tmp_path, str(cwd), str(root))
+    (root / "vendor" / "lib" / ".git").mkdir()
+    assert index.lookup(str(cwd)) is None
+
+
+def test_repository_created_in_cwd_wins(tmp_path):
+    root = tmp_path / "repo"
+    cwd = root / "sub"
+    (root / ".git").mkdir(parents=True)
+    cwd.mkdir()
+    index = make_index(tmp_path, str(cwd), str(root))
+    (cwd / ".git").write_text("gitdir: elsewhere\n")
+    assert index.lookup(str(cwd)) is None
+
+
+def test_cwd_outside_root_is_ignored(tmp_path):
+    root = tmp_path / "repo"
+    cwd = tmp_path / "other"
+    (root / ".git").mkdir(parents=True)
+    cwd.mkdir()
+    assert make_index(tmp_path, str(cwd), str(root)).lookup(str(cwd)) is None
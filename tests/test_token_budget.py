@@ -0,0 +1,55 @@
+from git_sage.core.token_budget import estimate_tokens, fit_diff_to_budget
+
+
+def new_file_diff(path: str, lines: int = 20) -> str:
+    body = "".join(f"+line {number} of {path}\n" for number in range(lines))
+    return (f"diff --git a/{path} b/{path}\n"
+            f"new file mode 100644\n"
+            f"index 0000000..1234567\n"
+            f"--- /dev/null\n"
+            f"+++ b/{path}\n"
+            f"@@ -0,0 +1,{lines} @@\n"
+            f"{body}")
+
+
+def test_diff_within_budget_is_unchanged():
+    diff = new_file_diff("src/app.py")
+    fitted, stats = fit_diff_to_budget(diff, 10000)
+    assert fitted == diff
+    assert stats["lines_omitted"] == 0
+    assert stats["files_dropped"] == 0
+
+
+def test_hunk_bodies_are_dropped_before_files():
+    diff = "".join(new_file_diff(f"src/module_{number}.py", lines=200) for number in range(10))
+    fitted, stats = fit_diff_to_budget(diff, 1000)
+    assert stats["tokens_after"] <= 1000
+    assert stats["files_dropped"] == 0
+    for number in range(10):
+        assert f"diff --git a/src/module_{number}.py" in fitted
+
+
+def test_headers_alone_over_budget_drop_whole_files():
+    diff = "".join(new_file_diff(f"src/generated/file_{number}.py") for number in range(3000))
+    fitted, stats = fit_diff_to_budget(diff, 14000)
+    assert stats["tokens_after"] <= 14000
+    assert estimate_tokens(fitted) == stats["tokens_after"]
+    assert 0 < stats["files_dropped"] < 3000
+    assert f"{stats['files_dropped']} more files changed but left out" in fitted
+
+
+def test_dropped_files_are_listed_when_the_list_fits():
+    diff = "".join(new_file_diff(f"f{number}.py", lines=2) for number in range(40))
+    fitted, stats = fit_diff_to_budget(diff, 600)
+    assert stats["tokens_after"] <= 600
+    assert stats["files_dropped"] > 0
+    kept = sum(1 for number in range(40) if f"diff --git a/f{number}.py " in fitted)
+    listed = sum(1 for number in range(40) if f"- f{number}.py\n" in fitted)
+    assert kept + listed == 40
+
+
+def test_low_value_files_are_dropped_first():
+    diff = new_file_diff("package-lock.json", lines=5) + "".join(new_file_diff(f"src/m{number}.py", lines=5) for number in range(30))
+    fitted, stats = fit_diff_to_budget(diff, 900)
+    assert stats["files_dropped"] > 0
+    assert "diff --git a/package-lock.json" not in fitted